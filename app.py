@@ -27,24 +27,17 @@ from dash.dependencies import Input, Output
 
 
 ## Load Functions and Data
-from functions import CoronaData,plot_states,get_state_ts,plot_group_ts
+from functions import CoronaData,plot_states,get_state_ts,plot_group_ts,GroupTimeIndex
 
-## LOAD DATA AND SAVE DFs
-corona_data = CoronaData(verbose=False,run_workflow=True)
-df = corona_data.df_us.copy()
-df_world = corona_data.df.copy()
+## LOAD DATA (on the first request that needs it, not at import)
+import functools
+corona_data = CoronaData(verbose=False,run_workflow=True,lazy=True,low_memory=True)
 
 
-## Map of total cases by state
-max_corona = df.groupby('state').max().reset_index()
-
-color_column = 'Confirmed'
-map_ = px.choropleth(max_corona,color=color_column,locations='state',
-              hover_data=['Confirmed','Deaths','Recovered'], 
-              hover_name='state',
-              locationmode="USA-states", scope='usa', title="Total {} Cases by State".format(color_column),
-              color_continuous_scale=px.colors.sequential.Reds)
-
+@functools.lru_cache(maxsize=None)
+def get_world_index():
+    """GroupTimeIndex of the world data by country"""
+    return GroupTimeIndex(corona_data.df,group_col='Country/Region')
 
 
 def make_options(menu_choices):
@@ -54,16 +47,42 @@ def make_options(menu_choices):
         options.append({'label':choice,'value':choice})
     return options
 
-## Make Plot Cols list for options
-stat_cols = ['Confirmed','Deaths','Recovered']
-plot_cols = []
-for column in stat_cols:
-    plot_cols.extend([col for col in df.columns if column in col])
-    
-## Columns for the world
-plot_cols_world=[]
-for column in stat_cols:
-    plot_cols.extend([col for col in df_world.columns if column in col])
+
+@functools.lru_cache(maxsize=None)
+def get_menu_data():
+    """Returns the map figure, the plot cols (US and world) and the state and
+    country menu choices"""
+    df = corona_data.df_us
+    df_world = corona_data.df
+
+    ## Map of total cases by state
+    max_corona = df.groupby('state',observed=True)[['Confirmed','Deaths','Recovered']].max().reset_index()
+
+    color_column = 'Confirmed'
+    map_ = px.choropleth(max_corona,color=color_column,locations='state',
+                  hover_data=['Confirmed','Deaths','Recovered'],
+                  hover_name='state',
+                  locationmode="USA-states", scope='usa', title="Total {} Cases by State".format(color_column),
+                  color_continuous_scale=px.colors.sequential.Reds)
+
+    ## Make Plot Cols list for options
+    stat_cols = ['Confirmed','Deaths','Recovered']
+    plot_cols = []
+    for column in stat_cols:
+        plot_cols.extend([col for col in df.columns if column in col])
+
+    ## Derived metrics (per capita etc.) are computed on demand when selected
+    plot_cols.extend(corona_data.metrics.available)
+
+    ## Columns for the world
+    plot_cols_world=[]
+    for column in stat_cols:
+        plot_cols.extend([col for col in df_world.columns if column in col])
+
+    states = df['state'].sort_values().unique( )
+    countries = df_world['Country/Region'].sort_values().unique( )
+    return map_, plot_cols, plot_cols_world, states, countries
+
 
 ## Make Case-Type Options
 new_options = [{'label':'New Cases Only','value':1},
@@ -73,13 +92,17 @@ new_options = [{'label':'New Cases Only','value':1},
 
 # Build App
 # app = JupyterDash()
-app = dash.Dash(__name__)
+## The layout is a function (built on the first page load), so the callbacks'
+## components can't be validated at import
+app = dash.Dash(__name__,suppress_callback_exceptions=True)
 server = app.server
 
 
 
 
-app.layout = html.Div(id='outerbox',children=[
+def serve_layout():
+    map_, plot_cols, plot_cols_world, states, countries = get_menu_data()
+    return html.Div(id='outerbox',children=[
     html.H1("Coronavirus Cases - By State"),
         dcc.Graph(id='map',figure=map_),         
         
@@ -102,7 +125,7 @@ app.layout = html.Div(id='outerbox',children=[
                         dcc.Dropdown(id='choose_states',className='case_menu_class',
                                     multi=True,
                                     placeholder='Select States', 
-                                    options= make_options(df['state'].sort_values().unique( )),
+                                    options= make_options(states),
                                     value=['MD','NY','TX','CA','AZ'])])
                     ]),
             dcc.Graph(id='graph')
@@ -128,7 +151,7 @@ app.layout = html.Div(id='outerbox',children=[
                         dcc.Dropdown(id='choose_countries',className='case_menu_class',
                                     multi=True,
                                     placeholder='Select Countries', 
-                                    options= make_options(df_world['Country/Region'].sort_values().unique( )),
+                                    options= make_options(countries),
                                     value=['US','Italy','France','Canada','Mainland China'])])
                     ]),
             dcc.Graph(id='graph-world')
@@ -136,6 +159,8 @@ app.layout = html.Div(id='outerbox',children=[
         
         ])
 
+app.layout = serve_layout
+
 
 @app.callback(Output('graph','figure'),[Input('choose_states','value'),
                                        Input('choose_cases','value'),
@@ -146,7 +171,8 @@ def update_output_div(states,cases,new_only):
     if isinstance(cases,list)==False:
         cases = [cases]
 
-    pfig = plot_states(df,states,plot_cols=cases,new_only=new_only)
+    pfig = plot_states(corona_data.ts_index,states,plot_cols=cases,new_only=new_only,
+                       metrics=corona_data.metrics)
     return pfig
 
 
@@ -160,7 +186,7 @@ def update_output_div(countries,cases,new_only):
     if isinstance(cases,list)==False:
         cases = [cases]
         
-    pfig=plot_group_ts(df_world,group_list=countries,plot_cols=cases,
+    pfig=plot_group_ts(get_world_index(),group_list=countries,plot_cols=cases,
                        group_col='Country/Region',
                      new_only=new_only,plot_scatter=True,width=900,height=600)
 
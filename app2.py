@@ -33,7 +33,7 @@ df_world = corona_data.df.copy()
 
 
 ## Map of total cases by state
-max_corona = df.groupby('state').max().reset_index()
+max_corona = df.groupby('state',observed=True)[['Confirmed','Deaths','Recovered']].max().reset_index()
 color_column = 'Confirmed'
 map = px.choropleth(max_corona,color=color_column,locations='state',
               hover_data=['Confirmed','Deaths','Recovered'], 
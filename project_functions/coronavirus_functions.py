@@ -4,6 +4,7 @@ import os,glob,sys,re,shutil
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+from project_functions.frame_cache import shared_view
 
 
 import plotly.io as pio
@@ -35,19 +36,85 @@ def load_us_reference_info():
     return us_info
 
 
-def download_world_pop(data_folder = "Reference Data/",load=True):
-    """Downloads world pop zip from kaggle"""
-    import os,sys,shutil
+## {(state_expr, state_dict items): {'Province/State' name: tuple of state abbreviations}},
+## filled by resolve_us_locations
+_US_LOCATION_CACHE = {}
 
-    # Download kaggle dataset
-    os.system('kaggle datasets download -d tanuprabhu/population-by-country-2020')
+def resolve_us_locations(locations, state_dict, valid_states=None,
+                         state_expr=r"([A-Z\.]{2,4})"):
+    """Resolves US 'Province/State' names to state abbreviations. Each distinct
+    name is only resolved once (and cached for later calls with the same state_dict
+    and state_expr), then the results are broadcast back to the rows through the names' integer codes.
+        - names with a comma (e.g. 'Montgomery County, MD') use every
+          match of state_expr (so a row can resolve to several states).
+        - other names are looked up in state_dict.
+        - 'D.C.' is renamed 'DC' and states not in valid_states are dropped.
+
+    Args:
+        locations (Series): 'Province/State' column
+        state_dict (dict): {state name: abbreviation}
+        valid_states (list): abbreviations to keep (None = keep all found)
 
-    ## Specify file and target folder
-    file = 'population-by-country-2020.zip'
-    target = os.path.join(data_folder,file)
+    Returns:
+        row_idx (array): position in locations of each resolved row
+                         (rows are repeated for each state they resolve to)
+        states (array): state abbreviation of each resolved row
+    """
+    import numpy as np
+    import pandas as pd
+    codes, names = pd.factorize(locations)
+    cache = _US_LOCATION_CACHE.setdefault((state_expr,frozenset(state_dict.items())),{})
+
+    ## Resolve the distinct names that were not seen before
+    new_names = pd.Series([name for name in names if name not in cache],
+                          dtype=object)
+    if len(new_names)>0:
+        is_city = new_names.str.contains(',',regex=False).values
+        found = {name:() for name in new_names}
+
+        city_states = new_names[is_city].str.extractall(state_expr)[0]
+        city_states = city_states.replace('D.C.','DC')
+        for idx,states in city_states.groupby(level=0):
+            found[new_names[idx]] = tuple(states)
+
+        names_states = new_names[~is_city].map(state_dict).replace('D.C.','DC')
+        for name,state in zip(new_names[~is_city],names_states):
+            if pd.notna(state):
+                found[name] = (state,)
+        cache.update(found)
+
+    ## Table of (name code, state) pairs for the names in locations
+    pair_codes, pair_states = [], []
+    for code,name in enumerate(names):
+        for state in cache[name]:
+            if (valid_states is None) or (state in valid_states):
+                pair_codes.append(code)
+                pair_states.append(state)
+    pair_codes = np.array(pair_codes,dtype=np.int64)
+    pair_states = np.array(pair_states,dtype=object)
+
+    ## Broadcast the pairs to the rows (codes is -1 for missing names)
+    counts = np.bincount(pair_codes,minlength=len(names)+1)[:len(names)]
+    starts = np.cumsum(counts)-counts
+    n_row_states = np.where(codes>=0,counts[codes],0)
+
+    row_idx = np.repeat(np.arange(len(codes)),n_row_states)
+    row_starts = np.cumsum(n_row_states)-n_row_states
+    within = np.arange(len(row_idx))-np.repeat(row_starts,n_row_states)
+    pair_idx = starts[codes[row_idx]]+within
+    return row_idx, pair_states[pair_idx]
+
+
+def download_world_pop(data_folder = "Reference Data/",load=True,cache=None):
+    """Downloads world pop zip from kaggle (only if the dataset changed since
+    the zip in data_folder was downloaded, see datasets.DatasetCache)"""
+    from project_functions.datasets import DatasetCache
+    if cache is None:
+        cache = DatasetCache(data_folder)
 
-    ## Move zip file to target
-    shutil.move(file,target)
+    # Download kaggle dataset
+    result = cache.fetch('tanuprabhu/population-by-country-2020')
+    target = result['zip_path']
     print(f'File saved to {target}')
     
     ## Load csv 
@@ -59,36 +126,23 @@ def download_world_pop(data_folder = "Reference Data/",load=True):
 
 
 # @add_method(CoronaData)
-def download_coronavirus_data(path='New\ Data/',verbose=False):
-    """Installs the Kaggle Command Line Interface to clone dataset.
-    Then extracts dataset to specified path and displays name of main file.
+def download_coronavirus_data(path='New\ Data/',verbose=False,cache=None):
+    """Downloads the Kaggle dataset (if it changed since the last download)
+    and extracts its changed files to specified path, then displays name of main file.
     Args:
         path(str): Folder to extract dataset into (must end with a '/')
+        cache(DatasetCache): cache of the dataset's .zip (default: path/.cache)
         
     Returns:
         file_list(list): List of full filepaths to downloaded csv files.
     """
-    ## Determine if dataset is downloaded via Kaggle CL
     import os,glob
-    from zipfile import ZipFile
-    from IPython.display import clear_output
+    from project_functions.datasets import DatasetCache
     os.makedirs(path, exist_ok=True)
 
-    ## Install Kaggle
-    try:
-        import kaggle.api as kaggle
-    except:
-        ## Install Kaggle 
-        os.system("pip install kaggle --upgrade")#
-        clear_output()
-        if verbose: print('\t- Installed kaggle command line tool.')
-
-
-    ## Using the kaggle.api          
-    import kaggle.api as kaggle     
-    kaggle.authenticate()
-    kaggle.dataset_download_files('sudalairajkumar/novel-corona-virus-2019-dataset',
-                            path=path,force=True,unzip=True)                                  
+    if cache is None:
+        cache = DatasetCache(os.path.join(path,'.cache'),verbose=verbose)
+    cache.fetch('sudalairajkumar/novel-corona-virus-2019-dataset',extract_to=path)
     # ## Delete Zip File
     # zipfile  = path+"novel-corona-virus-2019-dataset.zip"
     # try:
@@ -111,33 +165,170 @@ def download_coronavirus_data(path='New\ Data/',verbose=False):
 
 
 
+def resample_numeric(df, freq='D', agg_func='sum'):
+    """Resamples df's numeric columns with freq and agg_func. The id columns
+    (categoricals, see schema.CATEGORY_COLS, or strings) can't be aggregated,
+    so they are left out (like pandas did for object columns)."""
+    return df.select_dtypes('number').resample(freq).agg(agg_func)
+
+
+
+class GroupTimeIndex(object):
+    """Index over a long frame's rows (e.g. df_us) for range queries by group.
+    The rows are sorted by (group, date) once, so a query only binary searches
+    the group's dates (np.searchsorted) and returns a slice of the sorted rows
+    instead of running a groupby over the whole frame.
+
+    Args:
+        df (Frame): long frame with group_col and a DatetimeIndex
+                    (or a 'Date' column, see set_datetime_index)
+        group_col (str): column with the groups (e.g. 'state')
+
+    EXAMPLE USAGE:
+    >>> index = GroupTimeIndex(corona_data.df_us,'state')
+    >>> index.query(['MD','VA'],start='2020-04-01',end='2020-04-30',
+                    metrics=['Confirmed'],freq='W')
+    >>> index.get_group_ts('MD')  # same as get_group_ts(df_us,'MD')
+    """
+    def __init__(self, df, group_col='state'):
+        import numpy as np
+        if isinstance(df.index,pd.DatetimeIndex)==False:
+            df = set_datetime_index(df)
+        self.group_col = group_col
+
+        ## Sort the rows by (group, date) (stable, so same-day rows keep their order)
+        codes, groups = pd.factorize(df[group_col],sort=True)
+        order = np.lexsort((df.index.values,codes))
+        order = order[codes[order]>=0]
+        self.data = df.iloc[order]
+        self.dates = self.data.index
+
+        ## Rows of each group
+        bounds = np.searchsorted(codes[order],np.arange(len(groups)+1))
+        self.groups = list(groups)
+        self._group_rows = {group:(bounds[i],bounds[i+1]) for i,group in enumerate(groups)}
+
+
+    @property
+    def columns(self):
+        return self.data.columns
+
+    def __contains__(self, group):
+        return group in self._group_rows
+
+
+    def get_rows(self, group, start=None, end=None):
+        """Returns the (first, last+1) positions in self.data of group's rows
+        from start to end (inclusive), found by binary search"""
+        if group not in self._group_rows:
+            raise KeyError(f"{group} is not in {self.group_col}")
+        first, last = self._group_rows[group]
+        dates = self.dates[first:last]
+        lo = 0 if start is None else dates.searchsorted(pd.Timestamp(start),side='left')
+        hi = len(dates) if end is None else dates.searchsorted(pd.Timestamp(end),side='right')
+        return first+lo, first+max(lo,hi)
+
+
+    def query(self, groups=None, start=None, end=None, metrics=None,
+              freq=None, agg_func='sum'):
+        """Returns the rows of groups from start to end (inclusive).
+
+        Args:
+            groups (str,list): group or list of groups (None = all groups)
+            metrics (str,list): only return these columns
+            freq (str): resample each group's rows with freq and agg_func
+
+        Returns:
+            Frame (if groups is a str) or {group: Frame}. Without freq, the frames
+            are views sharing the sorted rows' data (see shared_view).
+        """
+        single = isinstance(groups,str)
+        if groups is None:
+            groups = self.groups
+        elif single:
+            groups = [groups]
+        if isinstance(metrics,str):
+            metrics = [metrics]
+
+        results = {}
+        for group in groups:
+            first, last = self.get_rows(group,start,end)
+            group_df = shared_view(self.data.iloc[first:last])
+            if metrics is not None:
+                group_df = group_df[metrics]
+            if freq is not None:
+                group_df = resample_numeric(group_df,freq=freq,agg_func=agg_func)
+            results[group] = group_df
+
+        if single:
+            return results[groups[0]]
+        return results
+
+
+    def get_group_ts(self, group_name, ts_col=None, freq='D', agg_func='sum',
+                     start=None, end=None):
+        """Same output as get_group_ts(df, group_name, ...): group's data resampled
+        with freq/agg_func, with columns renamed "{group_name} - {col}".
+        ts_col (str or list) keeps only the columns containing ts_col."""
+        group_df = self.query(group_name,start=start,end=end,freq=freq,agg_func=agg_func)
+        group_df.columns = [f"{group_name} - {col}" for col in group_df.columns]
+
+        ## Return on columns containing ts_cols
+        if ts_col is not None:
+            if isinstance(ts_col,str):
+                ts_col = [ts_col]
+            ts_cols_selected=[]
+            for column in ts_col:
+                ts_cols_selected.extend([col for col in group_df.columns if column in col])
+            group_df = group_df[ts_cols_selected]
+        return group_df
+
+
+
 #Make a base class
 class BaselineData(object):
     _df = pd.DataFrame()
 
     @property
     def df(self):
+        """View sharing the data (see shared_view, use df.copy() to edit it
+        on pandas without Copy-on-Write)"""
         if hasattr(self,'_df_type'):
             print(self._df_type)
         if hasattr(self,'_df'):
-            return self._df.copy()
+            return shared_view(self._df)
         else:
             return None
         
 
-    @df.setter 
+    @df.setter
     def df(self,value):
         self._df = value
+        self._ts_indexes = {}
+
+
+    def _get_ts_index(self,group_col='state'):
+        """Returns the GroupTimeIndex of self.df by group_col (made once per df)"""
+        indexes = self.__dict__.setdefault('_ts_indexes',{})
+        if group_col not in indexes:
+            indexes[group_col] = GroupTimeIndex(self.df,group_col=group_col)
+        return indexes[group_col]
         
         
     def get_group_ts(self,group_name,group_col='state',
                      ts_col=None,df=None,
                      freq='D', agg_func='sum'):
-        """Take df_us and extracts state's data as then Freq/Aggregation provided"""
+        """Take df_us and extracts state's data as then Freq/Aggregation provided.
+        Without df, self.df's group rows are found with its GroupTimeIndex."""
         from IPython.display import display
         ## 
         if df is None:
-            df = self._df.copy()
+            try:
+                return self._get_ts_index(group_col).get_group_ts(group_name,ts_col=ts_col,
+                                                                  freq=freq,agg_func=agg_func)
+            except KeyError:
+                display(self.df.head())
+                return None
             
         try:
             ## Get state_df group
@@ -146,7 +337,7 @@ class BaselineData(object):
             display(df.head())
             return None
         ## Resample and aggregate state data
-        group_df = group_df.resample(freq).agg(agg_func)
+        group_df = resample_numeric(group_df,freq=freq,agg_func=agg_func)
 
 
         ## Get and Rename Sum Cols 
@@ -167,11 +358,29 @@ class BaselineData(object):
         
 
     ### CLASS DISPLAY RELATED ITEMS
+    @classmethod
+    def _get_member_kinds(cls):
+        """Returns {name: 'method' or 'attribute'} for the class's members, found
+        with inspect.getattr_static (so no properties are evaluated). Cached per class."""
+        import inspect
+        if '_member_kinds' not in cls.__dict__:
+            kinds = {}
+            for name in dir(cls):
+                value = inspect.getattr_static(cls,name)
+                if inspect.isfunction(value) or isinstance(value,classmethod):
+                    kinds[name] = 'method'
+                else:
+                    kinds[name] = 'attribute'
+            cls._member_kinds = kinds
+        return cls._member_kinds
+
+
     def _self_report(self,private=False,
                      methods=True,attributes=True,
                     workflow=False):
-        import inspect
-        attr_list = inspect.getmembers(self)
+        """Lists the methods and attributes from the class's cached members and the
+        instance's __dict__ (with the shape of frames that are already loaded)."""
+        member_kinds = self._get_member_kinds()
         dashes='---'*20
         report = [dashes]
         report.append("[i] CovidTrackingProject Contents:\n"+dashes)
@@ -187,20 +396,19 @@ class BaselineData(object):
             startswithcheck ='__'
         
         ## Loop through all attr
-        for item in attr_list:
-            item_name = item[0]
+        for item_name in sorted({*member_kinds,*self.__dict__}):
             
             ## Exclude Private/Special Attrs
             if item_name.startswith(startswithcheck)== False:
                 
-                ## Get tf if item is method
-                method_check = inspect.ismethod(item[1])
-                
                 ## If item is a method:
-                if method_check==True:
+                if member_kinds.get(item_name)=='method':
                     method_list.append(item_name)
-                ## If item is an attribute
+                ## If item is an attribute (frames show their stored shape)
                 else: 
+                    value = self.__dict__.get(item_name,self.__dict__.get('_'+item_name))
+                    if isinstance(value,pd.DataFrame):
+                        item_name = f"{item_name} {value.shape}"
                     attribute_list.append(item_name) 
                     
         if workflow:
@@ -232,13 +440,16 @@ class BaselineData(object):
 def get_state_ts(df, state_name,
                      group_col='state', ts_col=None,
                      freq='D', agg_func='sum'):
-    """Take df_us and extracts state's data as then Freq/Aggregation provided"""
+    """Take df_us and extracts state's data as then Freq/Aggregation provided.
+    df can also be a GroupTimeIndex of df_us (which avoids the groupby)."""
+    if isinstance(df,GroupTimeIndex):
+        return df.get_group_ts(state_name,ts_col=ts_col,freq=freq,agg_func=agg_func)
     
     ## Get state_df group
     state_df = df.groupby(group_col).get_group(state_name)#.resample(freq).agg(agg)
     
     ## Resample and aggregate state data
-    state_df = state_df.resample(freq).agg(agg_func)
+    state_df = resample_numeric(state_df,freq=freq,agg_func=agg_func)
     
     
     ## Get and Rename Sum Cols 
@@ -270,8 +481,11 @@ def get_state_ts(df, state_name,
 
 
 def plot_states(df, state_list, plot_cols = ['Confirmed'],df_only=False,
-                new_only=False,plot_scatter=True,show=False):
+                new_only=False,plot_scatter=True,show=False,metrics=None):
     """Plots the plot_cols for every state in state_list.
+    df can also be a GroupTimeIndex of df_us (e.g. CoronaData.ts_index).
+    plot_cols that are not columns of df are taken from metrics
+    (a metrics.MetricEngine, e.g. CoronaData.metrics) if provided.
     Returns plotly figure
     New as of 06/21"""
     import pandas as pd 
@@ -289,6 +503,11 @@ def plot_states(df, state_list, plot_cols = ['Confirmed'],df_only=False,
 
         ## for each plot_cols, find all columns that contain that col name
         for plot_col in plot_cols:
+            if (metrics is not None) and (plot_col not in df.columns) and \
+                (plot_col in metrics.metrics):
+                derived = metrics.get(plot_col,[state])
+                concat_dfs.append(derived.rename({state:f"{state} - {plot_col}"},axis=1))
+                continue
             concat_dfs.append(dfs[[col for col in dfs.columns if col.endswith(plot_col)]])#plot_col in col]])
 
     ## Concatenate final dfs
@@ -379,8 +598,13 @@ class CoronaData(BaselineData):
     Args:
         BaselineData (Base Class)
     """
+    ## Columns of the main file kept in df (in low_memory mode only these are read)
+    _main_usecols = ['ObservationDate','Province/State','Country/Region',
+                     'Confirmed','Deaths','Recovered']
+    _main_date_format = '%m/%d/%Y'
+
     def __init__(self,data_dir='New Data/',run_workflow=True,
-                 download=True,verbose=True):
+                 download=True,verbose=True,lazy=False,low_memory=False):
         """
         [summary]
 
@@ -389,6 +613,12 @@ class CoronaData(BaselineData):
             run_workflow (bool, optional): [description]. Defaults to True.
             download (bool, optional): [description]. Defaults to True.
             verbose (bool, optional): [description]. Defaults to True.
+            lazy (bool, optional): Don't download/prepare anything until df, df_us
+                or STATES is first accessed. Each one is then loaded from a disk
+                cache in data_dir/.cache (keyed by the source file's size and
+                modified time) or prepared and saved to it. Defaults to False.
+            low_memory (bool, optional): Only read the columns df needs and don't keep
+                raw_df in memory (it is re-read from disk when accessed). Defaults to False.
         """
         import os
         
@@ -396,7 +626,13 @@ class CoronaData(BaselineData):
         self.__download = download
         self.__verbose = verbose
         self._data_folder = data_dir
+        self._lazy = lazy
+        self._low_memory = low_memory
+        self._cache_dir = os.path.join(data_dir,'.cache')
         os.makedirs(data_dir,exist_ok=True)
+
+        if lazy:
+            return
         
         ## Download data or set local filepath
         if download:
@@ -417,14 +653,143 @@ class CoronaData(BaselineData):
             self._make_state_dict()
 #             print('\n[!] Full Worfklow Complete:')
 #             print('\tself.STATES, self.df_us created.')
+
+
+    ### LAZY/CACHED ATTRIBUTES
+    def _get_cache_fpath(self,name):
+        """Returns the cache filepath for attribute name, keyed by the main file's
+        path, size and modified time"""
+        import os,hashlib
+        if not hasattr(self,'_main_file'):
+            if self.__download:
+                self.download_coronavirus_data()
+            else:
+                self.get_data_fpath(self._data_folder)
+
+        stat = os.stat(self._main_file)
+        source = f"{os.path.abspath(self._main_file)}|{stat.st_size}|{stat.st_mtime_ns}"
+        key = hashlib.md5(source.encode()).hexdigest()[:12]
+        return os.path.join(self._cache_dir,f"{name}-{key}.joblib")
+
+
+    def _get_lazy(self,name):
+        """Returns attribute name, which (in lazy mode) is first loaded from
+        the disk cache or prepared and saved to the cache if needed."""
+        import os,glob,joblib
+        private_name = '_'+name
+        if (self.__dict__.get(private_name) is not None) or (not self._lazy):
+            return self.__dict__.get(private_name)
+
+        fpath = self._get_cache_fpath(name)
+        if os.path.exists(fpath):
+            self.__dict__[private_name] = joblib.load(fpath)
+            return self.__dict__[private_name]
+
+        ## Prepare the attribute (and what it depends on)
+        if name=='df':
+            self.load_raw_df(verbose=self.__verbose)
+        elif name=='df_us':
+            self._get_lazy('df')
+            self.get_and_clean_US()
+        elif name=='STATES':
+            self._get_lazy('df_us')
+            self._make_state_dict()
+
+        ## Replace older cached versions
+        os.makedirs(self._cache_dir,exist_ok=True)
+        for old_fpath in glob.glob(os.path.join(self._cache_dir,f"{name}-*.joblib")):
+            os.remove(old_fpath)
+        joblib.dump(self.__dict__[private_name],fpath)
+        return self.__dict__[private_name]
+
+
+    @property
+    def df(self):
+        self._get_lazy('df')
+        return super().df
+
+    @df.setter
+    def df(self,value):
+        self._df = value
+        self._ts_indexes = {}
+
+    @property
+    def df_us(self):
+        """View sharing the US data (see shared_view, use df_us.copy() to edit
+        it on pandas without Copy-on-Write)"""
+        return shared_view(self._get_lazy('df_us'))
+
+    @df_us.setter
+    def df_us(self,value):
+        self._df_us = value
+        ## The panel, metrics and ts_index are re-made from the new df_us when used
+        self._panel = None
+        self._metrics = None
+        self._features = None
+        self._ts_index = None
+
+    @property
+    def STATES(self):
+        return self._get_lazy('STATES')
+
+    @STATES.setter
+    def STATES(self,value):
+        self._STATES = value
+
+
+    @property
+    def ts_index(self):
+        """GroupTimeIndex of df_us by state (for range queries of states' data)"""
+        if self.__dict__.get('_ts_index') is None:
+            self._ts_index = GroupTimeIndex(self.df_us,group_col='state')
+        return self._ts_index
+
+
+    @property
+    def panel(self):
+        """StatePanel (states x days x metrics) of the daily sums of df_us"""
+        import numpy as np
+        from project_functions.data_acquisition import StatePanel
+        if self.__dict__.get('_panel') is None:
+            df_us = self.df_us
+            values, dates, states, value_cols, _, _ = _group_day_sums(df_us)
+            values = values.reshape(len(dates),len(states),len(value_cols))
+            self._panel = StatePanel(np.moveaxis(values,0,1),states,dates,value_cols)
+        return self._panel
+
+
+    @property
+    def features(self):
+        """FeatureEngine of the panel's rolling features (averages, growth,
+        doubling times, peaks), cached by the panel's data version"""
+        from project_functions.metrics import FeatureEngine
+        if self.__dict__.get('_features') is None:
+            self._features = FeatureEngine(self.panel)
+        return self._features
+
+
+    @property
+    def metrics(self):
+        """MetricEngine computing the derived metrics (per capita, per 100k,
+        daily differences, 7-day averages, ratios) and rolling features of the
+        panel on demand"""
+        from project_functions.metrics import MetricEngine
+        if self.__dict__.get('_metrics') is None:
+            if not hasattr(self,'population'):
+                self.load_us_reference_info()
+            self._metrics = MetricEngine(self.panel,population=self.population,
+                                         features=self.features)
+        return self._metrics
             
 
     # @add_method(CoronaData)
-    def download_coronavirus_data(self,path=None,verbose=None):
-        """Installs the Kaggle Command Line Interface to clone dataset.
-        Then extracts dataset to specified path and displays name of main file.
+    def download_coronavirus_data(self,path=None,verbose=None,cache=None):
+        """Downloads the Kaggle dataset (if it changed since the last download)
+        and extracts its changed files to specified path, then displays name of main file.
+        Unchanged files are not rewritten, so the lazy caches stay valid.
         Args:
             path(str): Folder to extract dataset into (must end with a '/')
+            cache(DatasetCache): cache of the dataset's .zip (default: the data_dir's .cache)
 
         Returns:
             file_list(list): List of full filepaths to downloaded csv files.
@@ -439,26 +804,14 @@ class CoronaData(BaselineData):
         if path is None:
             path = self._data_folder
                                   
-        ## Determine if dataset is downloaded via Kaggle CL
-        import os,glob
-        from zipfile import ZipFile
-        from IPython.display import clear_output
+        ## Download/extract only what changed since the cached version
+        import os
+        from project_functions.datasets import DatasetCache
         os.makedirs(path, exist_ok=True)
 
-        try:
-            import kaggle.api as kaggle
-        except:
-            ## Install Kaggle 
-            os.system("pip install kaggle --upgrade")#
-            clear_output()
-            if verbose: print('\t- Installed kaggle command line tool.')
-
-
-        ## Using the kaggle.api          
-        import kaggle.api as kaggle     
-        kaggle.authenticate()
-        kaggle.dataset_download_files('sudalairajkumar/novel-corona-virus-2019-dataset',
-                             path=path,force=True,unzip=True)
+        if cache is None:
+            cache = DatasetCache(self._cache_dir,verbose=verbose)
+        cache.fetch('sudalairajkumar/novel-corona-virus-2019-dataset',extract_to=path)
         
         ## Run Kaggle Command 
         # cmd = 'kaggle datasets download -d sudalairajkumar/novel-corona-virus-2019-dataset'
@@ -497,30 +850,78 @@ class CoronaData(BaselineData):
     
     
     
-    def load_raw_df(self,fpath=None,kws={},verbose=True):
-        """Performs most basic of preprocessing, including renaming date column to 
-        Date and dropping 'Last Update', and 'SNo' columns"""
+    def _read_main_file(self,fpath,kws={},usecols=None):
+        """Reads the main csv with the schema's dtypes (see schema.get_dtypes and
+        schema.downcast) and ObservationDate parsed with the known _main_date_format.
+        'Last Update' is only parsed when all columns are read (usecols=None)."""
         import pandas as pd
-        from IPython.display import display
-        if fpath is None:
-            fpath = self._main_file
+        from project_functions import schema
 
         ## Default Kws
-        read_kws = dict(parse_dates=['ObservationDate','Last Update'])
+        read_kws = dict(dtype=schema.get_dtypes(source='kaggle'))
+        if usecols is None:
+            read_kws['parse_dates'] = ['Last Update']
+        else:
+            read_kws['usecols'] = usecols
 
         ## Add User kws
         read_kws = {**read_kws,**kws}
 
+        df = pd.read_csv(fpath,**read_kws)
+        df['ObservationDate'] = pd.to_datetime(df['ObservationDate'],
+                                               format=self._main_date_format)
+        return schema.downcast(df)
+
+
+    @property
+    def raw_df(self):
+        """The main csv as loaded. In low_memory mode it is not kept in memory,
+        so it is read from disk again on each access."""
+        if '_raw_df' in self.__dict__:
+            return self._raw_df
+        if '_raw_fpath' in self.__dict__:
+            return self._read_main_file(self._raw_fpath,kws=self._raw_kws)
+        return None
+
+    @raw_df.setter
+    def raw_df(self,value):
+        self._raw_df = value
+
+
+    def load_raw_df(self,fpath=None,kws={},verbose=True,low_memory=None):
+        """Performs most basic of preprocessing, including renaming date column to 
+        Date and dropping 'Last Update', and 'SNo' columns.
+        Columns are parsed with the schema's dtypes (see schema.get_dtypes)
+
+        Args:
+            low_memory (bool): only read the columns df keeps (_main_usecols) and
+                               keep a single frame (raw_df is re-read from disk
+                               when accessed). Defaults to the low_memory set in __init__.
+        """
+        import pandas as pd
+        from IPython.display import display
+        if fpath is None:
+            fpath = self._main_file
+        if low_memory is None:
+            low_memory = getattr(self,'_low_memory',False)
+
 #         if verbose:
 #             print(f"[i] Loading {fpath} with read_csv kws:",end='')
 #             display(read_kws)
 
-        ## Read in csv and save as self.raw_df
-        df = pd.read_csv(fpath,**read_kws)
-        self.raw_df = df.copy()
-        ## Drop unwated columns
-        df.drop(['Last Update',
-                 'SNo'],axis=1,inplace=True)
+        if low_memory:
+            ## Read only the kept columns and don't store raw_df
+            df = self._read_main_file(fpath,kws=kws,usecols=self._main_usecols)
+            self.__dict__.pop('_raw_df',None)
+            self._raw_fpath, self._raw_kws = fpath, kws
+
+        else:
+            ## Read in csv and save as self.raw_df
+            df = self._read_main_file(fpath,kws=kws)
+            self.raw_df = df.copy()
+            ## Drop unwated columns
+            df.drop(['Last Update',
+                     'SNo'],axis=1,inplace=True)
         
 
         ## Rename Date columns
@@ -538,7 +939,7 @@ class CoronaData(BaselineData):
             # DF['Date'].idxmin(), DF['Date'].idxmax()
             print(f"[i] Dates Covered:\n\tFrom {start_ts} to {end_ts}")
 
-        self._df = df.copy()#self.set_datetime_index(df)
+        self._df = df#self.set_datetime_index(df)
         
         
         
@@ -578,35 +979,45 @@ class CoronaData(BaselineData):
         us_info = pd.merge(abbrev,us_pop,right_on='NAME',left_on='State',how="inner")
         us_info.drop('NAME',axis=1,inplace=True)
         self.reference_data = us_info
+        self.population = us_info.set_index('Abbreviation')['POPESTIMATE2019']
         return us_info
     
     
-    def calculate_per_capita(self,df_=None,stat_cols = ['Confirmed','Deaths','Recovered']):
-        """Calculate Per Capita columns"""
+    def calculate_per_capita(self,df_=None,stat_cols = ['Confirmed','Deaths','Recovered'],
+                             group_col='state'):
+        """Calculate Per Capita columns, using the POPESTIMATE2019 column (which is dropped)
+        or, if there is none, the population of each row's group_col state.
+        (The derived metrics in self.metrics compute these on demand instead.)"""
         if df_ is None:
             df_ = self.df
             
         df = df_.copy()
         
-        if 'POPESTIMATE2019' in df.columns==False:
-            self.load_us_reference_info()
+        if 'POPESTIMATE2019' in df.columns:
+            population = df.pop('POPESTIMATE2019').values
+        else:
+            if not hasattr(self,'population'):
+                self.load_us_reference_info()
+            population = self.population.reindex(df[group_col]).values
             
         ## ADDING PER CAPITA DATA 
         for col in stat_cols:
-            df[f"{col} Per Capita"] = df[col]/df['POPESTIMATE2019']
-        df.drop('POPESTIMATE2019',axis=1,inplace=True)
+            df[f"{col} Per Capita"] = df[col].values/population
         return df    
 
     
     
     def get_and_clean_US(self,df=None,#save_as = 'Reference Data/united_states_abbreviations.csv',
-                         make_date_index=True,per_capita=True):
+                         make_date_index=True,per_capita=False):
         """Takes raw df loaded and extracts United States and processes
         all state names to create new abbreviation column 'state'.
+        Per capita columns are only added if per_capita (otherwise they are
+        available on demand from self.metrics, see metrics.MetricEngine).
         """
+        import numpy as np
         import pandas as pd
         if df is None:
-            df= self._df.copy()
+            df = self.df
             
         ## Get only US
         df_us = df.groupby('Country/Region').get_group('US').copy() 
@@ -620,42 +1031,31 @@ class CoronaData(BaselineData):
                           'Virgin Islands':'VI',
                           'United States Virgin Islands':'VI'})
 
-        ## Separately Process Rows that contain a city, state 
-        df_city_states = df_us[df_us['Province/State'].str.contains(',')]
-
-
-        ## Finding City Abbreviations in city_states
-        import re
-        state_expr = re.compile(r"[A-Z\.]{2,4}")
-        df_city_states['state'] = df_city_states['Province/State'].apply(state_expr.findall)
-        df_city_states = df_city_states.explode('state')
-
-
-        ## Seperately process Rows that do not contain a city,state
-        df_states = df_us[~df_us['Province/State'].str.contains(',')]
-        df_states['state'] =  df_states['Province/State'].map(STATE_DICT)
-
-        ## Combining data frame back together
-        df = pd.concat([df_states,df_city_states]).sort_index()
-#         df = df.dropna(subset=['state'])
-
-        ## Fix some stragglers (like D.C. vs DC)
-        df['state'] = df['state'].replace('D.C.','DC')
-        
-        ## Combine Cleaned Data 
-        df = pd.merge(df, state_lookup,left_on='state',right_on="Abbreviation")
+        ## Resolve each distinct Province/State once (city,state rows use the
+        ## state abbreviations in the name) and keep states in state_lookup
+        row_idx, states = resolve_us_locations(df_us['Province/State'],STATE_DICT,
+                                               valid_states=set(state_lookup['Abbreviation']))
+
+        ## Keep the row order of the merge with state_lookup this replaced
+        ## (rows grouped by state, in order of first appearance)
+        order = np.argsort(pd.factorize(states)[0],kind='stable')
+        row_idx, states = row_idx[order], states[order]
+        df = df_us.iloc[row_idx].reset_index(drop=True)
+        df['state'] = pd.Categorical(states)
+
+        ## Combine Cleaned Data
+        lookup = state_lookup.set_index('Abbreviation')
+        for col in lookup.columns:
+            df[col] = lookup[col].reindex(states).values
         
-        df.rename({'State':'State Name'},inplace=True,axis=1)
-        df.drop(columns=['Abbreviation','State Name'],inplace =True)
+        df.drop(columns=['State'],inplace =True)
         
     
         ## Add Population Data
         if per_capita:
-
-            for col in  ['Confirmed','Deaths','Recovered']:
-                df[f"{col} Per Capita"] = df[col]/df['POPESTIMATE2019']
-
-            ## Remove Population 
+            df = self.calculate_per_capita(df)
+        else:
+            ## Remove Population (kept by state in self.population)
             df.drop('POPESTIMATE2019',axis=1,inplace=True)
 
         if make_date_index:
@@ -668,20 +1068,21 @@ class CoronaData(BaselineData):
         return df
 
     
-    def _make_state_dict(self,df=None,col='state'):
+    def _make_state_dict(self,df=None,col='state',as_panel=False):
+        """Makes self.STATES ({state: daily sums}) in one pass with get_all_group_ts.
+        If as_panel, returns a single wide Frame of every state's columns."""
         if df is None:
-            df = self.df_us.copy()
+            df = self.df_us
             
         elif col not in df.columns:
             msg = f"{col} not in df.columns.\nColumns include:"+'\n'.join(df.columns)
             raise Exception(msg)
             
-        state_list=df[col].unique()
+        if as_panel:
+            return get_all_group_ts(df,group_col=col,as_panel=True)
 
-        STATES = {}
-        for state in state_list:
-            STATES[state] = self.get_group_ts(state,df=df)
-        self.STATES = STATES
+        self.STATES = get_all_group_ts(df,group_col=col)
+        return self.STATES
 
 
         
@@ -690,9 +1091,23 @@ class CovidTrackingProject(BaselineData):
 
     
     def __init__(self,base_folder="New Data/",
-                 download=True,verbose=True,df_type='states'):
+                 download=True,verbose=True,df_type='states',
+                 max_workers=3,timeout=60,retries=2,cache=None):
+        """Downloads the sources (see fetch_sources for max_workers, timeout
+        and retries), or loads the local files if not download (see
+        load_local_data), and sets .df to the df_type ('states' or 'us') data.
+        The loaded frames are kept in cache (a FrameCache, by default the one
+        shared by all instances, see frame_cache.get_shared_cache)."""
+        from project_functions.frame_cache import get_shared_cache
         self.base_folder = base_folder
         self.__verbose = verbose
+        self.cache = get_shared_cache() if cache is None else cache
+        ## {source key: (cache key, function to (re)load the frame)}
+        self._sources = {}
+        ## {fpath: result of downloads.download_if_modified}
+        self.download_results = {}
+        ## {source key: result of fetch_sources}
+        self.fetch_results = {}
         
         
         if download:
@@ -701,34 +1116,31 @@ class CovidTrackingProject(BaselineData):
                 print(f"[i] DOWNLOADING DATASETS FROM COVID TRACKING PROJECT")
                 print("\thttps://covidtracking.com/data")
             
-            workflow = [self.download_state_meta,
-             self.download_us_daily,self.download_state_daily]
-            
-            for method in workflow:
-                try:
-                    method()
-                except:
-                    print('ERROR')
+            self.fetch_sources(max_workers=max_workers,timeout=timeout,retries=retries)
             
         else:
-            raise Exception("Non-download loading not implemented yet.")
-        
+            self.load_local_data()
+
         ## Set .df attribute
         if df_type.lower()=='states':
             self._df_type = df_type
-            self._df = self._data[df_type].copy()#self.STATES[self.columns['good']].copy()
+            self._df = self._get_data(df_type)#self.STATES[self.columns['good']].copy()
             
         elif df_type.lower()=='us':
             self._df_type = df_type
-            self._df = self._data[df_type].copy()
+            self._df = self._get_data(df_type)
 
 
     base_url = f"http://covidtracking.com"
-    _data = dict()
+    _session = None
     urls = dict(us = base_url+'/api/v1/us/daily.csv',
                 states = base_url+'/api/v1/states/daily.csv',
                 states_metadata = base_url+"/api/v1/states/info.csv"
                )
+    ## The archived data's files in base_folder (for download=False)
+    local_files = dict(us = 'us_daily.csv',
+                       states = 'states_daily.csv',
+                       states_metadata = 'states_metadata.csv')
     
     ## Store good vs deprecated columns
     columns = {'good':['state','fips',
@@ -782,17 +1194,22 @@ class CovidTrackingProject(BaselineData):
         
         ## Select the correct df
         if which=='states':
-            df = self.df_states.copy()
             col_dict = self.columns
         elif which=='us':
-            df= self.df_us.copy()
             col_dict = self.columns_us
         else:
             raise Exception('The value for "which" must be either "us" or "states"')
 
+        ## Loaded from the local cache: only read the needed columns
+        if which in self.__dict__.get('_cache_fpaths',{}):
+            columns = col_dict['good'] if remove_dep_cols else None
+            return self._read_local_cache(which,columns=columns)
+
         ## Remove deprecated columns
         if remove_dep_cols:
-            df = df[col_dict['good']].copy()
+            df = self._get_data(which,columns=col_dict['good'])
+        else:
+            df = self._get_data(which).copy()
             
         return df
     
@@ -801,68 +1218,213 @@ class CovidTrackingProject(BaselineData):
     
     
             
-    def get_csv_save_load(self,url, fpath,read_kws={'parse_dates':['date']}):
+    def get_csv_save_load(self,url, fpath,read_kws={'parse_dates':['date']},timeout=60,
+                          key=None):
+        """Downloads url to fpath (streamed, and only if it changed since the last
+        download, see downloads.download_if_modified) and loads it with the
+        schema's dtypes (see schema.get_dtypes) into self.cache. An unchanged
+        file that is still in the cache is not re-parsed. Returns a shared
+        view (and registers it as source key, if given)."""
         import pandas as pd
-        import requests
-        response = requests.get(url).content
-        
-        with open(fpath,'wb') as file:
-            file.write(response)
+        from project_functions import downloads, schema
+        result = downloads.download_if_modified(url,fpath,session=self.get_session(),
+                                                timeout=timeout)
+        self.download_results[fpath] = result
+
+        ## Re-use the parsed frame if neither the file nor read_kws changed
+        read_kws = {'dtype':schema.get_dtypes(source='covid_tracking'),**read_kws}
+        cache_key = (os.path.abspath(fpath),repr(sorted(read_kws.items())),result['validator'])
+        loader = lambda: schema.downcast(pd.read_csv(fpath,**read_kws))
+        if result['modified']:
+            data = self.cache.put(cache_key,loader())
+        else:
+            data = self.cache.get_or_load(cache_key,loader)
+        if key is not None:
+            self._sources[key] = (cache_key,loader)
 
-        state_meta = pd.read_csv(fpath,**read_kws)
         if self.__verbose:
-            print(f'\t- File saved as: "{fpath}"')
+            if result['modified']:
+                print(f'\t- File saved as: "{fpath}"')
+            else:
+                print(f'\t- "{fpath}" is up to date.')
 
-        return state_meta
-    
-    
-    
-    def download_us_daily(self):
+        return data
+
+
+    def _get_data(self,key,columns=None):
+        """Returns a shared view of source key's frame from the cache (reloaded
+        from its file if it was evicted), or a Frame of its columns"""
+        cache_key,loader = self._sources[key]
+        data = self.cache.get_or_load(cache_key,loader)
+        if columns is not None:
+            data = data[columns]
+        return data
+
+
+    @property
+    def df_states(self):
+        """states data (the good columns)"""
+        return self._get_data('states',columns=self.columns['good'])
+
+    @property
+    def df_us(self):
+        """US data (the good columns)"""
+        return self._get_data('us',columns=self.columns_us['good'])
+
+    @property
+    def df_states_metadata(self):
+        """Shared view of the states' metadata (see shared_view)"""
+        return self._get_data('states_metadata')
+
+
+    def _get_read_kws(self,key):
+        """Returns the read_csv kws of source key"""
+        if key=='states_metadata':
+            return {}
+        return {'parse_dates':['date'],'index_col':'date'}
+
+
+    def load_local_data(self,keys=None):
+        """Loads the archived data's local files (local_files in base_folder) from
+        a parquet cache next to each csv, which is made from the csv (with the
+        schema's dtypes) the first time (or if the csv is newer).
+        Sets the same attributes as downloading the sources."""
+        import os
+        from project_functions import schema
+        if keys is None:
+            keys = list(self.local_files)
+        self._cache_fpaths = {}
+
+        for key in keys:
+            fpath = os.path.join(self.base_folder,self.local_files[key])
+            cache_fpath = os.path.splitext(fpath)[0]+'.parquet'
+            if (not os.path.exists(cache_fpath)) or \
+                (os.path.getmtime(cache_fpath)<os.path.getmtime(fpath)):
+                read_kws = {'dtype':schema.get_dtypes(source='covid_tracking'),
+                            **self._get_read_kws(key)}
+                data = schema.downcast(pd.read_csv(fpath,**read_kws))
+                data.to_parquet(cache_fpath,engine='pyarrow')
+                if self.__verbose:
+                    print(f'\t- Saved "{fpath}" as "{cache_fpath}"')
+            self._cache_fpaths[key] = cache_fpath
+
+            loader = lambda key=key: self._read_local_cache(key)
+            self._sources[key] = ((cache_fpath,os.path.getmtime(cache_fpath)),loader)
+            self._get_data(key)
+
+
+    def _read_local_cache(self,key,columns=None):
+        """Reads columns (None=all) of source key's parquet cache"""
+        return pd.read_parquet(self._cache_fpaths[key],engine='pyarrow',columns=columns)
+
+
+    @classmethod
+    def get_session(cls):
+        """Returns the pooled requests Session shared by the downloads (failed
+        requests are retried per source by fetch_sources)"""
+        from project_functions import downloads
+        if cls._session is None:
+            cls._session = downloads.make_session(max_workers=len(cls.urls),retries=0)
+        return cls._session
+    
+    
+    
+    def download_us_daily(self,timeout=60):
         key = 'us'
-        data = self._download_data_key(key)
+        data = self._download_data_key(key,timeout=timeout)
 #         setattr(self,key,data)
         return data
         
         
-    def download_state_daily(self):
+    def download_state_daily(self,timeout=60):
         key = 'states'
-        data = self._download_data_key(key)#,read_kws={})
+        data = self._download_data_key(key,timeout=timeout)#,read_kws={})
 #         setattr(self,key,data)
         return data
     
-    def download_state_meta(self):
+    def download_state_meta(self,timeout=60):
         
         key = 'states_metadata'
-        data = self._download_data_key(key,read_kws={})
+        data = self._download_data_key(key,read_kws={},timeout=timeout)
         
         return data
          
 
+    def fetch_sources(self,keys=None,max_workers=3,timeout=60,retries=2,backoff=0.5):
+        """Downloads the sources concurrently (in max_workers threads), retrying
+        each failed source up to retries times. If any source still fails, one
+        Exception naming each failed source and its error is raised once all
+        sources are done (self.fetch_results has the results of all of them).
+
+        Args:
+            keys (list): keys of self.urls to fetch (default: all)
+            timeout (float or dict): seconds to wait for the server, or {key: seconds}
+            retries (int or dict): retries per source, or {key: retries}
+            backoff (float): seconds to wait before the first retry (doubled for each retry)
+
+        Returns:
+            fetch_results (dict): {key: {'success','seconds','bytes','attempts','error'}}
+                                  (also saved as self.fetch_results)
+        """
+        import time
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        methods = {'states_metadata':self.download_state_meta,
+                   'us':self.download_us_daily,'states':self.download_state_daily}
+        if keys is None:
+            keys = list(methods)
+
+        def fetch(key):
+            key_timeout = timeout.get(key,60) if isinstance(timeout,dict) else timeout
+            key_retries = retries.get(key,0) if isinstance(retries,dict) else retries
+            start = time.perf_counter()
+            for attempt in range(key_retries+1):
+                try:
+                    methods[key](timeout=key_timeout)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+                    if attempt<key_retries:
+                        time.sleep(backoff*2**attempt)
+            fpath = self.base_folder+key+'.csv'
+            return {'success':error is None,'seconds':time.perf_counter()-start,
+                    'bytes':self.download_results.get(fpath,{}).get('bytes',0) if error is None else 0,
+                    'attempts':attempt+1,'error':None if error is None else repr(error)}
+
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(fetch,key):key for key in keys}
+            for future in as_completed(futures):
+                key = futures[future]
+                self.fetch_results[key] = future.result()
+                if not self.fetch_results[key]['success']:
+                    errors[key] = self.fetch_results[key]
+
+        if len(errors)>0:
+            msg = f"[!] {len(errors)} of {len(keys)} sources failed to download:\n"
+            msg += '\n'.join([f"\t{key} ({result['attempts']} attempts, {self.urls[key]}): {result['error']}"
+                              for key,result in sorted(errors.items())])
+            raise Exception(msg)
+        return self.fetch_results
+
+
+    @property
+    def fetch_report(self):
+        """Frame of fetch_results (one row per source)"""
+        return pd.DataFrame.from_dict(self.fetch_results,orient='index')
+
     
     def _download_data_key(self,key,read_kws={'parse_dates':['date'],
-                                             'index_col':'date'}):
+                                             'index_col':'date'},timeout=60):
         #Fetch the corresponding url from self.urls"
         url = self.urls[key]
         
-        ## Get and load csv
-        data = self.get_csv_save_load(url,fpath=self.base_folder+key+'.csv',
-                                      read_kws=read_kws)
-        
-        ## Save to data dictionary
-        self._data[key] = data.copy()
+        ## Get and load csv (into the cache, as source key)
+        self.get_csv_save_load(url,fpath=self.base_folder+key+'.csv',
+                               read_kws=read_kws,timeout=timeout,key=key)
         
-        ## Remove dep cols before saving attr:
-        if key=='us':
-            good_cols = self.columns_us['good']
-        else: 
-            good_cols = self.columns['good']
-            
-        data = data[good_cols].copy()
-        
-        key_to_save = f"df_{key}"
-        setattr(self,key_to_save,data)
-
-        return data
+        ## Return the df_{key} attr (without the dep cols)
+        return getattr(self,f"df_{key}")
     
 #     @property
     def help(self):
@@ -901,15 +1463,21 @@ def set_freq_resample(df,date_col='Date',freq='D', agg_func='sum'):
     if isinstance(df.index,pd.DatetimeIndex)==False:
         df = set_datetime_index(df,col=date_col)
         
-    ts  = df.resample(freq).agg(agg_func).copy()
+    ts  = resample_numeric(df,freq=freq,agg_func=agg_func).copy()
     return ts
     
     
     
 def get_group_ts(df,group_name,group_col='state',
                      ts_col=None, freq='D', agg_func='sum'):
-        """Take df_us and extracts state's data as then Freq/Aggregation provided"""
+        """Take df_us and extracts state's data as then Freq/Aggregation provided.
+        df can also be a GroupTimeIndex of df_us (which avoids the groupby)."""
         from IPython.display import display
+        if isinstance(df,GroupTimeIndex):
+            if group_name not in df:
+                print("[!] ERROR!")
+                return None
+            return df.get_group_ts(group_name,ts_col=ts_col,freq=freq,agg_func=agg_func)
         try:
             ## Get state_df group
             group_df = df.groupby(group_col).get_group(group_name).copy()
@@ -952,6 +1520,89 @@ def get_group_ts(df,group_name,group_col='state',
     
     
     
+def _group_day_sums(df, group_col='state'):
+    """Sums every group's numeric columns by day in one pass. The rows' (group, day)
+    positions are computed once and all columns are summed into a single float64
+    array with np.bincount. Each group covers its own first to last day (days
+    without rows sum to 0, days outside of the group's range are NaN).
+
+    Returns:
+        panel (array): (n_days, n_groups*n_cols) array, panel[day, group*n_cols + col]
+        dates (DatetimeIndex): the days
+        groups (list): the groups (in order of appearance)
+        value_cols (Index): the summed columns
+        first_day, last_day (arrays): position of each group's first/last day
+    """
+    import numpy as np
+    import pandas as pd
+    if isinstance(df.index,pd.DatetimeIndex)==False:
+        df = set_datetime_index(df)
+
+    ## Integer group codes (in order of appearance) and days of each row
+    codes, groups = pd.factorize(df[group_col])
+    groups = list(groups)
+    keep = codes>=0
+    codes = codes[keep]
+    days = df.index.values.astype('datetime64[D]').astype(np.int64)[keep]
+    value_cols = df.select_dtypes(include=[np.number,'bool']).columns
+    values = df[value_cols].values.astype(np.float64)[keep]
+
+    ## Sum every column into panel[day, group*n_cols + col] (NaNs count as 0)
+    n_groups, n_cols = len(groups), len(value_cols)
+    start = days.min() if len(days)>0 else 0
+    n_days = (days.max()-start+1) if len(days)>0 else 0
+    cells = (days-start)*n_groups + codes
+
+    panel = np.empty((n_days,n_groups*n_cols))
+    for i in range(n_cols):
+        panel.reshape(-1)[i::n_cols] = np.bincount(cells,weights=np.nan_to_num(values[:,i]),
+                                                   minlength=n_days*n_groups)
+    dates = (np.arange(n_days)+start).astype('datetime64[D]').astype(df.index.dtype)
+    dates = pd.DatetimeIndex(dates,freq='D',name=df.index.name)
+
+    ## Each group covers its first to last day (NaN outside of it)
+    has_rows = np.bincount(cells,minlength=n_days*n_groups).reshape(n_days,n_groups)>0
+    first_day = has_rows.argmax(axis=0)
+    last_day = n_days-1-has_rows[::-1].argmax(axis=0)
+    for code in range(n_groups):
+        panel[:first_day[code],code*n_cols:(code+1)*n_cols] = np.nan
+        panel[last_day[code]+1:,code*n_cols:(code+1)*n_cols] = np.nan
+    return panel, dates, groups, value_cols, first_day, last_day
+
+
+
+def get_all_group_ts(df, group_col='state', as_panel=False):
+    """Daily sums of every group's numeric columns in one pass (same values as
+    calling get_group_ts for each group with freq='D' and agg_func='sum').
+    See _group_day_sums.
+
+    Args:
+        df (Frame): data with a DatetimeIndex and group_col
+        as_panel (bool): return one wide Frame with every group's
+                         "{group} - {col}" columns (NaN outside a group's days)
+
+    Returns:
+        GROUPS (dict): {group: Frame} views into one array (if as_panel=False)
+        panel (Frame): the wide Frame (if as_panel=True)
+    """
+    import pandas as pd
+    panel, dates, groups, value_cols, first_day, last_day = _group_day_sums(df,group_col)
+    n_cols = len(value_cols)
+
+    columns = [f"{group} - {col}" for group in groups for col in value_cols]
+    if as_panel:
+        return pd.DataFrame(panel,index=dates,columns=columns,copy=False)
+
+    GROUPS = {}
+    for code,group in enumerate(groups):
+        rows = slice(first_day[code],last_day[code]+1)
+        cols = slice(code*n_cols,(code+1)*n_cols)
+        GROUPS[group] = pd.DataFrame(panel[rows,cols],index=dates[rows],
+                                     columns=columns[cols],copy=False)
+    return GROUPS
+
+
+
 def plot_group_ts(df, group_list,group_col, plot_cols = ['Confirmed'],
                 df_only=False,
                 new_only=False,plot_scatter=True,show=False,
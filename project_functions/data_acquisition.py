@@ -8,25 +8,86 @@ import os,zipfile,json,joblib
 # sys.path.append('.')
 
 import functions as fn
+from project_functions import downloads, schema
 import datetime as dt
 today = dt.date.today().strftime("%m-%d-%Y")
 
+def _is_date_col(col):
+    """Returns True for JHU date column headers (e.g. '1/22/20')"""
+    return len(col.split('/'))>1
+
+
+def _open_zip(jhu_data_zip):
+    """Returns a ZipFile from either a ZipFile or a filepath to a .zip"""
+    if isinstance(jhu_data_zip,zipfile.ZipFile):
+        return jhu_data_zip
+    return zipfile.ZipFile(jhu_data_zip)
+
+
+def iter_raw_ts_file(jhu_data_zip, file = 'RAW_us_confirmed_cases.csv',
+                     mapper_path='data/state_names_to_codes_map.joblib',
+                     chunksize=500):
+    """Streams the csv member straight out of the zip archive (nothing is 
+    extracted to disk) and yields chunks of chunksize rows with State_Code added.
+    Only one chunk of rows is in memory at a time.
+
+    Args:
+        jhu_data_zip (ZipFile,str): zip archive (or filepath of the archive)
+        file (str): name of the csv inside of the archive
+        mapper_path (str,dict): joblib file of the state name to state code map
+                                (or the map itself)
+        chunksize (int,None): number of rows per chunk (None = a single chunk)
+
+    EXAMPLE USAGE:
+    >>> for chunk in iter_raw_ts_file('data_raw/RAW_us_deaths.csv.zip',
+                                      file='RAW_us_deaths.csv'):
+            ...
+    """
+    if isinstance(mapper_path,dict):
+        state_to_abbrevs_meta = mapper_path
+    else:
+        state_to_abbrevs_meta = joblib.load(mapper_path)
+    jhu_data_zip = _open_zip(jhu_data_zip)
+
+    ## Read the header once to build the dtype map
+    with jhu_data_zip.open(file) as f:
+        columns = pd.read_csv(f,nrows=0).columns
+    dtypes = schema.get_dtypes(columns,source='jhu_ts')
+
+    with jhu_data_zip.open(file) as f:
+        reader = pd.read_csv(f,dtype=dtypes,chunksize=chunksize)
+        if chunksize is None:
+            reader = [reader]
+
+        for data in reader:
+            ## Drop states not included in metadata
+            data.insert(1,'State_Code',data['Province_State'].map(state_to_abbrevs_meta))
+            data.dropna(subset=['State_Code'],inplace=True)
+            data['State_Code'] = data['State_Code'].astype('category')
+            yield schema.downcast(data)
+
+
 def load_raw_ts_file(jhu_data_zip, file = 'RAW_us_confirmed_cases.csv',
                      mapper_path='data/state_names_to_codes_map.joblib',
-                    verbose=True):
-    
+                    verbose=True,chunksize=None):
+    """Loads a JHU time series csv directly from the zip archive without
+    extracting it, parsed with the schema's dtypes (see schema.get_dtypes).
+
+    Args:
+        chunksize (int,None): if set, the file is parsed chunksize rows at a time
+                              to bound the parser's peak memory (see iter_raw_ts_file)
+    """
     if verbose: 
         print(f"- Loading data from {file}")
-    state_to_abbrevs_meta = joblib.load(mapper_path)
-    
-    ## Extract and load csv
-    jhu_data_zip.extract(file)
-    data = pd.read_csv(file)
-    
-    ## Drop states not included in metadata
-    data.insert(1,'State_Code',data['Province_State'].map(state_to_abbrevs_meta))
-    data.dropna(subset=['State_Code'],inplace=True)
-    return data
+
+    chunks = list(iter_raw_ts_file(jhu_data_zip,file=file,mapper_path=mapper_path,
+                                   chunksize=chunksize))
+    if len(chunks)==1:
+        return chunks[0]
+
+    ## Categories differ between chunks, so re-make categoricals after concat
+    data = pd.concat(chunks)
+    return schema.apply_schema(data,source='jhu_ts')
 
 
 
@@ -34,7 +95,16 @@ def melt_df_to_ts(df_cases,value_name, var_name='Date',
                   multi_index_cols=['State_Code','Date'],
                   id_cols = ['Province_State',"State_Code",'Admin2'],
                   cols_to_drop=['iso2','iso3','code3','UID','Country_Region',
-                                'Combined_Key','Lat','Long_','FIPS']):
+                                'Combined_Key','Lat','Long_','FIPS'],
+                  date_format='%m/%d/%y'):
+    """Reshapes a wide JHU time series (one column per date) into a long ts
+    indexed by multi_index_cols, with the value column named value_name.
+
+    The date header is parsed once and the long layout is built from the
+    values array with numpy repeats, already sorted by (group, date), instead
+    of pd.melt + pd.to_datetime on every cell + sort_index.
+    """
+    import numpy as np
     
 #     value_cols = [c for c in df_cases.columns if c not in [*cols_to_drop,*id_cols]]
     
@@ -46,46 +116,528 @@ def melt_df_to_ts(df_cases,value_name, var_name='Date',
     value_cols = [c for c in df_cases.columns if c not in [*id_cols,*cols_to_drop]]
     value_cols = list(filter(lambda x: len(x.split('/'))>1,value_cols))
     
-    
-    df_cases_ts = pd.melt(df_cases, 
-                          id_vars=id_cols, value_vars=value_cols,
-                          var_name=var_name, value_name=value_name)
-    
-    df_cases_ts['Date'] = pd.to_datetime(df_cases_ts['Date'])
-    df_cases_ts = df_cases_ts.set_index(multi_index_cols).sort_index()
+    ## Only (group, date) indexes can be built directly
+    if (len(multi_index_cols)!=2) or (multi_index_cols[1]!=var_name) or \
+        (multi_index_cols[0] not in id_cols):
+        df_cases_ts = pd.melt(df_cases, 
+                              id_vars=id_cols, value_vars=value_cols,
+                              var_name=var_name, value_name=value_name)
+        
+        df_cases_ts[var_name] = pd.to_datetime(df_cases_ts[var_name])
+        df_cases_ts = df_cases_ts.set_index(multi_index_cols).sort_index()
+        return df_cases_ts
+    group_col = multi_index_cols[0]
+
+    ## Parse the date header once (and put the dates in order)
+    dates = pd.to_datetime(value_cols,format=date_format)
+    date_order = np.argsort(dates,kind='mergesort')
+    dates = dates[date_order]
+    values = df_cases[value_cols].to_numpy()[:,date_order]
+    n_dates = len(dates)
+
+    ## Stable sort of the rows by group (counties keep their original order)
+    group_codes, groups = pd.factorize(df_cases[group_col],sort=True)
+    row_order = np.argsort(group_codes,kind='mergesort')
+    counts = np.bincount(group_codes,minlength=len(groups))
+    row_starts = np.cumsum(counts)-counts
+
+    ## Each group's block is laid out date-major: all rows for day 0, day 1...
+    n_out = counts*n_dates
+    group_idx = np.repeat(np.arange(len(groups)),n_out)
+    offset = np.arange(n_out.sum()) - np.repeat(np.cumsum(n_out)-n_out,n_out)
+    date_idx = offset // counts[group_idx]
+    row_idx = row_order[row_starts[group_idx] + offset % counts[group_idx]]
+
+    ## Build the sorted index from codes (no repeated labels are materialized)
+    index = pd.MultiIndex(levels=[pd.Index(groups),dates],
+                          codes=[group_idx,date_idx],
+                          names=multi_index_cols)
+
+    data = {}
+    for col in id_cols:
+        if col not in multi_index_cols:
+            data[col] = df_cases[col].values.take(row_idx)
+    data[value_name] = values[row_idx,date_idx]
+
+    df_cases_ts = pd.DataFrame(data,index=index)
     return df_cases_ts
 # help(fn)
 
 
-def get_hospital_data(verbose=False):
-    offset = 0
-    ## Getting Hospital Capacity Data
-    base_url = 'https://healthdata.gov/resource/g62h-syeh.csv'
-    page = 0
-    results = []
-    print(f"[i] Retrieving hospital data from {base_url}")
 
-    ## seting random, large page-len
-    page_len = 1000
+##################################################################################
+#### STATE PANEL
+def _sum_rows_by_group(df, group_col, value_cols):
+    """Sums the value_cols of df's rows within each group in a single
+    np.add.reduceat pass. Returns (groups, sums array of shape (n_groups,n_cols))"""
+    import numpy as np
+    codes, groups = pd.factorize(df[group_col],sort=True)
+    row_order = np.argsort(codes,kind='mergesort')
+    starts = np.searchsorted(codes[row_order],np.arange(len(groups)))
+    sums = np.add.reduceat(df[value_cols].to_numpy()[row_order],starts,
+                           axis=0,dtype=np.int64)
+    return np.asarray(groups), sums
+
+
+class StatePanel(object):
+    """Dense (n_states, n_days, n_metrics) array of state data with its axes.
+
+    Attributes:
+        values (ndarray): the panel array
+        states (Index): state codes (axis 0)
+        dates (DatetimeIndex): dates (axis 1)
+        metrics (Index): metric names (axis 2)
+
+    Panels can be saved as one contiguous array on disk (see save) and
+    memory-mapped by load, so getting one state only reads that state's pages
+    and processes loading the same panel share them. Indexing a panel by
+    state code works like the STATE_DICT dict of frames.
+
+    EXAMPLE USAGE:
+    >>> panel = StatePanel.from_county_frames([df_cases,df_deaths],['Cases','Deaths'])
+    >>> panel.get_state('MD')['Cases']
+    >>> STATES = StatePanel.load('data/state_panel')
+    >>> STATES['MD']
+    """
+    def __init__(self, values, states, dates, metrics):
+        self.values = values
+        self.states = pd.Index(states,name='State_Code')
+        self.dates = pd.DatetimeIndex(dates,name='Date')
+        self.metrics = pd.Index(metrics)
+        self._state_lookup = {state:i for i,state in enumerate(self.states)}
+
+    @property
+    def shape(self):
+        return self.values.shape
 
-    while (page_len>0):
+    def get_state(self, state):
+        """Returns a (dates x metrics) DataFrame of state's data (a view of values)"""
+        values = self.values[self._state_lookup[state]]
+        return pd.DataFrame(values,index=self.dates,columns=self.metrics,copy=False)
+
+    def __getitem__(self, state):
+        return self.get_state(state)
+
+    def __contains__(self, state):
+        return state in self._state_lookup
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __len__(self):
+        return len(self.states)
+
+    def keys(self):
+        return list(self.states)
+
+    def to_frame(self, group_col='State_Code', date_col='Date'):
+        """Returns the panel as a long frame with group_col, date_col and metric columns"""
+        import numpy as np
+        n_states, n_days, n_metrics = self.shape
+        data = {group_col: np.repeat(self.states.to_numpy(),n_days),
+                date_col: np.tile(self.dates.to_numpy(),n_states)}
+        values = self.values.reshape(n_states*n_days,n_metrics)
+        for i,metric in enumerate(self.metrics):
+            data[metric] = values[:,i]
+        return pd.DataFrame(data)
+
+    def update(self, other):
+        """Returns a new panel with other's values written over this panel's,
+        extending the state, date and metric axes as needed (e.g. for new days)"""
+        import numpy as np
+        states = self.states.union(other.states)
+        dates = self.dates.union(other.dates)
+        metrics = self.metrics.append(pd.Index([m for m in other.metrics
+                                                if m not in self.metrics]))
+
+        dtype = np.result_type(self.values,other.values)
+        fill_value = np.nan if dtype.kind=='f' else 0
+        values = np.full((len(states),len(dates),len(metrics)),fill_value,dtype=dtype)
+        for panel in [self,other]:
+            values[np.ix_(states.get_indexer(panel.states),
+                          dates.get_indexer(panel.dates),
+                          metrics.get_indexer(panel.metrics))] = panel.values
+        return StatePanel(values,states,dates,metrics)
+
+    def save(self, folder):
+        """Saves the panel to folder as values.npy (one contiguous array) and
+        axes.json (states, dates and metrics). Both are written to a temporary
+        folder that then replaces folder with os.replace, so a load never sees
+        the values of one version with the axes of another, and processes with
+        the old panel memory-mapped are not affected."""
+        import shutil,tempfile
+        import numpy as np
+        folder = os.path.normpath(folder)
+        parent = os.path.dirname(folder)
+        if parent:
+            os.makedirs(parent,exist_ok=True)
+
+        tmp_folder = tempfile.mkdtemp(prefix=f".{os.path.basename(folder)}.",dir=parent or '.')
+        old_folder = tmp_folder+'.old'
         try:
-            if verbose:
-                print(f"   - Page {page} (offset = {offset})")
-            url = base_url+f"?$offset={offset}"
-            df_temp = pd.read_csv(url)
-            results.append(df_temp)
-
-            page_len = len(df_temp)
-            offset+=page_len
-            page+=1
-        except Exception as e:
-            print('[!] ERROR:')
-            print(e)
-            print('-- returning raw results list instead of dataframe..')
-            return results
-        
-    return pd.concat(results)
+            os.chmod(tmp_folder,0o755)
+            np.save(os.path.join(tmp_folder,'values.npy'),np.ascontiguousarray(self.values))
+            axes = {'states':[str(state) for state in self.states],
+                    'dates':[date.strftime('%Y-%m-%d') for date in self.dates],
+                    'metrics':[str(metric) for metric in self.metrics]}
+            with open(os.path.join(tmp_folder,'axes.json'),'w') as f:
+                json.dump(axes,f)
+
+            ## (os.replace can't replace a non-empty folder, so the old one is moved aside first)
+            if os.path.exists(folder):
+                os.replace(folder,old_folder)
+            os.replace(tmp_folder,folder)
+        except BaseException:
+            if os.path.exists(old_folder) and not os.path.exists(folder):
+                os.replace(old_folder,folder)
+            shutil.rmtree(tmp_folder,ignore_errors=True)
+            raise
+        shutil.rmtree(old_folder,ignore_errors=True)
+        return folder
+
+    @classmethod
+    def load(cls, folder, mmap_mode='r'):
+        """Loads a panel saved with save, memory-mapping the values
+        (mmap_mode=None loads them into memory instead)"""
+        import numpy as np
+        values = np.load(os.path.join(folder,'values.npy'),mmap_mode=mmap_mode)
+        with open(os.path.join(folder,'axes.json')) as f:
+            axes = json.load(f)
+        return cls(values,axes['states'],pd.to_datetime(axes['dates']),axes['metrics'])
+
+    @classmethod
+    def from_frame(cls, df, group_col='State_Code', date_col='Date',
+                   metrics=None, dtype='float64'):
+        """Makes a dense panel from a long frame (e.g. the combined data).
+        State-days missing from df are NaN.
+
+        Args:
+            metrics (list): columns to include. Defaults to all numeric columns.
+        """
+        import numpy as np
+        if isinstance(df.index,pd.MultiIndex):
+            df = df.reset_index()
+        if metrics is None:
+            metrics = [c for c in df.columns if (c not in [group_col,date_col]) and
+                       pd.api.types.is_numeric_dtype(df[c])]
+
+        state_idx, states = pd.factorize(df[group_col],sort=True)
+        date_idx, dates = pd.factorize(df[date_col],sort=True)
+        values = np.full((len(states),len(dates),len(metrics)),np.nan,dtype=dtype)
+        for m,col in enumerate(metrics):
+            values[state_idx,date_idx,m] = df[col].to_numpy(dtype=dtype,na_value=np.nan)
+        return cls(values,np.asarray(states),dates,metrics)
+
+    @classmethod
+    def from_county_frames(cls, frames, metrics, group_col='State_Code',
+                           date_format='%m/%d/%y'):
+        """Sums the county rows of wide JHU frames (one column per date) into a
+        (n_states, n_days, n_metrics) panel without melting them first.
+
+        Args:
+            frames (list): one wide frame per metric (e.g. from load_raw_ts_file).
+                           Each may also be an iterable of chunks (see iter_raw_ts_file).
+            metrics (list): metric name for each frame (e.g. ['Cases','Deaths'])
+        """
+        import numpy as np
+        metric_sums, metric_dates = [], []
+
+        for frame in frames:
+            chunks = [frame] if isinstance(frame,pd.DataFrame) else frame
+
+            ## Accumulate the state sums chunk by chunk
+            state_sums = {}
+            date_cols = None
+            for chunk in chunks:
+                chunk_date_cols = [c for c in chunk.columns if _is_date_col(c)]
+                if date_cols is None:
+                    date_cols = chunk_date_cols
+                elif chunk_date_cols!=date_cols:
+                    raise Exception("All chunks of a frame must have the same date columns.")
+                groups, sums = _sum_rows_by_group(chunk,group_col,date_cols)
+                for state, row in zip(groups,sums):
+                    if state in state_sums:
+                        state_sums[state] += row
+                    else:
+                        state_sums[state] = row
+            metric_sums.append(state_sums)
+            metric_dates.append(pd.to_datetime(date_cols,format=date_format))
+
+        ## Align the frames on the union of their dates (in order). Days missing
+        ## from some of the frames are NaN (so the panel is then float64).
+        dates = metric_dates[0]
+        for frame_dates in metric_dates[1:]:
+            dates = dates.union(frame_dates)
+        dates = dates.unique().sort_values()
+        is_aligned = all([len(frame_dates)==len(dates) for frame_dates in metric_dates])
+        dtype, fill_value = (np.int64,0) if is_aligned else (np.float64,np.nan)
+
+        ## Fill the dense panel
+        states = sorted(set().union(*[state_sums.keys() for state_sums in metric_sums]))
+        values = np.full((len(states),len(dates),len(metrics)),fill_value,dtype=dtype)
+        for m,(state_sums,frame_dates) in enumerate(zip(metric_sums,metric_dates)):
+            date_idx = dates.get_indexer(frame_dates)
+            for i,state in enumerate(states):
+                if state in state_sums:
+                    values[i,date_idx,m] = state_sums[state]
+                elif not is_aligned:
+                    values[i,date_idx,m] = 0
+        return cls(values,states,dates,metrics)
+
+
+def load_state_panel(folder=os.path.join('data','state_panel'), mmap_mode='r'):
+    """Loads the memory-mapped StatePanel of the combined state data saved by
+    FULL_WORKFLOW (a faster alternative to loading STATE_DICT.joblib)"""
+    return StatePanel.load(folder,mmap_mode=mmap_mode)
+
+
+
+##################################################################################
+#### INTEGER (STATE, DAY) KEYS
+def encode_state_day_keys(state_codes, dates, states):
+    """Encodes (state code, date) pairs as single int64 keys:
+    (position of the state in states << 32) + days since 1970-01-01.
+    Keys sort in the same order as (state code, date) if states is sorted."""
+    import numpy as np
+    state_idx = pd.Index(states).get_indexer(state_codes).astype(np.int64)
+    days = np.asarray(dates,dtype='datetime64[D]').astype(np.int64)
+    return (state_idx<<32) + days
+
+
+def sort_merge_align(left_keys, right_keys, how='inner'):
+    """Aligns two sorted arrays of unique keys in one forward pass
+    (np.searchsorted of sorted keys into sorted keys).
+
+    Args:
+        how (str): 'inner' (only matched keys) or 'left' (all left keys)
+
+    Returns:
+        left_idx, right_idx (arrays): positions of the aligned rows 
+                                      (right_idx=-1 where a left key has no match)
+    """
+    import numpy as np
+    for side,keys in [('left',left_keys),('right',right_keys)]:
+        if (len(keys)>1) and not np.all(keys[1:]>keys[:-1]):
+            raise Exception(f"The {side} keys must be sorted and unique.")
+
+    pos = np.searchsorted(right_keys,left_keys)
+    pos_clipped = np.minimum(pos,max(len(right_keys)-1,0))
+    if len(right_keys)>0:
+        matched = right_keys[pos_clipped]==left_keys
+    else:
+        matched = np.zeros(len(left_keys),dtype=bool)
+
+    if how=='inner':
+        left_idx = np.flatnonzero(matched)
+        return left_idx, pos[left_idx]
+    elif how=='left':
+        return np.arange(len(left_keys)), np.where(matched,pos,-1)
+    else:
+        raise Exception('The value for "how" must be either "inner" or "left"')
+
+
+def _get_col_or_level(df, col):
+    """Returns df's values for col, from either its columns or its index"""
+    if col in df.columns:
+        return df[col].to_numpy()
+    return df.index.get_level_values(col).to_numpy()
+
+
+def merge_state_day(left, right, how='inner', state_col='State_Code',
+                    date_col='Date', suffixes=('_x','_y')):
+    """Joins two frames on (state_col, date_col), which may be either columns
+    or index levels (so no reset_index copies are needed).
+
+    Instead of a hash join on strings/datetimes, both sides are encoded as
+    integer (state, day) keys and aligned with sort_merge_align. Sources that 
+    are already sorted by (state, date) (e.g. StatePanel.to_frame, or frames
+    after sort_index) are aligned without being re-sorted.
+
+    Raises:
+        Exception: if either side has duplicated (state, date) pairs
+
+    Returns:
+        df (Frame): state_col, date_col, then left's and right's other columns
+    """
+    import numpy as np
+    from pandas.api.extensions import take
+
+    sides = []
+    for df in [left,right]:
+        state_codes = _get_col_or_level(df,state_col)
+        dates = _get_col_or_level(df,date_col)
+        sides.append([df,state_codes,dates])
+
+    states = pd.Index(pd.unique(np.concatenate([pd.unique(side[1]) for side in sides])))
+    states = states.sort_values()
+
+    ## Encode, then only sort a side if it is not sorted already
+    aligned_keys, orders = [], []
+    for df,state_codes,dates in sides:
+        keys = encode_state_day_keys(state_codes,dates,states)
+        if (len(keys)>1) and not np.all(keys[1:]>=keys[:-1]):
+            order = np.argsort(keys,kind='mergesort')
+            keys = keys[order]
+        else:
+            order = None
+        if (len(keys)>1) and np.any(keys[1:]==keys[:-1]):
+            raise Exception(f"Duplicated ({state_col}, {date_col}) pairs found.")
+        aligned_keys.append(keys)
+        orders.append(order)
+
+    left_idx, right_idx = sort_merge_align(*aligned_keys,how=how)
+    if orders[0] is not None:
+        left_idx = orders[0][left_idx]
+    if orders[1] is not None:
+        right_idx = np.where(right_idx<0,-1,orders[1][right_idx])
+
+    ## Build the joined frame from the aligned positions
+    data = {state_col:sides[0][1][left_idx],
+            date_col:sides[0][2][left_idx]}
+    left_cols = [c for c in left.columns if c not in [state_col,date_col]]
+    right_cols = [c for c in right.columns if c not in [state_col,date_col]]
+    for df,cols,idx,suffix,other_cols in [(left,left_cols,left_idx,suffixes[0],right_cols),
+                                          (right,right_cols,right_idx,suffixes[1],left_cols)]:
+        for col in cols:
+            name = col+suffix if col in other_cols else col
+            data[name] = take(df[col].array,idx,allow_fill=True)
+    return pd.DataFrame(data)
+
+
+
+HOSPITAL_DATA_URL = 'https://healthdata.gov/resource/g62h-syeh.csv'
+
+
+def get_hospital_count(base_url=HOSPITAL_DATA_URL, where=None, session=None,
+                       timeout=60):
+    """Returns the number of rows in the hospital dataset (that match where)"""
+    import io
+    if session is None:
+        session = downloads.make_session()
+
+    params = {'$select':'count(*)'}
+    if where is not None:
+        params['$where'] = where
+    response = session.get(base_url,params=params,timeout=timeout)
+    response.raise_for_status()
+    return int(pd.read_csv(io.BytesIO(response.content)).iloc[0,0])
+
+
+def get_hospital_data(verbose=False,where=None,base_url=HOSPITAL_DATA_URL,
+                      page_len=1000,max_workers=8,timeout=60,
+                      checkpoint_dir=os.path.join('data_raw','hospital_pages'),
+                      keep_checkpoint=False,columns=None,dtypes=None):
+    """Retrieves the HHS hospital capacity data.
+    
+    The total row count is requested first, then all pages of page_len rows are
+    fetched concurrently by max_workers threads sharing one pooled session.
+    Each completed page is saved to checkpoint_dir, so a run that is interrupted
+    (or has failed pages) resumes with only the missing pages when re-run.
+
+    Args:
+        where (str): optional SoQL filter (e.g. "date>='2021-08-01'")
+        base_url (str): url of the csv resource (e.g. a LocalServer stand-in)
+        keep_checkpoint (bool): keep the saved pages after a successful run
+        columns (list): only request these columns from the server ($select)
+        dtypes (dict): read_csv dtypes for parsing the pages
+                       (defaults to categoricals for the id columns,
+                       see schema.get_dtypes)
+
+    Raises:
+        Exception: if any pages still fail after retrying (lists the failures)
+    """
+    import hashlib,shutil
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    session = downloads.make_session(max_workers=max_workers)
+    n_rows = get_hospital_count(base_url,where=where,session=session,timeout=timeout)
+    offsets = list(range(0,n_rows,page_len))
+    print(f"[i] Retrieving {n_rows} rows of hospital data from {base_url}")
+
+    ## Pages are saved in a folder specific to this query (not to its row count,
+    ## so a resumed run keeps its pages if the dataset grew in the meantime)
+    query = f"{base_url}|{where}|{None if columns is None else sorted(columns)}|{page_len}"
+    page_dir = os.path.join(checkpoint_dir,hashlib.md5(query.encode()).hexdigest()[:12])
+    os.makedirs(page_dir,exist_ok=True)
+
+    ## Page filenames include their expected row count, so a page saved while it
+    ## was the (partial) last page is fetched again once there are more rows
+    page_fpaths = {offset:os.path.join(page_dir,f"page_{offset:09d}_{min(page_len,n_rows-offset)}.csv")
+                   for offset in offsets}
+    current = set(os.path.basename(fpath) for fpath in page_fpaths.values())
+    for fname in os.listdir(page_dir):
+        if fname not in current:
+            os.remove(os.path.join(page_dir,fname))
+    missing = [offset for offset in offsets if not os.path.exists(page_fpaths[offset])]
+    if verbose and (len(missing)<len(offsets)):
+        print(f"   - Resuming: {len(offsets)-len(missing)} of {len(offsets)} pages already saved.")
+
+
+    def fetch_page(offset):
+        params = {'$limit':page_len,'$offset':offset,'$order':':id'}
+        if where is not None:
+            params['$where'] = where
+        if columns is not None:
+            params['$select'] = ','.join(columns)
+        response = session.get(base_url,params=params,timeout=timeout)
+        response.raise_for_status()
+
+        ## Write to a temp file first so partial pages are never checkpointed
+        fpath = page_fpaths[offset]
+        with open(fpath+'.tmp','wb') as f:
+            f.write(response.content)
+        os.replace(fpath+'.tmp',fpath)
+        return len(response.content)
+
+
+    start = dt.datetime.now()
+    errors = {}
+    n_bytes = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_page,offset):offset for offset in missing}
+        for future in as_completed(futures):
+            offset = futures[future]
+            try:
+                n_bytes += future.result()
+                if verbose:
+                    print(f"   - Page {offset//page_len} (offset = {offset})")
+            except Exception as e:
+                errors[offset] = e
+    session.close()
+
+    if len(errors)>0:
+        msg = f"[!] {len(errors)} of {len(offsets)} pages failed. Completed pages "+\
+              f"are saved in {page_dir} - re-run to resume:\n"
+        msg += '\n'.join([f"\toffset={offset}: {e}" for offset,e in sorted(errors.items())])
+        raise Exception(msg)
+
+    if verbose:
+        secs = (dt.datetime.now()-start).total_seconds()
+        print(f"   - Fetched {len(missing)} pages ({n_bytes/1e6:.1f} MB) in {secs:.1f} sec.")
+
+    if len(offsets)==0:
+        return pd.DataFrame()
+    if dtypes is None:
+        header = pd.read_csv(page_fpaths[offsets[0]],nrows=0).columns
+        dtypes = schema.get_dtypes(header)
+    df = pd.concat([pd.read_csv(page_fpaths[offset],dtype=dtypes) for offset in offsets],
+                   ignore_index=True)
+
+    ## Categories differ between pages, so re-make categoricals after concat
+    df = schema.apply_schema(df)
+    if not keep_checkpoint:
+        shutil.rmtree(page_dir)
+    return df
+
+def get_hospital_schema(base_url=HOSPITAL_DATA_URL, session=None, timeout=60):
+    """Returns the hospital dataset's column names (from a single-row request)"""
+    import io
+    if session is None:
+        session = downloads.make_session()
+    response = session.get(base_url,params={'$limit':1},timeout=timeout)
+    response.raise_for_status()
+    return list(pd.read_csv(io.BytesIO(response.content),nrows=0).columns)
+
 
 class ColumnDict(dict):
     """Inherits from a normal dictionary.
@@ -118,16 +670,18 @@ class ColumnDict(dict):
             keep (None, True, False): determines subset of columns returned
             # Adapter from: https://www.geeksforgeeks.org/python-concatenate-dictionary-value-lists/
             """
+        ## Duplicates are dropped with dict.fromkeys (not set) to keep a
+        ## deterministic order (e.g. for the hospital download's checkpoint key)
         if keep is None:
             from itertools import chain
-            return [*self.id_cols,*set(list(chain(*self.values())))]
+            return [*self.id_cols,*dict.fromkeys(chain(*self.values()))]
         
         elif keep==True:
-            col_list = list(set(self.keep_cols[keep]))
+            col_list = list(dict.fromkeys(self.keep_cols[keep]))
             return [*self.id_cols, *[c for c in col_list if c not in self.id_cols]]
 #             return list(set([*self.id_cols,*]))
         elif keep==False:
-            return list(set(self.keep_cols[keep]))
+            return list(dict.fromkeys(self.keep_cols[keep]))
 
         
         
@@ -135,7 +689,7 @@ class ColumnDict(dict):
         """Saves lists of column names as values in dict
         Args:
             Expresssions (str,list): patterns to find in column names 
-            df (DataFrame): dataframe to check
+            df (DataFrame,list): dataframe (or list of column names) to check
             keep (bool): saves expr and cols keep_cols/keep_keys as True or False
             
         TO DO:
@@ -152,9 +706,10 @@ class ColumnDict(dict):
             
         if isinstance(expressions,str):
                 expressions = [expressions]
+        columns = df.columns if hasattr(df,'columns') else df
                 
         for expr in expressions:
-            found_cols = [c for c in df.columns if expr in c]
+            found_cols = [c for c in columns if expr in c]
             self[expr] = found_cols
 
             ## Save exression and fond_cols to keep_keys/keep_cols
@@ -164,30 +719,467 @@ class ColumnDict(dict):
 
 
 
+##################################################################################
+#### PARTITIONED STATE STORE
+def _state_partition_fpath(path, state, group_col='State_Code'):
+    """Returns the filepath of a state's partition (hive-style folder naming)"""
+    return os.path.join(path,f"{group_col}={state}",'data.parquet')
+
+
+def list_store_states(path=os.path.join('data','state_store'),group_col='State_Code'):
+    """Returns sorted list of the states saved in the state store at path"""
+    prefix = f"{group_col}="
+    if not os.path.isdir(path):
+        return []
+    return sorted([folder[len(prefix):] for folder in os.listdir(path)
+                   if folder.startswith(prefix)])
+
+
+def save_state_partition(df_state, state, path=os.path.join('data','state_store'),
+                         group_col='State_Code', date_col='Date',row_group_days=31):
+    """Saves (or replaces) a single state's partition of the state store.
+    Rows are sorted by date and split into row groups of row_group_days so
+    date-range reads can skip the row groups outside of the range."""
+    fpath = _state_partition_fpath(path,state,group_col=group_col)
+    os.makedirs(os.path.dirname(fpath),exist_ok=True)
+
+    if group_col in df_state.columns:
+        df_state = df_state.drop(columns=group_col)
+    df_state = df_state.sort_values(date_col)
+    df_state.to_parquet(fpath,engine='pyarrow',index=False,
+                        row_group_size=row_group_days)
+    return fpath
+
+
+def save_state_store(df, path=os.path.join('data','state_store'),
+                     group_col='State_Code', date_col='Date',
+                     row_group_days=31, verbose=True):
+    """Saves df as a columnar parquet dataset partitioned by group_col, with one
+    folder per state (e.g. data/state_store/State_Code=MD/data.parquet).
+
+    Args:
+        df (Frame): long-format data with group_col and date_col columns
+        path (str): folder to save the store to (replaced if it exists)
+        row_group_days (int): number of days of data per parquet row group
+
+    Returns:
+        path (str): the folder of the saved store
+    """
+    import shutil
+    if isinstance(df.index,pd.MultiIndex):
+        df = df.reset_index()
+
+    ## Replace any previous version of the store
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path,exist_ok=True)
+
+    for state, df_state in df.groupby(group_col):
+        save_state_partition(df_state, state, path=path, group_col=group_col,
+                             date_col=date_col, row_group_days=row_group_days)
+    if verbose:
+        print(f"[i] State store saved to {path}")
+    return path
+
+
+def _row_group_in_range(row_group, date_col, start=None, end=None):
+    """Uses a row group's min/max statistics for date_col to check if it could
+    contain dates between start and end. Returns True if the stats are missing."""
+    if (start is None) and (end is None):
+        return True
+
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        if column.path_in_schema != date_col:
+            continue
+
+        stats = column.statistics
+        if (stats is None) or (not stats.has_min_max):
+            return True
+
+        ## Only compare datetime-like stats (older writers store raw ints)
+        if isinstance(stats.min,(int,float)):
+            return True
+        try:
+            rg_min, rg_max = pd.Timestamp(stats.min), pd.Timestamp(stats.max)
+        except (TypeError,ValueError):
+            return True
+
+        if (start is not None) and (rg_max < start):
+            return False
+        if (end is not None) and (rg_min > end):
+            return False
+        return True
+    return True
+
+
+def load_state_store(path=os.path.join('data','state_store'), states=None,
+                     start=None, end=None, columns=None,
+                     group_col='State_Code', date_col='Date'):
+    """Loads data from the partitioned state store, only reading the partitions
+    for states, the row groups overlapping start-end, and the requested columns.
+
+    Args:
+        path (str): folder of the state store
+        states (str,list): state code(s) to load. Defaults to all states.
+        start,end (str,Timestamp): inclusive date range. Defaults to all dates.
+        columns (list): metric columns to load. Defaults to all columns.
+
+    Returns:
+        df (Frame): long-format frame with group_col, date_col and columns
+
+    EXAMPLE USAGE:
+    >>> df = load_state_store(states=['MD','VA'],start='2021-01-01',
+                              columns=['Cases','Deaths'])
+    """
+    import pyarrow.parquet as pq
+
+    if states is None:
+        states = list_store_states(path,group_col=group_col)
+    elif isinstance(states,str):
+        states = [states]
+
+    if isinstance(columns,str):
+        columns = [columns]
+    if columns is not None:
+        columns = [date_col,*[c for c in columns if c not in [group_col,date_col]]]
+
+    start = None if start is None else pd.Timestamp(start)
+    end = None if end is None else pd.Timestamp(end)
+
+    frames = []
+    for state in states:
+        fpath = _state_partition_fpath(path,state,group_col=group_col)
+        if not os.path.exists(fpath):
+            continue
+
+        ## Skip row groups that are entirely outside of the date range
+        pfile = pq.ParquetFile(fpath)
+        row_groups = [i for i in range(pfile.num_row_groups)
+                      if _row_group_in_range(pfile.metadata.row_group(i),
+                                             date_col, start, end)]
+        if len(row_groups)==0:
+            continue
+        df_state = pfile.read_row_groups(row_groups,columns=columns).to_pandas()
+
+        ## Trim the partial row groups at the edges of the range
+        if start is not None:
+            df_state = df_state.loc[df_state[date_col]>=start]
+        if end is not None:
+            df_state = df_state.loc[df_state[date_col]<=end]
+
+        df_state.insert(0,group_col,state)
+        frames.append(df_state)
+
+    if len(frames)==0:
+        return pd.DataFrame(columns=[group_col,*(columns or [date_col])])
+    return pd.concat(frames,ignore_index=True)
+
+
+
 
 
 
 ##################################################################################
-def FULL_WORKFLOW(save_state_csvs=False):
-    """Run entire data acquisiton process
+#### WORKFLOW STEPS
+## JHU time series file for each metric
+JHU_TS_FILES = {'Cases':'RAW_us_confirmed_cases.csv',
+                'Deaths':'RAW_us_deaths.csv'}
+MANIFEST_FNAME = 'workflow_manifest.json'
+
+
+def download_jhu_data(fpath_raw='data_raw',cache=None):
+    """Downloads the kaggle jhu dataset (only if it changed since the zip in
+    fpath_raw was downloaded, see datasets.DatasetCache) and returns the zipfile object"""
+    from project_functions.datasets import DatasetCache
+    if cache is None:
+        cache = DatasetCache(fpath_raw)
+    print("[i] Retrieving kaggle dataset: antgoldbloom/covid19-data-from-john-hopkins-university")
+    result = cache.fetch('antgoldbloom/covid19-data-from-john-hopkins-university')
+    return zipfile.ZipFile(result['zip_path'])
+
+
+## Hospital column expressions to keep/drop (see ColumnDict.find_expr_cols)
+HOSPITAL_DROP_EXPRESSIONS = ['staff','previous_day','coverage','onset']
+HOSPITAL_KEEP_EXPRESSIONS = ['inpatient_bed','adult_icu_bed','utilization',
+                             'total_adult_patients','total_pediatric_patients',
+                             'percent_of_inpatients_with_covid','deaths']
+## Raw hospital id columns and their new names
+HOSPITAL_ID_COLS = {'state':'State_Code','date':'Date'}
+
+
+def make_hospital_columns(columns):
+    """Resolves the hospital keep/drop expressions against columns (the
+    dataset's column names) and returns the ColumnDict"""
+    columns = [c for c in columns if c not in HOSPITAL_ID_COLS]
+    
+    #### SIFT THROUGH COLUMNS
+    COLUMNS = ColumnDict(id_cols=['State_Code','Date'])
+
+    ## saving names to DROP to COLUMNS dict
+    COLUMNS.find_expr_cols(HOSPITAL_DROP_EXPRESSIONS,columns,keep=False)
+
+    ## saving names to KEEP to COLUMNS dict
+    COLUMNS.find_expr_cols(HOSPITAL_KEEP_EXPRESSIONS,columns,keep=True)
+    return COLUMNS
+
+
+def prep_hospital_data(df1, COLUMNS=None):
+    """Renames and sorts the raw hospital data and keeps only the columns
+    COLUMNS keeps. If COLUMNS is None, it is made from df1's columns.
+
+    Returns:
+        df_hospitals (Frame): hospital data indexed by State_Code, Date
+        COLUMNS (ColumnDict): the column lists used
+    """
+    if COLUMNS is None:
+        COLUMNS = make_hospital_columns(df1.columns)
+
+    df1 = df1.rename(HOSPITAL_ID_COLS,axis=1)
+    df1['Date'] = pd.to_datetime(df1['Date'])
+    df1 = df1.sort_values(['State_Code','Date'])
+
+    ## Making df_hospitals
+    df_hospitals = df1[COLUMNS.get_all_values(keep=True)].copy()
+    df_hospitals = df_hospitals.set_index(COLUMNS.id_cols).sort_index()
+    return df_hospitals, COLUMNS
+
+
+def download_hospital_data(COLUMNS=None, where=None, **kwargs):
+    """Downloads and preps the hospital data, requesting only the columns kept
+    by COLUMNS (resolved from the dataset's schema first if COLUMNS is None),
+    parsed with the schema's dtypes (see schema.get_dtypes).
+
+    Args:
+        where (str): optional SoQL filter
+        kwargs: passed to get_hospital_data
+
+    Returns:
+        df_hospitals (Frame): hospital data indexed by State_Code, Date
+        COLUMNS (ColumnDict): the column lists used
+    """
+    base_url = kwargs.pop('base_url',HOSPITAL_DATA_URL)
+    if COLUMNS is None:
+        COLUMNS = make_hospital_columns(get_hospital_schema(base_url))
+
+    ## Request the raw names of the id columns + the columns to keep
+    raw_names = {v:k for k,v in HOSPITAL_ID_COLS.items()}
+    select_cols = [raw_names.get(c,c) for c in COLUMNS.get_all_values(keep=True)]
+
+    df1 = get_hospital_data(where=where,base_url=base_url,columns=select_cols,
+                            dtypes=schema.get_dtypes(select_cols,source='hospital'),
+                            **kwargs)
+    return prep_hospital_data(df1,COLUMNS=COLUMNS)
+
+
+def save_state_files(df_states, fpath_clean='data/', states=None,
+                     save_state_csvs=False, save_store=True, save_state_dict=True):
+    """Saves the per-state csv.gz/store partitions for states (defaults to all
+    states) of df_states (combined data indexed by State_Code and Date).
+    STATE_DICT.joblib ({state: frame}) is always rewritten with all states if
+    save_state_dict (StatePanel/load_state_panel is the lighter replacement)."""
+    DATA_FOLDER = os.path.join(fpath_clean,'state_data/')
+    os.makedirs(DATA_FOLDER,exist_ok=True)
+    if states is None:
+        states = list(df_states.index.unique(level='State_Code'))
+
+    if save_state_csvs or save_store:
+        states = set(states)
+        for state, df_state in df_states.groupby(level='State_Code'):
+            if state not in states:
+                continue
+            df_state = df_state.droplevel('State_Code')
+            if save_state_csvs:
+                df_state.to_csv(f"{DATA_FOLDER}combined_data_{state}.csv.gz",compression='gzip')
+            if save_store:
+                save_state_partition(df_state.reset_index(),state,
+                                     path=os.path.join(fpath_clean,'state_store'))
+
+    if save_state_dict:
+        STATES = {state:df_state.droplevel('State_Code')
+                  for state, df_state in df_states.groupby(level='State_Code')}
+        joblib.dump(STATES,os.path.join(fpath_clean,'STATE_DICT.joblib'))
+
+
+def save_county_cases_deaths(df_cases, df_deaths, fpath_clean='data/'):
+    """Melts the county-level JHU cases and deaths, merges them and saves them
+    as us_states_cases_deaths.csv"""
+    ## Prep df_cases_ts and df_deaths_ts
+    df_cases_ts = melt_df_to_ts(df_cases,'Cases')
+    df_deaths_ts = melt_df_to_ts(df_deaths,'Deaths')
+
+    ## Merge df_cases_ts and df_deaths_ts
+    df_cases_deaths_ts = pd.merge(df_cases_ts.reset_index(), df_deaths_ts.reset_index(),
+                                  on=['Province_State','State_Code','Admin2','Date'],
+                                  validate='one_to_one')
+    df_cases_deaths_ts.to_csv(os.path.join(fpath_clean,'us_states_cases_deaths.csv'),index=True)
+
+
+#### INCREMENTAL UPDATES
+def get_zip_member_signature(jhu_data_zip, file):
+    """Returns a signature of a zip member (its CRC-32 and size) taken from
+    the archive's directory, so the member itself does not need to be read."""
+    info = _open_zip(jhu_data_zip).getinfo(file)
+    return f"{info.CRC:08x}-{info.file_size}"
+
+
+def hash_date_columns(df):
+    """Returns dict of {date column: md5 hash of the column's values}"""
+    import hashlib
+    import numpy as np
+    hashes = {}
+    for col in df.columns:
+        if _is_date_col(col):
+            values = np.ascontiguousarray(df[col].to_numpy(dtype='int64'))
+            hashes[col] = hashlib.md5(values.tobytes()).hexdigest()
+    return hashes
+
+
+def load_manifest(fpath):
+    """Loads the workflow manifest json (returns empty manifest if missing)"""
+    if not os.path.exists(fpath):
+        return {'last_date':None,'files':{},'columns':{}}
+    with open(fpath) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, fpath):
+    with open(fpath,'w') as f:
+        json.dump(manifest,f)
+
+
+def INCREMENTAL_WORKFLOW(save_state_csvs=False,save_store=True,save_state_dict=True,
+                         save_county_data=True):
+    """Updates the outputs of a previous FULL_WORKFLOW run with only the new
+    or revised days of the JHU data, using the manifest it saved.
+
+    - JHU files with an unchanged zip signature are not loaded at all.
+    - Otherwise, only the date columns whose hash changed are summed into
+      the saved CASES_DEATHS_PANEL.
+    - Hospital data is only fetched from the first changed day onwards, and
+      only the rows of each state from that day on are replaced in the
+      combined data, the state panel, the per-state files and
+      STATE_DICT.joblib (if save_state_dict). (Hospital revisions to earlier
+      days are picked up by the next full run.)
+    - us_states_cases_deaths.csv (if save_county_data) is rebuilt from the
+      whole county files, as it has no per-day partitions.
 
     Returns:
         df_states (Frame): combined dataframe of all state data 
-        STATES (dict): dict of individual state data
+        STATES (StatePanel): each state's data by state code (see StatePanel)
     """
     start = dt.datetime.now()
-    
-    print(f"========= RUNNING FULL WORKFLOW =========")
-    ## Specifying data storage folders
+    print(f"========= RUNNING INCREMENTAL WORKFLOW =========")
     fpath_raw = r"data_raw"
     fpath_clean = r"data/"
-    [os.makedirs(fpath,exist_ok=True) for fpath in [fpath_clean,fpath_raw]]
+    manifest_path = os.path.join(fpath_clean,MANIFEST_FNAME)
+    manifest = load_manifest(manifest_path)
+    mapper_path = os.path.join(fpath_clean,'state_names_to_codes_map.joblib')
 
-    print("[i] Retrieving kaggle dataset: antgoldbloom/covid19-data-from-john-hopkins-university")
-    ## Download kaggle jhu data and make zipfile object
-    os.system(f'kaggle datasets download -p "{fpath_raw}" -d antgoldbloom/covid19-data-from-john-hopkins-university')
-    jhu_data_zip = zipfile.ZipFile(os.path.join(fpath_raw,'covid19-data-from-john-hopkins-university.zip'))
+    jhu_data_zip = download_jhu_data(fpath_raw)
+
+    ## Find the new/revised date columns of each file
+    changed_panels, county_data = [], {}
+    for metric,file in JHU_TS_FILES.items():
+        signature = get_zip_member_signature(jhu_data_zip,file)
+        if manifest['files'].get(file)==signature:
+            continue
+
+        data = load_raw_ts_file(jhu_data_zip,file=file,mapper_path=mapper_path)
+        county_data[metric] = data
+        col_hashes = hash_date_columns(data)
+        old_hashes = manifest['columns'].get(file,{})
+        changed_cols = [c for c,h in col_hashes.items() if old_hashes.get(c)!=h]
+
+        if len(changed_cols)>0:
+            id_cols = [c for c in data.columns if not _is_date_col(c)]
+            changed_panels.append(StatePanel.from_county_frames([data[[*id_cols,*changed_cols]]],
+                                                                metrics=[metric]))
+        manifest['files'][file] = signature
+        manifest['columns'][file] = col_hashes
+
+    combined_fpath = os.path.join(fpath_clean,'combined_us_states_full_data.csv')
+    panel_folder = os.path.join(fpath_clean,'state_panel')
+    df_states = pd.read_csv(combined_fpath,parse_dates=['Date'])
+    df_states = df_states.set_index(['State_Code','Date']).sort_index()
+    state_panel = StatePanel.load(panel_folder,mmap_mode=None)
+
+    if len(changed_panels)>0:
+        ## (Days after the last combined day are redone in case hospital data lagged)
+        last_combined = df_states.index.get_level_values('Date').max()
+        first_changed = min([panel.dates.min() for panel in changed_panels]+
+                            [last_combined+pd.Timedelta(days=1)])
+        print(f"[i] Updating data from {first_changed.strftime('%m-%d-%Y')} onwards.")
+
+        ## Write the changed days into the saved panel
+        panel_fpath = os.path.join(fpath_clean,'CASES_DEATHS_PANEL.joblib')
+        case_death_panel = joblib.load(panel_fpath)
+        for panel in changed_panels:
+            case_death_panel = case_death_panel.update(panel)
+        joblib.dump(case_death_panel,panel_fpath)
 
+        if save_county_data:
+            for metric,file in JHU_TS_FILES.items():
+                if metric not in county_data:
+                    county_data[metric] = load_raw_ts_file(jhu_data_zip,file=file,
+                                                           mapper_path=mapper_path)
+            save_county_cases_deaths(county_data['Cases'],county_data['Deaths'],
+                                     fpath_clean=fpath_clean)
+
+        df_daily_cases_deaths_ts = case_death_panel.to_frame()
+        df_daily_cases_deaths_ts.to_csv(os.path.join(fpath_clean,'us_states_daily_cases_deaths.csv'),index=True)
+        df_new = df_daily_cases_deaths_ts.loc[df_daily_cases_deaths_ts['Date']>=first_changed]
+
+        ## Only get the hospital data for the changed days
+        COLUMNS = joblib.load(os.path.join(fpath_clean,'COLUMNS.joblib'))
+        where = f"date>='{first_changed.strftime('%Y-%m-%dT00:00:00')}'"
+        df_hospitals,_ = download_hospital_data(COLUMNS=COLUMNS,where=where)
+        df_new = merge_state_day(df_new,df_hospitals)
+
+        ## Replace each changed state's rows from first_changed onwards
+        changed_states = list(df_new['State_Code'].unique())
+        is_replaced = df_states.index.get_level_values('State_Code').isin(changed_states) & \
+            (df_states.index.get_level_values('Date')>=first_changed)
+        df_states = pd.concat([df_states.loc[~is_replaced],
+                               df_new.set_index(['State_Code','Date'])]).sort_index()
+        df_states.reset_index().to_csv(combined_fpath,index=False)
+
+        save_state_files(df_states,fpath_clean=fpath_clean,states=changed_states,
+                         save_state_csvs=save_state_csvs,save_store=save_store,
+                         save_state_dict=save_state_dict)
+
+        ## Write the changed days into the saved state panel
+        state_panel = state_panel.update(StatePanel.from_frame(df_new,metrics=state_panel.metrics))
+        state_panel.save(panel_folder)
+        manifest['last_date'] = case_death_panel.dates.max().strftime('%Y-%m-%d')
+    else:
+        print('[i] No new or revised data found.')
+
+    save_manifest(manifest,manifest_path)
+
+    end = dt.datetime.now()
+    print('[i] Workflow completed.')
+    print(f'\tRun time={end-start} sec.')
+    return df_states, state_panel
+
+
+
+##################################################################################
+#### WORKFLOW STAGES (see make_workflow_pipeline)
+def stage_jhu_data(fpath_raw='data_raw'):
+    """Downloads the jhu data. Returns the zip's filepath and its members'
+    signatures (so downstream stages only re-run if the contents changed)"""
+    jhu_data_zip = download_jhu_data(fpath_raw)
+    files = ['CONVENIENT_us_metadata.csv',*JHU_TS_FILES.values()]
+    return {'fpath':jhu_data_zip.filename,
+            'signatures':{file:get_zip_member_signature(jhu_data_zip,file) for file in files}}
+
+
+def stage_metadata(jhu_data):
+    """Prepares the county/state metadata and state name/code maps (saved by
+    save_metadata, so the files are written even if this stage is cached).
+    Returns dict of the counties/states metadata and the maps."""
+    jhu_data_zip = zipfile.ZipFile(jhu_data['fpath'])
 
     ## Getting State Abbrevs
     state_abbrevs = pd.read_csv('Reference Data/united_states_abbreviations.csv')
@@ -199,9 +1191,8 @@ def FULL_WORKFLOW(save_state_csvs=False):
 
 
     # prep df_metadata
-    file = 'CONVENIENT_us_metadata.csv'
-    jhu_data_zip.extract(file,path=fpath_raw)
-    df_metadata = pd.read_csv(os.path.join(fpath_raw,file))
+    with jhu_data_zip.open('CONVENIENT_us_metadata.csv') as file:
+        df_metadata = pd.read_csv(file)
 
     ## Adding State Abbrevas to kaggle metadata
     df_metadata.insert(1,'State_Code',df_metadata['Province_State'].map(state_to_abbrevs_map))
@@ -210,114 +1201,195 @@ def FULL_WORKFLOW(save_state_csvs=False):
     ## Dropping us territories
     df_metadata.dropna(subset=['State_Code'], inplace=True)
 
-    ## Saving county info
-    df_metadata.to_csv(os.path.join(fpath_clean,"us_metadata_counties.csv"),index=False)
-
 
-    ## Saving a states-only version with aggregated populations and mean lat/long
+    ## A states-only version with aggregated populations and mean lat/long
     df_state_metadata = df_metadata.groupby('Province_State',as_index=False).agg({'Population':'sum',
                                                 "Lat":'mean',"Long":"mean"})
     df_state_metadata.insert(1,'State_Code',df_state_metadata['Province_State'].map(state_to_abbrevs_map))
-    df_state_metadata.to_csv(os.path.join(fpath_clean,"us_metadata_states.csv"),index=False)
 
 
-    ## Making and saving remapping dicts
-
+    ## Making remapping dicts
     state_to_abbrevs_meta = dict(zip(df_state_metadata['Province_State'],df_state_metadata['State_Code']))
     abbrev_to_state_meta = dict(zip(df_state_metadata['State_Code'],df_state_metadata['Province_State']))
+    return {'counties':df_metadata,'states':df_state_metadata,
+            'state_to_abbrevs':state_to_abbrevs_meta,
+            'abbrev_to_state':abbrev_to_state_meta}
 
-    joblib.dump(state_to_abbrevs_meta, os.path.join(fpath_clean,'state_names_to_codes_map.joblib'))
-    joblib.dump(abbrev_to_state_meta, os.path.join(fpath_clean,'state_codes_to_names_map.joblib'))
 
-    ## save mapper fo state to code for function
-    mapper_path = os.path.join(fpath_clean,'state_names_to_codes_map.joblib')
-    mapper_path
-    
-    
-    ## Prep ` df_cases_ts`
-    df_cases = load_raw_ts_file(jhu_data_zip, file = 'RAW_us_confirmed_cases.csv',)
-    df_cases_ts = melt_df_to_ts(df_cases,'Cases')
-    df_cases_ts
-    
-    
-    ## Prep df_deaths_ts
-    df_deaths = load_raw_ts_file(jhu_data_zip,file = 'RAW_us_deaths.csv')
-    df_deaths_ts = melt_df_to_ts(df_deaths,'Deaths')
-    df_deaths_ts
+def save_metadata(metadata, jhu_data, fpath_raw='data_raw', fpath_clean='data/'):
+    """Saves the outputs of stage_metadata (and extracts the raw metadata csv)"""
+    with zipfile.ZipFile(jhu_data['fpath']) as jhu_data_zip:
+        jhu_data_zip.extract('CONVENIENT_us_metadata.csv',path=fpath_raw)
 
-    ## Merge df_cases_ts and df_deaths_ts
-    df_cases_deaths_ts = pd.merge(df_cases_ts.reset_index(), df_deaths_ts.reset_index())
-    df_cases_deaths_ts
+    ## Saving county and state info
+    metadata['counties'].to_csv(os.path.join(fpath_clean,"us_metadata_counties.csv"),index=False)
+    metadata['states'].to_csv(os.path.join(fpath_clean,"us_metadata_states.csv"),index=False)
 
-    df_cases_deaths_ts.to_csv(os.path.join(fpath_clean,'us_states_cases_deaths.csv'),index=True)
+    ## Saving remapping dicts
+    joblib.dump(metadata['state_to_abbrevs'], os.path.join(fpath_clean,'state_names_to_codes_map.joblib'))
+    joblib.dump(metadata['abbrev_to_state'], os.path.join(fpath_clean,'state_codes_to_names_map.joblib'))
 
-    ## Resample to Daily State Data
-    df_daily_cases_deaths_ts = df_cases_deaths_ts.set_index('Date')\
-                                .groupby('State_Code').resample("D")\
-                                    .sum().reset_index()
-    df_daily_cases_deaths_ts.to_csv(os.path.join(fpath_clean,'us_states_daily_cases_deaths.csv'),index=True)
-    df_daily_cases_deaths_ts
-    
-    ## Get hispital Data
-    df1 = get_hospital_data()
-    df1 = df1.rename({'state':'State_Code',
-                     'date':'Date'},axis=1)
-    df1['Date'] = pd.to_datetime(df1['Date'])
-    df1 = df1.sort_values(['State_Code','Date'])
+
+def stage_load_ts(jhu_data, metadata, metric='Cases'):
+    """Loads the raw JHU time series file for metric"""
+    return load_raw_ts_file(jhu_data['fpath'],file=JHU_TS_FILES[metric],
+                            mapper_path=metadata['state_to_abbrevs'])
+
+
+def stage_case_death_panel(df_cases, df_deaths):
+    """Sums counties directly into a State x Date x Metric panel"""
+    return StatePanel.from_county_frames([df_cases,df_deaths],
+                                         metrics=['Cases','Deaths'])
+
+
+def stage_hospitals(day=None):
+    """Downloads the hospital data (day only marks the cached result's date,
+    so it is re-downloaded once per day)"""
+    return download_hospital_data()
+
+
+def stage_combine(case_death_panel, hospitals):
+    """Combines the daily state cases/deaths with the hospital data"""
+    df_hospitals, COLUMNS = hospitals
+    return merge_state_day(case_death_panel.to_frame(),df_hospitals)
+
+
+def make_workflow_pipeline(fpath_raw='data_raw', fpath_clean='data/',
+                           cache_dir=os.path.join('data_raw','stage_cache'),
+                           max_workers=4, use_cache=True):
+    """Returns the data acquisition workflow as a Pipeline of Stages. 
+    Cases, deaths and metadata loading run concurrently with the hospital 
+    paging, and each stage's result is memoized in cache_dir (keyed by the
+    source of the stage and of the functions/classes it declares as deps)."""
+    from project_functions.pipeline import Pipeline, Stage
+    day = dt.date.today().strftime('%Y-%m-%d')
+    ts_deps = [load_raw_ts_file,iter_raw_ts_file,_open_zip,_is_date_col,schema]
+    hospital_deps = [download_hospital_data,get_hospital_data,get_hospital_count,
+                     get_hospital_schema,make_hospital_columns,prep_hospital_data,
+                     ColumnDict,schema,downloads]
+    merge_deps = [merge_state_day,encode_state_day_keys,sort_merge_align,
+                  _get_col_or_level,StatePanel]
+    stages = [
+        Stage('jhu_data',stage_jhu_data,params=dict(fpath_raw=fpath_raw),cache=False),
+        Stage('metadata',stage_metadata,inputs=['jhu_data']),
+        Stage('cases',stage_load_ts,inputs=['jhu_data','metadata'],
+              params=dict(metric='Cases'),deps=ts_deps),
+        Stage('deaths',stage_load_ts,inputs=['jhu_data','metadata'],
+              params=dict(metric='Deaths'),deps=ts_deps),
+        Stage('case_death_panel',stage_case_death_panel,inputs=['cases','deaths'],
+              deps=[StatePanel,_sum_rows_by_group]),
+        Stage('hospitals',stage_hospitals,params=dict(day=day),deps=hospital_deps),
+        Stage('combined',stage_combine,inputs=['case_death_panel','hospitals'],
+              deps=merge_deps),
+    ]
+    return Pipeline(stages,cache_dir=cache_dir,max_workers=max_workers,
+                    use_cache=use_cache)
+
+
+
+##################################################################################
+def FULL_WORKFLOW(save_state_csvs=False,save_store=True,save_county_data=True,
+                  incremental=False,use_cache=True,save_state_dict=True):
+    """Run entire data acquisiton process (see make_workflow_pipeline for stages)
+
+    Args:
+        save_state_csvs (bool): save gzipped csv of each state's data
+        save_store (bool): save the partitioned parquet state store
+                           (see load_state_store)
+        save_county_data (bool): melt/merge the county-level data and save it
+                                 as us_states_cases_deaths.csv
+        incremental (bool): only process new/revised days if a previous run's
+                            outputs exist (see INCREMENTAL_WORKFLOW)
+        use_cache (bool): reuse the memoized results of unchanged stages
+        save_state_dict (bool): save STATE_DICT.joblib ({state: frame}), which
+                                the notebooks load
+
+    Returns:
+        df_states (Frame): combined dataframe of all state data 
+        STATES (StatePanel): each state's data by state code (see StatePanel)
+    """
+    ## Specifying data storage folders
+    fpath_raw = r"data_raw"
+    fpath_clean = r"data/"
+
+    ## Only update the previous outputs if they exist
+    prev_outputs = [MANIFEST_FNAME,'CASES_DEATHS_PANEL.joblib','combined_us_states_full_data.csv',
+                    'COLUMNS.joblib','state_panel']
+    if incremental and all([os.path.exists(os.path.join(fpath_clean,f)) for f in prev_outputs]):
+        return INCREMENTAL_WORKFLOW(save_state_csvs=save_state_csvs,save_store=save_store,
+                                    save_state_dict=save_state_dict,
+                                    save_county_data=save_county_data)
+
+    start = dt.datetime.now()
     
-    #### SIFT THROUGH COLUMNS
-    COLUMNS = ColumnDict(id_cols=['State_Code','Date'])
+    print(f"========= RUNNING FULL WORKFLOW =========")
+    [os.makedirs(fpath,exist_ok=True) for fpath in [fpath_clean,fpath_raw]]
 
-    ## saving names to DROP to COLUMNS dict
-    drop_col_expressions = ['staff','previous_day','coverage','onset']
-    COLUMNS.find_expr_cols(drop_col_expressions,df1,keep=False)
+    ## Run the stages
+    pipeline = make_workflow_pipeline(fpath_raw=fpath_raw,fpath_clean=fpath_clean,
+                                      use_cache=use_cache)
+    results = pipeline.run()
+    jhu_data = results['jhu_data']
+    save_metadata(results['metadata'],jhu_data,fpath_raw=fpath_raw,fpath_clean=fpath_clean)
+    df_cases, df_deaths = results['cases'], results['deaths']
+    case_death_panel = results['case_death_panel']
+    df_hospitals, COLUMNS = results['hospitals']
+    df = results['combined']
 
+    joblib.dump(case_death_panel,os.path.join(fpath_clean,'CASES_DEATHS_PANEL.joblib'))
 
-    ## saving names to KEEP to COLUMNS dict
-    keep_col_expressions = ['inpatient_bed','adult_icu_bed','utilization',
-                            'total_adult_patients','total_pediatric_patients',
-                        'percent_of_inpatients_with_covid','deaths']
-    COLUMNS.find_expr_cols(keep_col_expressions,df1,keep=True)
+    ## Make the manifest used by incremental runs (saved once the run completes)
+    manifest = load_manifest(os.path.join(fpath_clean,MANIFEST_FNAME))
+    for metric,data in zip(['Cases','Deaths'],[df_cases,df_deaths]):
+        file = JHU_TS_FILES[metric]
+        manifest['files'][file] = jhu_data['signatures'][file]
+        manifest['columns'][file] = hash_date_columns(data)
+    manifest['last_date'] = case_death_panel.dates.max().strftime('%Y-%m-%d')
 
+    if save_county_data:
+        save_county_cases_deaths(df_cases,df_deaths,fpath_clean=fpath_clean)
 
-    ## Making df_hospitals
-    df_hospitals = df1[COLUMNS.get_all_values(keep=True)].copy()
-    df_hospitals = df_hospitals.set_index(COLUMNS.id_cols).sort_index()
+    ## Daily State Data
+    df_daily_cases_deaths_ts = case_death_panel.to_frame()
+    df_daily_cases_deaths_ts.to_csv(os.path.join(fpath_clean,'us_states_daily_cases_deaths.csv'),index=True)
+    df_daily_cases_deaths_ts
+    
+    ## Save hospital Data
     df_hospitals.reset_index().to_csv(os.path.join(fpath_raw,'hospital_data.csv'))
 
     df_hospitals#.loc['MD',['inpatient_beds_utilization']].plot()
     joblib.dump(COLUMNS,os.path.join(fpath_clean,'COLUMNS.joblib'))
     
-    #### combine all data
-    df = pd.merge(df_daily_cases_deaths_ts,df_hospitals.reset_index())
+    #### save combined data
     df.to_csv(os.path.join(fpath_clean,'combined_us_states_full_data.csv'),index=False)
     df
-    
-    
-    ## Saving State CSVs
-    DATA_FOLDER = os.path.join(fpath_clean,'state_data/')
-    os.makedirs(DATA_FOLDER,exist_ok=True)
 
-    ## make STATES dict
-    unique_states = df['State_Code'].unique()
-    df_states = df.set_index(['State_Code','Date']).sort_index()
-
-    STATES = {}
-    for state in unique_states:    
-        df_state = df_states.loc[state].copy()
-        if save_state_csvs:
-            df_state.to_csv(f"{DATA_FOLDER}combined_data_{state}.csv.gz",compression='gzip')   
-        STATES[state] = df_state.copy()
+    ## Save columnar store partitioned by state
+    if save_store:
+        save_state_store(df,path=os.path.join(fpath_clean,'state_store'))
 
+    
+    ## Saving State CSVs (the store was already saved above)
+    df_states = df.set_index(['State_Code','Date']).sort_index()
+    save_state_files(df_states,fpath_clean=fpath_clean,save_state_csvs=save_state_csvs,
+                     save_store=False,save_state_dict=save_state_dict)
 
-    joblib.dump(STATES,os.path.join(fpath_clean,'STATE_DICT.joblib'))
+    ## Save memory-mappable panel of all states (STATES['MD'] etc.)
+    STATES = StatePanel.from_frame(df)
+    STATES.save(os.path.join(fpath_clean,'state_panel'))
+    save_manifest(manifest,os.path.join(fpath_clean,MANIFEST_FNAME))
     
     end = dt.datetime.now()
     print('[i] Workflow completed.')
     print(f'\tRun time={end-start} sec.')
+    print(pipeline.report)
     print('[i]The final files of note:')
     print(f"\t{os.path.join(fpath_clean,'combined_us_states_full_data.csv')}")
-    print(f"\t{os.path.join(fpath_clean,'STATE_DICT.joblib')}")
+    print(f"\t{os.path.join(fpath_clean,'state_panel')}")
+    if save_state_dict:
+        print(f"\t{os.path.join(fpath_clean,'STATE_DICT.joblib')}")
+    if save_store:
+        print(f"\t{os.path.join(fpath_clean,'state_store')}")
     
     return df_states, STATES
 
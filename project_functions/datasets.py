@@ -0,0 +1,205 @@
+"""Versioned local cache for the kaggle datasets.
+
+A DatasetCache keeps each dataset's .zip in its cache_dir, with a manifest
+(dataset_manifest.json) recording the dataset's version, the zip's md5 and
+which members were extracted where (by their CRC). A fetch only downloads when
+the source reports a new version (or the zip is missing/changed) and only
+extracts the members that changed.
+
+Sources:
+    - KaggleSource: the kaggle api (the version is a hash of the dataset's file list)
+    - MirrorSource: a local folder of {owner}/{dataset}.zip files. Used for the
+      offline mode (e.g. a mirror baked into the deploy) and as a stand-in for tests.
+
+The default cache is offline (served from a MirrorSource) if the
+KAGGLE_MIRROR_DIR environment variable is set.
+
+EXAMPLE USAGE:
+>>> cache = DatasetCache('data_raw')
+>>> result = cache.fetch('antgoldbloom/covid19-data-from-john-hopkins-university')
+>>> result['zip_path'], result['downloaded']
+"""
+import os,json,shutil,hashlib,zipfile
+import datetime as dt
+
+MANIFEST_FNAME = 'dataset_manifest.json'
+
+
+def _file_md5(fpath, chunk_size=2**20):
+    md5 = hashlib.md5()
+    with open(fpath,'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size),b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class KaggleSource(object):
+    """Downloads datasets with the kaggle api (installing kaggle if needed)"""
+    def _get_api(self):
+        try:
+            import kaggle.api as kaggle
+        except ImportError:
+            os.system("pip install kaggle --upgrade")
+            import kaggle.api as kaggle
+        kaggle.authenticate()
+        return kaggle
+
+
+    def get_version(self, dataset):
+        """Returns a hash of the dataset's file list (names, sizes and dates)"""
+        files = self._get_api().dataset_list_files(dataset).files
+        listing = sorted([(str(getattr(f,'name',f)),str(getattr(f,'size','')),
+                           str(getattr(f,'creationDate',''))) for f in files])
+        return hashlib.md5(json.dumps(listing).encode()).hexdigest()
+
+
+    def download(self, dataset, folder):
+        """Downloads the dataset's .zip into folder and returns its filepath"""
+        self._get_api().dataset_download_files(dataset,path=folder,force=True,unzip=False)
+        return os.path.join(folder,dataset.split('/')[-1]+'.zip')
+
+
+
+class MirrorSource(object):
+    """Serves datasets from a local folder of {owner}/{dataset}.zip files
+    (or {dataset}.zip). The version of a dataset is its zip's md5."""
+    def __init__(self, mirror_dir):
+        self.mirror_dir = mirror_dir
+        self.downloads = 0
+
+
+    def _get_fpath(self, dataset):
+        for fpath in [os.path.join(self.mirror_dir,dataset+'.zip'),
+                      os.path.join(self.mirror_dir,dataset.split('/')[-1]+'.zip')]:
+            if os.path.exists(fpath):
+                return fpath
+        raise FileNotFoundError(f"{dataset} is not in the mirror {self.mirror_dir}")
+
+
+    def get_version(self, dataset):
+        return _file_md5(self._get_fpath(dataset))
+
+
+    def download(self, dataset, folder):
+        target = os.path.join(folder,dataset.split('/')[-1]+'.zip')
+        shutil.copyfile(self._get_fpath(dataset),target)
+        self.downloads += 1
+        return target
+
+
+
+class DatasetCache(object):
+    """Local cache of dataset .zip files and their extracted members.
+
+    Args:
+        cache_dir (str): folder for the .zip files and the manifest
+        source (KaggleSource,MirrorSource): where datasets come from
+                                            (defaults to get_default_source())
+    """
+    def __init__(self, cache_dir='data_raw', source=None, verbose=True):
+        self.cache_dir = cache_dir
+        self.source = get_default_source() if source is None else source
+        self.verbose = verbose
+        self.manifest_fpath = os.path.join(cache_dir,MANIFEST_FNAME)
+
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_fpath):
+            return {}
+        with open(self.manifest_fpath) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.cache_dir,exist_ok=True)
+        tmp_fpath = self.manifest_fpath+'.tmp'
+        with open(tmp_fpath,'w') as f:
+            json.dump(manifest,f,indent=2)
+        os.replace(tmp_fpath,self.manifest_fpath)
+
+
+    def fetch(self, dataset, extract_to=None, force=False):
+        """Makes sure the latest version of dataset is in the cache (and extracted
+        to extract_to, if given), downloading/extracting only what changed.
+        If the source can't be reached, the cached version is used.
+
+        Returns:
+            result (dict): zip_path, version, downloaded (bool) and
+                           extracted (list of the members extracted this time)
+        """
+        os.makedirs(self.cache_dir,exist_ok=True)
+        manifest = self.load_manifest()
+        entry = manifest.get(dataset,{})
+        zip_path = os.path.join(self.cache_dir,dataset.split('/')[-1]+'.zip')
+        have_zip = os.path.exists(zip_path) and (entry.get('zip_md5')==self._quick_md5(zip_path,entry))
+
+        ## Check the source's version (offline-first: fall back to the cached zip)
+        try:
+            version = self.source.get_version(dataset)
+        except Exception as e:
+            if not have_zip:
+                raise
+            if self.verbose:
+                print(f"[!] Could not check {dataset} ({e}). Using the cached version.")
+            version = entry.get('version')
+
+        downloaded = False
+        if force or (not have_zip) or (version!=entry.get('version')):
+            if self.verbose:
+                print(f"[i] Downloading {dataset} (version {version})")
+            zip_path = self.source.download(dataset,self.cache_dir)
+            zip_md5 = _file_md5(zip_path)
+            downloaded = True
+            stat = os.stat(zip_path)
+            entry.update({'version':version,'zip_md5':zip_md5,'zip_size':stat.st_size,
+                          'zip_mtime_ns':stat.st_mtime_ns,
+                          'fetched':dt.datetime.now().isoformat(timespec='seconds')})
+        elif self.verbose:
+            print(f"[i] {dataset} is up to date (version {version}).")
+
+        extracted = []
+        if extract_to is not None:
+            extracted = self._extract(zip_path,extract_to,entry.setdefault('extracted',{}))
+            if self.verbose and len(extracted)>0:
+                print(f"\t- Extracted {len(extracted)} changed files to {extract_to}")
+
+        manifest[dataset] = entry
+        self.save_manifest(manifest)
+        return {'zip_path':zip_path,'version':version,
+                'downloaded':downloaded,'extracted':extracted}
+
+
+    def _quick_md5(self, zip_path, entry):
+        """Returns the manifest's md5 if the zip's size/mtime are unchanged, else its md5"""
+        stat = os.stat(zip_path)
+        if (stat.st_size==entry.get('zip_size')) and (stat.st_mtime_ns==entry.get('zip_mtime_ns')):
+            return entry.get('zip_md5')
+        return _file_md5(zip_path)
+
+
+    def _extract(self, zip_path, folder, extracted):
+        """Extracts the members whose CRC changed (or whose file is missing) since
+        they were last extracted to folder. Updates extracted {folder: {member: crc}}"""
+        done = extracted.setdefault(os.path.abspath(folder),{})
+        changed = []
+        with zipfile.ZipFile(zip_path) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+                target = os.path.join(folder,info.filename)
+                if (done.get(info.filename)==info.CRC) and os.path.exists(target) and \
+                    (os.path.getsize(target)==info.file_size):
+                    continue
+                zip_file.extract(info,folder)
+                done[info.filename] = info.CRC
+                changed.append(info.filename)
+        return changed
+
+
+
+def get_default_source():
+    """Returns a MirrorSource of $KAGGLE_MIRROR_DIR (offline mode) if it
+    is set, else a KaggleSource"""
+    mirror_dir = os.environ.get('KAGGLE_MIRROR_DIR')
+    if mirror_dir:
+        return MirrorSource(mirror_dir)
+    return KaggleSource()
@@ -0,0 +1,104 @@
+"""Shared helpers for downloading the data sources over http."""
+import threading
+
+
+def make_session(max_workers=8, retries=3, backoff_factor=0.5):
+    """Returns a requests Session with a connection pool sized for max_workers
+    concurrent requests and automatic retries (with backoff) on failed requests
+    or 429/5xx responses."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries,backoff_factor=backoff_factor,
+                  status_forcelist=[429,500,502,503,504])
+    adapter = HTTPAdapter(pool_connections=max_workers,pool_maxsize=max_workers,
+                          max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://',adapter)
+    session.mount('https://',adapter)
+    return session
+
+
+VALIDATORS_FNAME = '.http_validators.json'
+## Serializes the updates of the validators files (downloads may run in threads)
+_VALIDATORS_LOCK = threading.Lock()
+
+
+def _load_validators(fpath):
+    import os,json
+    if not os.path.exists(fpath):
+        return {}
+    with open(fpath) as f:
+        return json.load(f)
+
+
+def _save_validators(fpath, validators):
+    import os,json
+    tmp_fpath = fpath+'.tmp'
+    with open(tmp_fpath,'w') as f:
+        json.dump(validators,f,indent=2)
+    os.replace(tmp_fpath,fpath)
+
+
+def download_if_modified(url, fpath, session=None, validators_fpath=None,
+                         chunk_size=2**16, timeout=60):
+    """Streams url to fpath, unless the server reports (via the ETag/Last-Modified
+    validators stored from the last download) that it did not change.
+
+    Args:
+        url (str): url of the file
+        fpath (str): filepath to save it to
+        session (Session): session to use (defaults to make_session())
+        validators_fpath (str): json file of the stored validators
+                                (defaults to .http_validators.json next to fpath)
+        chunk_size (int): bytes written per chunk
+        timeout (float): seconds to wait for the server (connect and each read)
+
+    Returns:
+        result (dict): modified (bool), bytes (transferred), status (code) and
+                       validator (the file's ETag or Last-Modified, if any)
+    """
+    import os
+    if session is None:
+        session = make_session()
+    if validators_fpath is None:
+        validators_fpath = os.path.join(os.path.dirname(fpath),VALIDATORS_FNAME)
+
+    validators = _load_validators(validators_fpath)
+    stored = validators.get(url,{})
+
+    ## Only ask for a 304 if the file it describes is still there
+    headers = {}
+    if os.path.exists(fpath) and (stored.get('fpath')==os.path.abspath(fpath)):
+        if stored.get('etag'):
+            headers['If-None-Match'] = stored['etag']
+        if stored.get('last_modified'):
+            headers['If-Modified-Since'] = stored['last_modified']
+
+    with session.get(url,headers=headers,stream=True,timeout=timeout) as response:
+        if response.status_code==304:
+            return {'modified':False,'bytes':0,'status':304,
+                    'validator':stored.get('etag') or stored.get('last_modified')}
+        response.raise_for_status()
+
+        ## Stream to a temporary file so a failed download keeps the old file
+        n_bytes = 0
+        tmp_fpath = fpath+'.part'
+        with open(tmp_fpath,'wb') as file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                file.write(chunk)
+                n_bytes += len(chunk)
+        os.replace(tmp_fpath,fpath)
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+    with _VALIDATORS_LOCK:
+        validators = _load_validators(validators_fpath)
+        validators[url] = {'etag':etag,'last_modified':last_modified,
+                           'fpath':os.path.abspath(fpath)}
+        _save_validators(validators_fpath,validators)
+    return {'modified':True,'bytes':n_bytes,'status':response.status_code,
+            'validator':etag or last_modified}
@@ -0,0 +1,149 @@
+"""Bounded in-memory cache of DataFrames with LRU eviction.
+
+Entries are stored as shallow copies and every get returns a view sharing
+their data (see shared_view), so instances sharing a cache share the data
+instead of each holding a copy. When the entries take more than max_bytes, the
+least recently used ones are evicted (and reloaded by get_or_load when needed).
+
+EXAMPLE USAGE:
+>>> cache = FrameCache(max_bytes=256e6)
+>>> df = cache.get_or_load(('states',fpath),lambda: pd.read_csv(fpath))
+>>> cache.stats
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def copy_on_write_enabled():
+    """Whether pandas copies shared data when it is edited (Copy-on-Write is
+    always on since pandas 3.0 and was opt-in before)"""
+    if int(pd.__version__.split('.')[0])>=3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except KeyError:
+        return False
+
+
+def shared_view(df):
+    """Returns a shallow copy of df that shares its data without copying it.
+    With Copy-on-Write (see copy_on_write_enabled), editing the view in place
+    (e.g. view.loc[...]=...) copies the edited columns first and leaves df
+    unchanged. Without it, the edits also change df, so .copy() the view
+    before editing it. New/renamed columns don't affect df either way."""
+    if df is None:
+        return None
+    return df.copy(deep=False)
+
+
+class FrameCache(object):
+    """LRU cache of shared frames with a memory budget.
+
+    Args:
+        max_bytes (int): memory budget of the entries (frames larger than it
+                         are returned but not cached)
+
+    Attributes:
+        hits, misses, evictions (int): counts of the gets that found an
+                                       entry/found none and of evicted entries
+    """
+    def __init__(self, max_bytes=512e6):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()
+        self._nbytes = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"FrameCache({len(self)} entries, {self.nbytes/1e6:.1f} of {self.max_bytes/1e6:.1f} MB)"
+
+
+    def get(self, key, default=None):
+        """Returns a shared view of the entry for key (or default)"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return shared_view(self._entries[key])
+
+
+    def put(self, key, df):
+        """Stores a shallow copy of df for key, evicting the least recently used
+        entries over the budget. Returns a shared view of df."""
+        df = shared_view(df)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self.discard(key)
+            if nbytes<=self.max_bytes:
+                self._entries[key] = df
+                self._nbytes[key] = nbytes
+                while self.nbytes>self.max_bytes:
+                    old_key,_ = self._entries.popitem(last=False)
+                    del self._nbytes[old_key]
+                    self.evictions += 1
+        return shared_view(df)
+
+
+    def get_or_load(self, key, loader):
+        """Returns the entry for key, calling loader() to load (and store) it on a miss"""
+        df = self.get(key)
+        if df is None:
+            df = self.put(key,loader())
+        return df
+
+
+    def discard(self, key):
+        """Removes the entry for key (if any)"""
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+                del self._nbytes[key]
+
+
+    def clear(self):
+        """Removes all entries (the stats are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes.clear()
+
+
+    @property
+    def nbytes(self):
+        """Memory taken by the entries"""
+        return sum(self._nbytes.values())
+
+
+    @property
+    def stats(self):
+        """Dict of the hits, misses, hit_rate, evictions, entries, nbytes and max_bytes"""
+        n_gets = self.hits+self.misses
+        return {'hits':self.hits,'misses':self.misses,
+                'hit_rate':self.hits/n_gets if n_gets else np.nan,
+                'evictions':self.evictions,'entries':len(self),
+                'nbytes':self.nbytes,'max_bytes':self.max_bytes}
+
+
+
+## Cache shared by the instances that aren't given their own (see get_shared_cache)
+_SHARED_CACHE = None
+
+def get_shared_cache(max_bytes=512e6):
+    """Returns the process-wide FrameCache (made with max_bytes the first time)"""
+    global _SHARED_CACHE
+    if _SHARED_CACHE is None:
+        _SHARED_CACHE = FrameCache(max_bytes=max_bytes)
+    return _SHARED_CACHE
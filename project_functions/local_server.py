@@ -0,0 +1,190 @@
+"""Local HTTP stand-ins for the remote data sources, so downloads can be
+tested (and their throughput/failure handling checked) offline.
+
+EXAMPLE USAGE:
+>>> from project_functions.local_server import LocalServer, SocrataResource
+>>> with LocalServer({'/resource/hospitals.csv':SocrataResource(df)}) as server:
+        df1 = data.get_hospital_data(base_url=server.url+'/resource/hospitals.csv')
+"""
+import re
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LocalServer(object):
+    """Serves routes from a background thread on localhost.
+
+    Args:
+        routes (dict): {path: handler}. Each handler is called with
+                       (query dict, request headers) and returns
+                       (status code, response headers dict, body bytes).
+        port (int): port to listen on (0 = any free port)
+
+    Attributes:
+        url (str): base url of the server (e.g. http://127.0.0.1:54321)
+        request_log (list): (path, query) of every request received
+    """
+    def __init__(self, routes, host='127.0.0.1', port=0):
+        self.routes = routes
+        self.host = host
+        self.port = port
+        self.request_log = []
+        self._server = None
+        self._thread = None
+
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k:v[-1] for k,v in parse_qs(parsed.query).items()}
+                server.request_log.append((parsed.path,query))
+
+                if parsed.path not in server.routes:
+                    status, headers, body = 404, {}, b'Not Found'
+                else:
+                    status, headers, body = server.routes[parsed.path](query,self.headers)
+
+                self.send_response(status)
+                for key,value in headers.items():
+                    self.send_header(key,value)
+                self.send_header('Content-Length',str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+        return Handler
+
+
+    def start(self):
+        self._server = _ThreadingHTTPServer((self.host,self.port),self._make_handler())
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,daemon=True)
+        self._thread.start()
+        return self
+
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+
+class SocrataResource(object):
+    """Handler that serves a DataFrame like a Socrata csv resource
+    (e.g. healthdata.gov/resource/g62h-syeh.csv). Supports $select
+    (column list or count(*)), a single-condition $where, $limit and $offset.
+
+    Args:
+        df (Frame): the rows of the dataset (in :id order)
+        fail_offsets (list): offsets that respond with a 500 error...
+        fail_times (int): ...for their first fail_times requests
+        delay (float): seconds to wait before each response
+    """
+    where_expr = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*'?([^']*)'?\s*$")
+
+    def __init__(self, df, fail_offsets=(), fail_times=1, delay=0):
+        self.df = df
+        self.fail_offsets = list(fail_offsets)
+        self.fail_times = fail_times
+        self.delay = delay
+        self._fail_counts = {}
+        self._lock = threading.Lock()
+
+
+    def _filter(self, df, where):
+        import operator
+        ops = {'>=':operator.ge,'<=':operator.le,'!=':operator.ne,
+               '=':operator.eq,'>':operator.gt,'<':operator.lt}
+        col, op, value = self.where_expr.match(where).groups()
+        return df.loc[ops[op](df[col].astype(str),value)]
+
+
+    def __call__(self, query, headers):
+        if self.delay:
+            time.sleep(self.delay)
+        df = self.df
+        if '$where' in query:
+            df = self._filter(df,query['$where'])
+
+        select = query.get('$select')
+        if (select is not None) and (select.replace(' ','').lower()=='count(*)'):
+            return 200, {'Content-Type':'text/csv'}, f'"count"\n"{len(df)}"\n'.encode()
+
+        ## Fail the first fail_times requests for each of fail_offsets
+        offset = int(query.get('$offset',0))
+        with self._lock:
+            if offset in self.fail_offsets:
+                self._fail_counts[offset] = self._fail_counts.get(offset,0)+1
+                if self._fail_counts[offset]<=self.fail_times:
+                    return 500, {}, b'Internal Server Error'
+
+        if select is not None:
+            df = df[[c.strip() for c in select.split(',')]]
+        limit = int(query.get('$limit',1000))
+        body = df.iloc[offset:offset+limit].to_csv(index=False).encode()
+        return 200, {'Content-Type':'text/csv'}, body
+
+
+
+class StaticFile(object):
+    """Handler that serves a file's bytes with ETag and Last-Modified headers,
+    answering conditional requests (If-None-Match/If-Modified-Since) for
+    unchanged content with a 304.
+
+    Args:
+        body (bytes): content of the file (see update)
+        delay (float): seconds to wait before each response
+
+    Attributes:
+        transfers (int): number of responses that sent the body
+    """
+    def __init__(self, body, delay=0):
+        self.delay = delay
+        self.transfers = 0
+        self.update(body)
+
+
+    def update(self, body):
+        """Replaces the content (with a new ETag and Last-Modified)"""
+        import hashlib
+        from email.utils import formatdate
+        self.body = body
+        self.etag = '"'+hashlib.md5(body).hexdigest()+'"'
+        self.last_modified = formatdate(time.time(),usegmt=True)
+
+
+    def __call__(self, query, headers):
+        if self.delay:
+            time.sleep(self.delay)
+        validators = {'ETag':self.etag,'Last-Modified':self.last_modified}
+        if headers.get('If-None-Match')==self.etag:
+            return 304, validators, b''
+        if (headers.get('If-None-Match') is None) and \
+            (headers.get('If-Modified-Since')==self.last_modified):
+            return 304, validators, b''
+        self.transfers += 1
+        return 200, {'Content-Type':'text/csv',**validators}, self.body
@@ -0,0 +1,349 @@
+"""Derived metrics computed on demand from a StatePanel.
+
+Each derived metric is declared once (see register_metric) as a function of
+the (n_days, n_states) arrays of its input metrics, and optionally of the
+states' population vector. A MetricEngine only computes a metric when it is
+asked for, for the requested states, and memoizes it per (metric, states), so
+nothing but the raw metrics is held in memory until a derived column is used.
+
+The rolling features (trailing averages, growth, doubling times, peaks) of
+every state and metric are instead computed together by a FeatureEngine, in one
+pass over the panel, and cached by the panel's data version.
+
+EXAMPLE USAGE:
+>>> engine = MetricEngine(panel,population=corona_data.population)
+>>> engine.available
+>>> engine.get('Confirmed per 100k',['MD','VA'])
+"""
+import numpy as np
+import pandas as pd
+
+
+class Metric(object):
+    """A derived metric: func(*input arrays, [population], **params)
+
+    Args:
+        name (str): name of the metric
+        func (function): takes one (n_days, n_states) array per input
+                         (+ the (n_states,) population if population=True)
+        inputs (list): names of the raw or derived metrics used
+        population (bool): pass the states' population to func
+        params (dict): keyword arguments for func
+    """
+    def __init__(self, name, func, inputs, population=False, params={}):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.population = population
+        self.params = dict(params)
+
+    def __repr__(self):
+        return f"Metric('{self.name}', inputs={self.inputs})"
+
+
+## {name: Metric} of every declared metric
+METRICS = {}
+
+def register_metric(name, func, inputs, population=False, **params):
+    """Declares a derived metric (see Metric) in METRICS"""
+    METRICS[name] = Metric(name,func,inputs,population=population,params=params)
+    return METRICS[name]
+
+
+#### METRIC FUNCTIONS (arrays are n_days x n_states)
+def ratio(numerator, denominator):
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return numerator/denominator
+
+def per_capita(values, population):
+    return values/population[np.newaxis,:]
+
+def per_100k(values, population):
+    return per_capita(values,population)*1e5
+
+def daily_diff(values):
+    """Change from the previous day (NaN on the first day)"""
+    diff = np.full(values.shape,np.nan)
+    diff[1:] = values[1:]-values[:-1]
+    return diff
+
+def rolling_mean(values, window=7):
+    """Trailing window-day mean, from a cumulative sum (NaN until a state has
+    window days, or if any day in the window is NaN)"""
+    values = values.astype(np.float64)
+    is_nan = np.isnan(values)
+    sums = np.cumsum(np.where(is_nan,0,values),axis=0)
+    nans = np.cumsum(is_nan,axis=0)
+
+    means = np.full(values.shape,np.nan)
+    if len(values)>=window:
+        window_sums = sums[window-1:].copy()
+        window_sums[1:] -= sums[:-window]
+        window_nans = nans[window-1:].copy()
+        window_nans[1:] -= nans[:-window]
+        means[window-1:] = np.where(window_nans==0,window_sums/window,np.nan)
+    return means
+
+
+def pct_change(values, periods=1):
+    """Growth from periods days before, as a fraction (NaN for the first
+    periods days and where the earlier value is 0)"""
+    values = values.astype(np.float64)
+    growth = np.full(values.shape,np.nan)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        growth[periods:] = values[periods:]/values[:-periods]-1
+    growth[~np.isfinite(growth)] = np.nan
+    return growth
+
+def doubling_time(values, periods=7):
+    """Days for values to double at the growth rate of the last periods days
+    (NaN where values did not grow)"""
+    growth = pct_change(values,periods)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        days = periods*np.log(2)/np.log1p(growth)
+    days[~(growth>0)] = np.nan
+    return days
+
+def expanding_max(values):
+    """Running peak of values so far (ignoring NaNs)"""
+    return np.fmax.accumulate(values.astype(np.float64),axis=0)
+
+
+def register_default_metrics(base_metrics=['Confirmed','Deaths','Recovered','Cases']):
+    """Declares the per-capita, per-100k, new (daily difference) and 7-day
+    average metrics of base_metrics, and the case fatality rates"""
+    for col in base_metrics:
+        register_metric(f"{col} Per Capita",per_capita,[col],population=True)
+        register_metric(f"{col} per 100k",per_100k,[col],population=True)
+        register_metric(f"New {col}",daily_diff,[col])
+        register_metric(f"{col} 7-Day Avg",rolling_mean,[col],window=7)
+        register_metric(f"New {col} 7-Day Avg",rolling_mean,[f"New {col}"],window=7)
+    register_metric('Case Fatality Rate',ratio,['Deaths','Confirmed'])
+    register_metric('Case Fatality Rate (Cases)',ratio,['Deaths','Cases'])
+
+register_default_metrics()
+
+
+
+## {version: {windows: features}} of the computed rolling features (see FeatureEngine)
+_FEATURE_CACHE = {}
+
+
+def panel_version(panel):
+    """Returns a hash of the panel's values and axes"""
+    import hashlib
+    md5 = hashlib.md5(np.ascontiguousarray(panel.values).data)
+    for axis in [panel.states,panel.dates,panel.metrics]:
+        md5.update(str(list(axis)).encode())
+    return md5.hexdigest()
+
+
+class FeatureEngine(object):
+    """Rolling features of every state and metric of a panel, computed in one
+    vectorized pass over the whole (n_days, n_states, n_metrics) array:
+        - "{metric} {N}-Day Avg": trailing N-day mean (for each of windows)
+        - "{metric} DoD Growth" / "{metric} WoW Growth": day-over-day and
+          week-over-week growth (as a fraction)
+        - "{metric} Doubling Time": days to double at the last week's growth
+        - "{metric} Peak": expanding maximum
+
+    The features are cached by the panel's data version, so engines of the same
+    data (e.g. one per request) share them instead of recomputing them.
+
+    Args:
+        panel (StatePanel): panel of the raw metrics (states x days x metrics)
+        windows (tuple): window lengths (days) of the trailing averages
+        version (str): version of the panel's data (defaults to panel_version(panel))
+
+    EXAMPLE USAGE:
+    >>> features = FeatureEngine(corona_data.panel)
+    >>> features.get('Confirmed WoW Growth',['MD','VA'])
+    """
+    def __init__(self, panel, windows=(7,), version=None):
+        self.panel = panel
+        self.windows = tuple(windows)
+        self.version = panel_version(panel) if version is None else version
+        self._state_lookup = {state:i for i,state in enumerate(panel.states)}
+
+        ## Feature name -> (feature, metric index)
+        self._lookup = {}
+        for kind in self._get_kinds():
+            for i,metric in enumerate(panel.metrics):
+                self._lookup[kind.format(metric=metric)] = (kind,i)
+
+
+    def _get_kinds(self):
+        kinds = [f"{{metric}} {window}-Day Avg" for window in self.windows]
+        return [*kinds,'{metric} DoD Growth','{metric} WoW Growth',
+                '{metric} Doubling Time','{metric} Peak']
+
+
+    @property
+    def features(self):
+        """{feature kind: (n_days, n_states, n_metrics) array} (computed once per data version)"""
+        cached = _FEATURE_CACHE.get(self.version,{})
+        if self.windows not in cached:
+            cached[self.windows] = self._compute()
+            ## Only keep the features of the current data version
+            _FEATURE_CACHE.clear()
+            _FEATURE_CACHE[self.version] = cached
+        return cached[self.windows]
+
+
+    def _compute(self):
+        values = np.moveaxis(self.panel.values,0,1)
+        features = {}
+        for window in self.windows:
+            features[f"{{metric}} {window}-Day Avg"] = rolling_mean(values,window=window)
+        features['{metric} DoD Growth'] = pct_change(values,1)
+        features['{metric} WoW Growth'] = pct_change(values,7)
+        features['{metric} Doubling Time'] = doubling_time(values,7)
+        features['{metric} Peak'] = expanding_max(values)
+        for array in features.values():
+            array.flags.writeable = False
+        return features
+
+
+    @property
+    def available(self):
+        """Names of the features"""
+        return list(self._lookup)
+
+    def __contains__(self, name):
+        return name in self._lookup
+
+
+    def get_array(self, name, states=None):
+        """Returns the (n_days, n_states) array of feature name for states (None=all)"""
+        kind,metric_idx = self._lookup[name]
+        values = self.features[kind][:,:,metric_idx]
+        if states is None:
+            return values
+        if isinstance(states,str):
+            states = [states]
+        return values[:,[self._state_lookup[state] for state in states]]
+
+
+    def get(self, name, states=None):
+        """Returns a (dates x states) Frame of feature name for states (None=all)"""
+        values = self.get_array(name,states)
+        if states is None:
+            columns = self.panel.states
+        else:
+            columns = [states] if isinstance(states,str) else list(states)
+        return pd.DataFrame(values,index=self.panel.dates,columns=columns,copy=False)
+
+
+
+class MetricEngine(object):
+    """Computes the raw and derived metrics of a panel on demand.
+
+    Args:
+        panel (StatePanel): panel of the raw metrics (states x days x metrics)
+        population (Series): population indexed by state (for per-capita metrics)
+        metrics (dict): {name: Metric} of the derived metrics (defaults to METRICS)
+        features (FeatureEngine): rolling features of the panel, used for (and as
+                                  inputs of) the metrics with the same names
+    """
+    def __init__(self, panel, population=None, metrics=None, features=None):
+        self.panel = panel
+        self.metrics = METRICS if metrics is None else metrics
+        self.features = features
+        self._state_lookup = {state:i for i,state in enumerate(panel.states)}
+        self._raw_lookup = {metric:i for i,metric in enumerate(panel.metrics)}
+        self._cache = {}
+
+        if population is None:
+            self._population = None
+        else:
+            self._population = pd.Series(population).reindex(panel.states).to_numpy(dtype=np.float64)
+
+
+    def _is_feature(self, name):
+        return (self.features is not None) and (name in self.features)
+
+    def _can_compute(self, name, _visiting=()):
+        if (name in self._raw_lookup) or self._is_feature(name):
+            return True
+        metric = self.metrics.get(name)
+        if (metric is None) or (name in _visiting):
+            return False
+        if metric.population and (self._population is None):
+            return False
+        return all([self._can_compute(dep,(*_visiting,name)) for dep in metric.inputs])
+
+    @property
+    def available(self):
+        """Names of the derived metrics that can be computed from the panel"""
+        available = [name for name in self.metrics if (name not in self._raw_lookup) and
+                     self._can_compute(name)]
+        if self.features is not None:
+            available.extend([name for name in self.features.available if name not in available])
+        return available
+
+
+    def _get_state_idx(self, states):
+        if states is None:
+            return None
+        if isinstance(states,str):
+            states = [states]
+        missing = [state for state in states if state not in self._state_lookup]
+        if len(missing)>0:
+            raise Exception(f"States not in the panel: {missing}")
+        return tuple(self._state_lookup[state] for state in states)
+
+
+    def get_array(self, name, states=None):
+        """Returns the (n_days, n_states) array of metric name for states (None=all)"""
+        state_idx = self._get_state_idx(states)
+        return self._get_array(name,state_idx)
+
+
+    def _get_array(self, name, state_idx):
+        ## Raw metrics are views of the panel (or a copy of the selected states)
+        if name in self._raw_lookup:
+            values = self.panel.values[:,:,self._raw_lookup[name]]
+            if state_idx is not None:
+                values = values[list(state_idx)]
+            return values.T
+
+        ## Rolling features are slices of the feature engine's (shared) arrays
+        if self._is_feature(name):
+            values = self.features.get_array(name)
+            return values if state_idx is None else values[:,list(state_idx)]
+
+        key = (name,state_idx)
+        if key not in self._cache:
+            if not self._can_compute(name):
+                raise Exception(f"Metric '{name}' can't be computed from the panel's metrics.")
+            metric = self.metrics[name]
+            args = [self._get_array(dep,state_idx) for dep in metric.inputs]
+            if metric.population:
+                population = self._population
+                if state_idx is not None:
+                    population = population[list(state_idx)]
+                args.append(population)
+            self._cache[key] = metric.func(*args,**metric.params)
+        return self._cache[key]
+
+
+    def get(self, name, states=None):
+        """Returns a (dates x states) Frame of metric name for states (None=all),
+        sharing the memoized array's memory"""
+        values = self.get_array(name,states)
+        if states is None:
+            columns = self.panel.states
+        else:
+            columns = [states] if isinstance(states,str) else list(states)
+        return pd.DataFrame(values,index=self.panel.dates,columns=columns,copy=False)
+
+
+    def clear(self):
+        """Drops the memoized metrics"""
+        self._cache = {}
+
+
+    @property
+    def nbytes(self):
+        """Memory used by the memoized metrics"""
+        return sum([values.nbytes for values in self._cache.values()])
@@ -0,0 +1,185 @@
+"""Stage-based workflow execution.
+
+A Pipeline is made of named Stages with declared inputs (the names of other
+stages). Stages run concurrently as soon as their inputs are ready and each
+stage's result is memoized on disk under a hash of the stage's code (its
+function and the functions/classes/modules it declares as deps), its params and
+the contents of its inputs, so a re-run only recomputes the stages whose
+code/params/inputs changed (and the stages downstream of a changed result).
+
+EXAMPLE USAGE:
+>>> pipeline = Pipeline([Stage('raw',load_raw,cache=False),
+                         Stage('clean',clean_data,inputs=['raw'],deps=[drop_nulls]),
+                         Stage('meta',load_meta),
+                         Stage('combined',combine,inputs=['clean','meta'])])
+>>> results = pipeline.run()
+>>> pipeline.report
+"""
+import os,glob,inspect,time
+import joblib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Stage(object):
+    """A named step of a Pipeline.
+
+    Args:
+        name (str): name of the stage (its result is stored under this name)
+        func (function): called as func(*results of inputs, **params)
+        inputs (list): names of the stages whose results are passed to func
+        params (dict): keyword arguments for func (part of the cache key)
+        cache (bool): memoize the result on disk. Use False for stages that
+                      must always run (e.g. checking a remote source).
+        deps (list): functions, classes or modules func calls (part of the cache
+                     key, so editing them re-runs the stage). Strings (e.g. a
+                     version number) are hashed as they are.
+    """
+    def __init__(self, name, func, inputs=[], params={}, cache=True, deps=[]):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = dict(params)
+        self.cache = cache
+        self.deps = list(deps)
+
+
+    @staticmethod
+    def _get_source(obj):
+        if isinstance(obj,str):
+            return obj
+        try:
+            return inspect.getsource(obj)
+        except (OSError,TypeError):
+            return obj.__code__.co_code
+
+
+    def code_hash(self):
+        """Returns hash of the source code of the stage function and its deps"""
+        return joblib.hash([self._get_source(obj) for obj in [self.func,*self.deps]])
+
+
+    def __repr__(self):
+        return f"Stage('{self.name}', inputs={self.inputs})"
+
+
+
+class Pipeline(object):
+    """Runs Stages concurrently in dependency order with on-disk memoization.
+
+    Args:
+        stages (list): Stage objects
+        cache_dir (str): folder for the memoized stage results
+        max_workers (int): max number of stages running at once
+        use_cache (bool): if False, no results are loaded from/saved to cache_dir
+
+    Attributes:
+        results (dict): {stage name: result} of the last run
+        report (Frame): status ('ran'/'cached') and run time of each stage
+    """
+    def __init__(self, stages, cache_dir=os.path.join('data_raw','stage_cache'),
+                 max_workers=4, use_cache=True, verbose=True):
+        self.stages = {stage.name:stage for stage in stages}
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.verbose = verbose
+        self.results = {}
+        self.digests = {}
+        self.report = None
+
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in self.stages]
+            if len(missing)>0:
+                raise Exception(f"Stage '{stage.name}' has unknown inputs: {missing}")
+        [self._get_needed([name]) for name in self.stages]
+
+
+    def _get_needed(self, targets, _visiting=()):
+        """Returns list of stage names needed to compute targets (inputs first)"""
+        needed = []
+        for name in targets:
+            if name in _visiting:
+                raise Exception(f"Stage '{name}' depends on itself.")
+            for dep in self._get_needed(self.stages[name].inputs,(*_visiting,name)):
+                if dep not in needed:
+                    needed.append(dep)
+            if name not in needed:
+                needed.append(name)
+        return needed
+
+
+    def _run_stage(self, stage, code_hash, input_results, input_digests):
+        """Loads stage's memoized result or runs it. Returns (result, digest, status, secs)"""
+        start = time.perf_counter()
+        key = joblib.hash([stage.name,code_hash,stage.params,input_digests])
+        fpath = os.path.join(self.cache_dir,f"{stage.name}-{key}.joblib")
+        use_cache = self.use_cache and stage.cache
+
+        if use_cache and os.path.exists(fpath):
+            result, digest = joblib.load(fpath)
+            status = 'cached'
+        else:
+            result = stage.func(*input_results,**stage.params)
+            digest = joblib.hash(result)
+            status = 'ran'
+
+            if use_cache:
+                ## Replace this stage's older results
+                os.makedirs(self.cache_dir,exist_ok=True)
+                for old_fpath in glob.glob(os.path.join(self.cache_dir,f"{stage.name}-*.joblib")):
+                    os.remove(old_fpath)
+                joblib.dump((result,digest),fpath)
+        return result, digest, status, time.perf_counter()-start
+
+
+    def run(self, targets=None):
+        """Runs the stages needed for targets (defaults to all stages).
+
+        Returns:
+            results (dict): {stage name: result} for every stage that was needed
+        """
+        if targets is None:
+            targets = list(self.stages.keys())
+        elif isinstance(targets,str):
+            targets = [targets]
+        needed = self._get_needed(targets)
+
+        ## Hash the stages' code before starting any threads (inspect.getsource
+        ## parses the source with ast, which isn't thread-safe on every Python)
+        code_hashes = {name:self.stages[name].code_hash() for name in needed}
+
+        records = {}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while len(records)<len(needed):
+
+                ## Start every stage whose inputs are ready
+                for name in needed:
+                    stage = self.stages[name]
+                    if (name in records) or (name in running):
+                        continue
+                    if all([dep in records for dep in stage.inputs]):
+                        running[name] = pool.submit(self._run_stage,stage,code_hashes[name],
+                                                    [self.results[dep] for dep in stage.inputs],
+                                                    [self.digests[dep] for dep in stage.inputs])
+
+                finished,_ = wait(list(running.values()),return_when=FIRST_COMPLETED)
+                for name,future in list(running.items()):
+                    if future not in finished:
+                        continue
+                    del running[name]
+                    try:
+                        result, digest, status, secs = future.result()
+                    except Exception as e:
+                        raise Exception(f"[!] Stage '{name}' failed: {e}") from e
+
+                    self.results[name] = result
+                    self.digests[name] = digest
+                    records[name] = {'status':status,'seconds':round(secs,3)}
+                    if self.verbose:
+                        print(f"   - [{status}] {name} ({secs:.2f} sec)")
+
+        self.report = pd.DataFrame.from_dict(records,orient='index')
+        self.report.index.name = 'stage'
+        return {name:self.results[name] for name in needed}
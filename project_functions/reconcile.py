@@ -0,0 +1,165 @@
+"""Matching the columns of an old and a new data source (e.g. the archived
+covidtracking.com data vs. the HHS hospital/JHU data) by how closely their
+values agree.
+
+Both sources are aligned on a dense (states, dates, columns) grid (the union of
+their dates, the states they share), with NaN for missing rows/values. The RMSE
+and correlation of every (old column, new column) pair are then computed for
+every state at once from masked sums (np.einsum), only over the dates where both
+values are present.
+
+EXAMPLE USAGE:
+>>> matcher = ColumnMatcher(df_old,df_new)
+>>> matcher.rank(top_n=3)
+>>> new_to_match_old_map = matcher.get_mapper()
+"""
+import numpy as np
+import pandas as pd
+
+
+def _get_dates(df, date_col=None):
+    """Returns df's dates (date_col or the index) as a day-normalized DatetimeIndex"""
+    dates = df.index if date_col is None else df[date_col]
+    return pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+
+
+def _numeric_cols(df, exclude=()):
+    return [col for col in df.columns if (col not in exclude) and
+            pd.api.types.is_numeric_dtype(df[col].dtype) and
+            not pd.api.types.is_bool_dtype(df[col].dtype)]
+
+
+def align_sources(df, cols, states, dates, group_col='state', date_col=None):
+    """Returns the (n_states, n_dates, n_cols) array of df's cols on the grid of
+    states and dates (NaN where df has no value; duplicate rows are summed)."""
+    state_idx = pd.Index(states).get_indexer(df[group_col].astype(object))
+    date_idx = pd.Index(dates).get_indexer(_get_dates(df,date_col))
+    keep = (state_idx>=0)&(date_idx>=0)
+    cell = (state_idx*len(dates)+date_idx)[keep]
+    n_cells = len(states)*len(dates)
+
+    values = df[cols].astype(np.float64).to_numpy()[keep]
+    is_valid = ~np.isnan(values)
+    grid = np.full((n_cells,len(cols)),np.nan)
+    for i in range(len(cols)):
+        sums = np.bincount(cell,weights=np.where(is_valid[:,i],values[:,i],0),minlength=n_cells)
+        counts = np.bincount(cell,weights=is_valid[:,i],minlength=n_cells)
+        grid[:,i] = np.where(counts>0,sums,np.nan)
+    return grid.reshape(len(states),len(dates),len(cols))
+
+
+class ColumnMatcher(object):
+    """RMSE and correlation between every old and new column, for every state.
+
+    Args:
+        old_df, new_df (Frame): long data with a group_col column and dates in
+                                the index (or in old_date_col/new_date_col)
+        old_cols, new_cols (list): columns to compare (default: the numeric ones)
+        old_group_col, new_group_col (str): state columns of old_df/new_df
+        old_date_col, new_date_col (str): date columns (None = use the index)
+        min_obs (int): minimum number of dates with both values for a state's
+                       RMSE/correlation (else NaN)
+
+    Attributes:
+        states, dates, old_cols, new_cols (Index): axes of the arrays
+        n_obs (ndarray): (n_states, n_old, n_new) dates with both values
+        rmse, corr (ndarray): (n_states, n_old, n_new) RMSE and Pearson correlation
+    """
+    def __init__(self, old_df, new_df, old_cols=None, new_cols=None,
+                 old_group_col='state', new_group_col='state',
+                 old_date_col=None, new_date_col=None, min_obs=7):
+        if old_cols is None:
+            old_cols = _numeric_cols(old_df,exclude=[old_group_col,old_date_col])
+        if new_cols is None:
+            new_cols = _numeric_cols(new_df,exclude=[new_group_col,new_date_col])
+        self.old_cols = pd.Index(old_cols,name='old_col')
+        self.new_cols = pd.Index(new_cols,name='new_col')
+        self.min_obs = min_obs
+
+        ## Grid of the shared states and the union of the dates
+        old_states = set(old_df[old_group_col].dropna().astype(object))
+        self.states = pd.Index(sorted(old_states.intersection(
+            new_df[new_group_col].dropna().astype(object))),name='state')
+        self.dates = _get_dates(old_df,old_date_col).union(
+            _get_dates(new_df,new_date_col)).unique().sort_values()
+
+        old = align_sources(old_df,list(old_cols),self.states,self.dates,
+                            group_col=old_group_col,date_col=old_date_col)
+        new = align_sources(new_df,list(new_cols),self.states,self.dates,
+                            group_col=new_group_col,date_col=new_date_col)
+        self._compute(old,new)
+
+
+    def _compute(self, old, new):
+        """Masked pairwise sums over the dates (axis 1): 'sda,sdb->sab'"""
+        old_mask = (~np.isnan(old)).astype(np.float64)
+        new_mask = (~np.isnan(new)).astype(np.float64)
+        old = np.where(old_mask>0,old,0)
+        new = np.where(new_mask>0,new,0)
+        pair_sum = lambda a,b: np.einsum('sda,sdb->sab',a,b,optimize=True)
+
+        n = pair_sum(old_mask,new_mask)
+        sum_old = pair_sum(old,new_mask)
+        sum_new = pair_sum(old_mask,new)
+        sum_old2 = pair_sum(old**2,new_mask)
+        sum_new2 = pair_sum(old_mask,new**2)
+        sum_prod = pair_sum(old,new)
+
+        with np.errstate(divide='ignore',invalid='ignore'):
+            sse = np.clip(sum_old2-2*sum_prod+sum_new2,0,None)
+            rmse = np.sqrt(sse/n)
+            cov = sum_prod-sum_old*sum_new/n
+            var_old = np.clip(sum_old2-sum_old**2/n,0,None)
+            var_new = np.clip(sum_new2-sum_new**2/n,0,None)
+            corr = np.clip(cov/np.sqrt(var_old*var_new),-1,1)
+
+        too_few = n<self.min_obs
+        rmse[too_few] = np.nan
+        corr[too_few|(var_old==0)|(var_new==0)] = np.nan
+        self.n_obs = n.astype(np.int64)
+        self.rmse = rmse
+        self.corr = corr
+        self._sse = np.where(too_few,0,sse)
+
+
+    def get_matrix(self, metric='rmse', state=None):
+        """Returns the (old cols x new cols) Frame of metric ('rmse','corr' or
+        'n_obs') for state. If state is None, the RMSE is pooled over the states'
+        dates, the correlation is the mean of the states' and n_obs is the total."""
+        if state is not None:
+            values = getattr(self,metric)[self.states.get_loc(state)]
+        elif metric=='rmse':
+            n = np.where(self.n_obs<self.min_obs,0,self.n_obs).sum(axis=0)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                values = np.sqrt(self._sse.sum(axis=0)/n)
+        elif metric=='corr':
+            with np.errstate(invalid='ignore'):
+                n_valid = (~np.isnan(self.corr)).sum(axis=0)
+                values = np.where(n_valid>0,np.nansum(self.corr,axis=0)/np.maximum(n_valid,1),np.nan)
+        elif metric=='n_obs':
+            values = self.n_obs.sum(axis=0)
+        else:
+            raise Exception(f"metric must be 'rmse','corr' or 'n_obs' (not '{metric}').")
+        return pd.DataFrame(values,index=self.old_cols,columns=self.new_cols)
+
+
+    def rank(self, by='rmse', top_n=3, state=None):
+        """Returns the top_n new columns matching each old column (lowest RMSE or
+        highest correlation), as a Frame with old_col, rank, new_col, rmse, corr
+        and n_obs (for state, or over all states if None)."""
+        index = pd.MultiIndex.from_product([self.old_cols,self.new_cols])
+        matrices = {metric:self.get_matrix(metric,state=state).to_numpy().ravel()
+                    for metric in ['rmse','corr','n_obs']}
+        res = pd.DataFrame(matrices,index=index).reset_index()
+        res = res.dropna(subset=[by])
+        res = res.sort_values(['old_col',by],ascending=[True,by=='rmse'])
+        res['rank'] = res.groupby('old_col').cumcount()+1
+        res = res.loc[res['rank']<=top_n]
+        return res[['old_col','rank','new_col','rmse','corr','n_obs']].reset_index(drop=True)
+
+
+    def get_mapper(self, by='rmse', state=None):
+        """Returns {new_col: old_col} of each old column's best match (e.g. to rename
+        the new columns to the old names)"""
+        best = self.rank(by=by,top_n=1,state=state)
+        return dict(zip(best['new_col'],best['old_col']))
@@ -0,0 +1,130 @@
+"""Declarative dtype schema for the data sources' columns.
+
+The loaders pass get_dtypes() to read_csv so columns are parsed straight into
+compact dtypes (instead of object strings and int64/float64):
+    - identifier columns (CATEGORY_COLS) are categoricals
+    - some columns have declared dtypes (SOURCE_DTYPES): integer counts that
+      fit in 32 bits and the hospital ratios (float32)
+    - any other numeric column is downcast afterwards, only where lossless (downcast).
+      Float counts (e.g. the kaggle Confirmed) are not declared as float32, which
+      is not exact above 2**24.
+
+EXAMPLE USAGE:
+>>> df = pd.read_csv(fpath,dtype=schema.get_dtypes(source='kaggle'))
+>>> schema.memory_report({'df':df})
+"""
+import numpy as np
+import pandas as pd
+
+
+## Identifier columns (parsed as categoricals for every source)
+CATEGORY_COLS = ['Country/Region','Province/State','state','State_Code','Admin2',
+                 'Combined_Key','Province_State','Country_Region','iso2','iso3']
+
+
+def _jhu_ts_dtype(col):
+    """JHU time series date columns (e.g. '1/22/20') hold cumulative counts"""
+    if len(col.split('/'))>1:
+        return 'int32'
+
+
+def _hospital_dtype(col):
+    """HHS hospital data: float32 for the utilization/percent ratios and
+    nullable Int32 for the counts"""
+    if col in ['state','date']:
+        return None
+    if ('utilization' in col) or ('percent' in col):
+        return 'float32'
+    return 'Int32'
+
+
+## {source: {column: dtype} or function(column) -> dtype (or None)}
+SOURCE_DTYPES = {
+    'kaggle':{'SNo':'int32'},
+    'jhu_ts':_jhu_ts_dtype,
+    'hospital':_hospital_dtype,
+    'covid_tracking':{},
+}
+
+
+def get_dtypes(columns=None, source=None):
+    """Returns read_csv dtype dict for columns (if None, every declared
+    column: read_csv ignores the ones a file does not have).
+
+    Args:
+        columns (list): column names of the file
+        source (str): key of SOURCE_DTYPES with the source's declared dtypes
+    """
+    declared = SOURCE_DTYPES.get(source,{})
+    if columns is None:
+        if callable(declared):
+            raise Exception(f"The columns are needed for the '{source}' dtypes.")
+        columns = [*CATEGORY_COLS,*declared.keys()]
+
+    dtypes = {}
+    for col in columns:
+        if col in CATEGORY_COLS:
+            dtype = 'category'
+        elif callable(declared):
+            dtype = declared(col)
+        else:
+            dtype = declared.get(col)
+        if dtype is not None:
+            dtypes[col] = dtype
+    return dtypes
+
+
+def downcast(df, exclude=()):
+    """Downcasts int64 columns to int32 and float64 columns to float32 in place,
+    only for the columns whose values are unchanged by it."""
+    for col in df.columns:
+        if col in exclude:
+            continue
+        values = df[col].values
+        if values.dtype==np.int64:
+            if (len(values)==0) or ((values.min()>=np.iinfo(np.int32).min) and
+                                    (values.max()<=np.iinfo(np.int32).max)):
+                df[col] = values.astype(np.int32)
+        elif values.dtype==np.float64:
+            values32 = values.astype(np.float32)
+            if ((values32==values)|np.isnan(values)).all():
+                df[col] = values32
+    return df
+
+
+def apply_schema(df, source=None):
+    """Converts an already loaded frame to the schema's dtypes (e.g. after
+    concatenating chunks whose categoricals had different categories)."""
+    for col,dtype in get_dtypes(df.columns,source=source).items():
+        if str(df[col].dtype)!=dtype:
+            df[col] = df[col].astype(dtype)
+    return downcast(df)
+
+
+def _default_nbytes(series):
+    """Bytes series would take with the default read_csv dtypes"""
+    if isinstance(series.dtype,pd.CategoricalDtype):
+        return series.astype(object).memory_usage(deep=True,index=False)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return len(series)*8
+    return series.memory_usage(deep=True,index=False)
+
+
+def memory_report(frames):
+    """Returns a Frame with the memory (MB) each frame takes with the schema's dtypes
+    vs. the default dtypes (object strings and int64/float64), and the savings.
+
+    Args:
+        frames (dict): {name: Frame}
+    """
+    report = {}
+    for name,df in frames.items():
+        index_bytes = df.index.memory_usage(deep=True)
+        schema_bytes = index_bytes + df.memory_usage(deep=True,index=False).sum()
+        default_bytes = index_bytes + sum([_default_nbytes(df[col]) for col in df.columns])
+        report[name] = {'default_MB':default_bytes/1e6,'schema_MB':schema_bytes/1e6,
+                        'saved_MB':(default_bytes-schema_bytes)/1e6,
+                        'saved_%':100*(1-schema_bytes/default_bytes) if default_bytes else 0.}
+    report = pd.DataFrame.from_dict(report,orient='index').round(3)
+    report.index.name = 'frame'
+    return report
@@ -0,0 +1,14 @@
+import os,sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0,REPO_DIR)
+
+
+@pytest.fixture
+def repo_dir(monkeypatch):
+    """Runs the test from the repo's folder (for the 'Reference Data/' files)"""
+    monkeypatch.chdir(REPO_DIR)
+    return REPO_DIR
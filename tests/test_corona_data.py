@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions.coronavirus_functions import (CoronaData, get_group_ts, get_state_ts,
+                                                      plot_states)
+from project_functions.frame_cache import copy_on_write_enabled
+
+LOCATIONS = [('New York','US'),('Maryland','US'),('Montgomery County, MD','US'),
+             ('Virginia','US'),('Hubei','Mainland China'),(np.nan,'Italy')]
+
+
+def write_kaggle_csv(fpath, n_days=20):
+    """Writes a small covid_19_data.csv (the kaggle dataset's main file)"""
+    dates = pd.date_range('2020-03-01',periods=n_days)
+    rows = [{'ObservationDate':date.strftime('%m/%d/%Y'),'Province/State':province,
+             'Country/Region':country,'Last Update':date.strftime('%Y-%m-%d 00:00:00'),
+             'Confirmed':float(100*i+d),'Deaths':float(i+d//5),'Recovered':float(d)}
+            for d,date in enumerate(dates) for i,(province,country) in enumerate(LOCATIONS)]
+    df = pd.DataFrame(rows)
+    df.insert(0,'SNo',np.arange(1,len(df)+1))
+    df.to_csv(fpath,index=False)
+    return df
+
+
+@pytest.fixture
+def corona_data(tmpdir, repo_dir):
+    write_kaggle_csv(str(tmpdir.join('covid_19_data.csv')))
+    return CoronaData(data_dir=str(tmpdir)+'/',download=False,verbose=False)
+
+
+def test_ts_helpers_on_typed_frames(corona_data):
+    df_us = corona_data.df_us
+    assert isinstance(df_us['state'].dtype,pd.CategoricalDtype)
+
+    ## MD has the Maryland and Montgomery County rows
+    md = get_state_ts(df_us,'MD')
+    assert list(md.columns)==['MD - Confirmed','MD - Deaths','MD - Recovered']
+    assert md['MD - Confirmed'].iloc[0]==100+200
+    pd.testing.assert_frame_equal(get_state_ts(corona_data.ts_index,'MD'),md)
+
+    weekly = get_state_ts(df_us,'VA',freq='W')
+    assert weekly['VA - Confirmed'].sum()==df_us.loc[df_us['state']=='VA','Confirmed'].sum()
+
+    plot_df = plot_states(df_us,['MD','NY'],plot_cols=['Confirmed','Deaths'],df_only=True)
+    assert list(plot_df.columns)==['Date','MD - Confirmed','MD - Deaths',
+                                   'NY - Confirmed','NY - Deaths']
+    assert len(plot_df)==20
+
+    world = get_group_ts(corona_data.df,'Italy',group_col='Country/Region',freq='W')
+    assert world['Italy - Confirmed'].sum()==sum(500+d for d in range(20))
+    assert corona_data.get_group_ts('Italy',group_col='Country/Region').shape==(20,3)
+
+
+def test_app_menu_data(corona_data, monkeypatch):
+    pytest.importorskip('dash')
+    import app
+    monkeypatch.setattr(app,'corona_data',corona_data)
+    app.get_menu_data.cache_clear()
+    try:
+        map_, plot_cols, plot_cols_world, states, countries = app.get_menu_data()
+    finally:
+        app.get_menu_data.cache_clear()
+    assert list(states)==['MD','NY','VA']
+    assert list(map_.data[0]['locations'])==['MD','NY','VA']
+    assert 'Confirmed' in plot_cols
+
+
+@pytest.mark.skipif(not copy_on_write_enabled(),reason='needs Copy-on-Write')
+def test_editing_df_and_df_us_leaves_the_data_unchanged(corona_data):
+    for attr in ['df','df_us']:
+        df = getattr(corona_data,attr)
+        confirmed = df['Confirmed'].copy()
+        df.loc[df.index[0],'Confirmed'] = -1.
+        df['Deaths'] = 0.
+        df.loc[df.index[0],'Country/Region'] = 'Italy'
+
+        data = getattr(corona_data,attr)
+        pd.testing.assert_series_equal(data['Confirmed'],confirmed)
+        assert (data['Deaths']>0).any() and (data['Country/Region'].iloc[0]!='Italy')
+
+    ## The data itself can still be updated in place
+    corona_data._df.loc[corona_data._df.index[0],'Confirmed'] = -2.
+    assert corona_data.df['Confirmed'].iloc[0]==-2.
+
+
+def test_low_memory_mode_keeps_the_same_data(corona_data, tmpdir):
+    low_memory = CoronaData(data_dir=str(tmpdir)+'/',download=False,verbose=False,
+                            low_memory=True)
+    assert '_raw_df' not in low_memory.__dict__
+    assert list(low_memory.df.columns)==list(corona_data.df.columns)
+    pd.testing.assert_frame_equal(low_memory.df,corona_data.df)
+    pd.testing.assert_frame_equal(low_memory.df_us,corona_data.df_us)
+    for state in corona_data.STATES:
+        pd.testing.assert_frame_equal(low_memory.STATES[state],corona_data.STATES[state])
+
+    ## raw_df is read from disk again when needed
+    pd.testing.assert_frame_equal(low_memory.raw_df,corona_data.raw_df)
+    assert '_raw_df' not in low_memory.__dict__
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions.coronavirus_functions import CovidTrackingProject
+from project_functions.frame_cache import FrameCache
+from project_functions.local_server import LocalServer, StaticFile
+
+PATHS = {'us':'/api/v1/us/daily.csv','states':'/api/v1/states/daily.csv',
+         'states_metadata':'/api/v1/states/info.csv'}
+
+
+def make_files():
+    """StaticFile of each covidtracking.com source (30 days of MD and VA)"""
+    dates = pd.date_range('2020-03-01',periods=30).strftime('%Y%m%d')
+    cols = CovidTrackingProject.columns
+    states = pd.DataFrame({'date':np.tile(dates,2),'state':['MD']*30+['VA']*30,
+                           **{c:np.arange(60) for c in cols['good'] if c!='state'}})
+    us_cols = CovidTrackingProject.columns_us['good']+CovidTrackingProject.columns_us['deprecated']
+    us = pd.DataFrame({'date':dates,**{c:np.arange(30) for c in us_cols}})
+    meta = pd.DataFrame({'state':['MD','VA'],'fips':[24,51]})
+    return {'us':StaticFile(us.to_csv(index=False).encode()),
+            'states':StaticFile(states.to_csv(index=False).encode()),
+            'states_metadata':StaticFile(meta.to_csv(index=False).encode())}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    files = make_files()
+    with LocalServer({PATHS[key]:handler for key,handler in files.items()}) as server:
+        server.files = files
+        monkeypatch.setattr(CovidTrackingProject,'urls',
+                            {key:server.url+path for key,path in PATHS.items()})
+        yield server
+
+
+def get_data(tmpdir, **kwargs):
+    return CovidTrackingProject(base_folder=str(tmpdir)+'/',verbose=False,
+                                cache=FrameCache(),**kwargs)
+
+
+def test_failed_sources_raise_one_error(server, tmpdir):
+    CovidTrackingProject.urls['us'] = server.url+'/missing/us.csv'
+    CovidTrackingProject.urls['states_metadata'] = server.url+'/missing/info.csv'
+    with pytest.raises(Exception) as error:
+        get_data(tmpdir,retries=1,df_type='states')
+
+    msg = str(error.value)
+    assert '2 of 3 sources failed' in msg
+    assert 'us (2 attempts' in msg
+    assert 'states_metadata (2 attempts' in msg
+    assert '/missing/info.csv' in msg
+    assert 'states (' not in msg
+
+
+def test_unchanged_sources_are_not_downloaded_again(server, tmpdir):
+    data = get_data(tmpdir)
+    assert all(result['modified'] for result in data.download_results.values())
+    df_states = data.df_states.copy()
+
+    data = get_data(tmpdir)
+    assert not any(result['modified'] for result in data.download_results.values())
+    assert [handler.transfers for handler in server.files.values()]==[1,1,1]
+    pd.testing.assert_frame_equal(data.df_states,df_states)
+
+    ## Only the changed source is downloaded
+    server.files['states_metadata'].update(b'state,fips\nMD,24\n')
+    data = get_data(tmpdir)
+    assert [handler.transfers for handler in server.files.values()]==[1,1,2]
+    assert list(data.df_states_metadata['state'])==['MD']
+
+
+def test_local_data_is_loaded_from_a_parquet_cache(tmpdir):
+    pytest.importorskip('pyarrow')
+    files = make_files()
+    for key,fname in CovidTrackingProject.local_files.items():
+        tmpdir.join(fname).write_binary(files[key].body)
+    expected = pd.read_csv(str(tmpdir.join('states_daily.csv')),parse_dates=['date'],
+                           index_col='date')
+
+    data = get_data(tmpdir,download=False)
+    caches = sorted(f.basename for f in tmpdir.listdir() if f.ext=='.parquet')
+    assert caches==['states_daily.parquet','states_metadata.parquet','us_daily.parquet']
+    df = data.get_df('states',remove_dep_cols=False)
+    assert list(df.columns)==list(expected.columns) and df.index.equals(expected.index)
+    np.testing.assert_array_equal(df['positive'].values,expected['positive'].values)
+    assert list(data.df_states.columns)==CovidTrackingProject.columns['good']
+
+    ## The cache is reused, and remade once the csv is newer
+    cache = tmpdir.join('states_daily.parquet')
+    mtime = cache.mtime()
+    get_data(tmpdir,download=False)
+    assert cache.mtime()==mtime
+
+    tmpdir.join('states_daily.csv').setmtime(mtime+10)
+    data = get_data(tmpdir,download=False)
+    assert cache.mtime()>mtime
+    assert len(data.df_states)==len(expected)
@@ -0,0 +1,59 @@
+import os
+import zipfile
+
+from project_functions.datasets import DatasetCache, MirrorSource
+
+DATASET = 'owner/covid-dataset'
+
+
+def write_zip(fpath, members):
+    os.makedirs(os.path.dirname(fpath),exist_ok=True)
+    with zipfile.ZipFile(fpath,'w') as zip_file:
+        for name,text in members.items():
+            zip_file.writestr(name,text)
+
+
+def test_only_changed_members_are_extracted(tmpdir):
+    mirror_fpath = str(tmpdir.join('mirror','owner','covid-dataset.zip'))
+    members = {'covid_19_data.csv':'a,b\n1,2\n','time_series.csv':'c\n3\n',
+               'folder/other.csv':'d\n4\n'}
+    write_zip(mirror_fpath,members)
+    source = MirrorSource(str(tmpdir.join('mirror')))
+    cache = DatasetCache(str(tmpdir.join('cache')),source=source,verbose=False)
+    extract_to = str(tmpdir.join('data'))
+
+    result = cache.fetch(DATASET,extract_to=extract_to)
+    assert result['downloaded'] and (sorted(result['extracted'])==sorted(members))
+
+    ## Unchanged: not downloaded or extracted again
+    result = cache.fetch(DATASET,extract_to=extract_to)
+    assert (not result['downloaded']) and (result['extracted']==[])
+    assert source.downloads==1
+
+    ## A new version with one changed member
+    write_zip(mirror_fpath,{**members,'time_series.csv':'c\n3\n5\n'})
+    result = cache.fetch(DATASET,extract_to=extract_to)
+    assert result['downloaded'] and (result['extracted']==['time_series.csv'])
+    with open(os.path.join(extract_to,'time_series.csv')) as f:
+        assert f.read()=='c\n3\n5\n'
+
+    ## A deleted file is extracted again
+    os.remove(os.path.join(extract_to,'folder','other.csv'))
+    result = cache.fetch(DATASET,extract_to=extract_to)
+    assert (not result['downloaded']) and (result['extracted']==['folder/other.csv'])
+
+    ## Another folder gets all members
+    result = cache.fetch(DATASET,extract_to=str(tmpdir.join('data2')))
+    assert sorted(result['extracted'])==sorted(members)
+    assert source.downloads==2
+
+
+def test_cached_zip_is_used_when_the_source_fails(tmpdir):
+    write_zip(str(tmpdir.join('mirror','covid-dataset.zip')),{'data.csv':'a\n1\n'})
+    cache = DatasetCache(str(tmpdir.join('cache')),verbose=False,
+                         source=MirrorSource(str(tmpdir.join('mirror'))))
+    version = cache.fetch(DATASET)['version']
+
+    cache.source = MirrorSource(str(tmpdir.join('missing')))
+    result = cache.fetch(DATASET)
+    assert (not result['downloaded']) and (result['version']==version)
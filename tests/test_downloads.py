@@ -0,0 +1,30 @@
+import os
+
+from project_functions.downloads import download_if_modified
+from project_functions.local_server import LocalServer, StaticFile
+
+
+def test_download_if_modified(tmpdir):
+    handler = StaticFile(b'a,b\n1,2\n')
+    fpath = str(tmpdir.join('data.csv'))
+    with LocalServer({'/data.csv':handler}) as server:
+        url = server.url+'/data.csv'
+        result = download_if_modified(url,fpath)
+        assert result['modified'] and (result['status']==200) and (result['bytes']==8)
+
+        ## Unchanged: the server answers with a 304 and the file is kept
+        result = download_if_modified(url,fpath)
+        assert (not result['modified']) and (result['status']==304) and (result['bytes']==0)
+        assert handler.transfers==1
+
+        ## Changed on the server
+        handler.update(b'a,b\n3,4\n5,6\n')
+        result = download_if_modified(url,fpath)
+        assert result['modified'] and (result['validator']==handler.etag)
+        with open(fpath,'rb') as f:
+            assert f.read()==b'a,b\n3,4\n5,6\n'
+
+        ## A missing file is downloaded again
+        os.remove(fpath)
+        assert download_if_modified(url,fpath)['modified']
+        assert handler.transfers==3
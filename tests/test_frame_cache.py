@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions.frame_cache import FrameCache, copy_on_write_enabled
+
+
+def make_frame(n_rows=1000, value=0.):
+    return pd.DataFrame({'a':np.full(n_rows,value),'b':np.arange(n_rows,dtype=np.float64)})
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def test_eviction_keeps_the_cache_under_budget():
+    nbytes = frame_nbytes(make_frame())
+    cache = FrameCache(max_bytes=3.5*nbytes)
+    for i in range(10):
+        cache.put(i,make_frame(value=i))
+        assert cache.nbytes<=cache.max_bytes
+        if i==1:
+            cache.get(0)  ## 0 is now more recent than 1
+
+    assert len(cache)==3 and (cache.evictions==7)
+    assert [key in cache for key in [7,8,9]]==[True,True,True]
+    assert (0 not in cache) and (1 not in cache)
+
+    ## Least recently used first
+    cache = FrameCache(max_bytes=2.5*nbytes)
+    cache.put('x',make_frame())
+    cache.put('y',make_frame())
+    cache.get('x')
+    cache.put('z',make_frame())
+    assert ('x' in cache) and ('y' not in cache) and ('z' in cache)
+
+
+def test_frames_over_the_budget_are_not_cached():
+    cache = FrameCache(max_bytes=frame_nbytes(make_frame())//2)
+    df = cache.put('big',make_frame())
+    assert len(df)==1000
+    assert ('big' not in cache) and (cache.nbytes==0)
+
+
+def test_get_or_load_and_stats():
+    cache = FrameCache()
+    calls = []
+    loader = lambda: calls.append(1) or make_frame(value=5.)
+    for _ in range(3):
+        df = cache.get_or_load('key',loader)
+    assert len(calls)==1 and (df['a']==5.).all()
+    assert cache.stats['hits']==2 and (cache.stats['misses']==1)
+
+    ## Entries are shared, not copied
+    df2 = cache.get('key')
+    assert np.shares_memory(df2['b'].values,df['b'].values)
+
+
+@pytest.mark.skipif(not copy_on_write_enabled(),reason='needs Copy-on-Write')
+def test_editing_a_view_leaves_the_entry_unchanged():
+    cache = FrameCache()
+    source = make_frame(n_rows=10)
+    source['c'] = pd.Categorical(['x','y']*5)
+    df = cache.put('key',source)
+
+    df.loc[0,'a'] = 1.
+    df['b'] *= 2
+    df.loc[1,'c'] = 'y'
+    df['d'] = 0
+    assert df.loc[0,'a']==1. and (df.loc[1,'c']=='y')
+
+    for entry in [cache.get('key'),source]:
+        assert list(entry.columns)==['a','b','c']
+        assert (entry['a']==0.).all() and (entry['b']==np.arange(10)).all()
+        assert list(entry['c'])==['x','y']*5
+
+    ## The source itself can still be edited in place
+    source.loc[0,'a'] = 2.
+    assert source.loc[0,'a']==2.
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions.coronavirus_functions import (GroupTimeIndex, get_all_group_ts,
+                                                      get_group_ts)
+
+
+def make_long_df():
+    """df_us-like rows: several rows per state and day, states with different
+    date ranges, a missing day and the rows out of order"""
+    rng = np.random.RandomState(0)
+    rows = []
+    for state,start,n_days in [('VA','2020-03-03',12),('MD','2020-03-01',10),('AK','2020-03-05',4)]:
+        for date in pd.date_range(start,periods=n_days):
+            if (state=='MD') and (date==pd.Timestamp('2020-03-04')):
+                continue
+            for _ in range(rng.randint(1,4)):
+                rows.append({'Date':date,'state':state,'Confirmed':float(rng.randint(100)),
+                             'Deaths':float(rng.randint(10))})
+    df = pd.DataFrame(rows).sample(frac=1,random_state=1)
+    df['state'] = pd.Categorical(df['state'])
+    return df.set_index('Date')
+
+
+def test_get_all_group_ts_matches_get_group_ts():
+    df = make_long_df()
+    STATES = get_all_group_ts(df)
+    assert sorted(STATES)==['AK','MD','VA']
+    for state,df_state in STATES.items():
+        expected = get_group_ts(df,state)
+        pd.testing.assert_frame_equal(df_state.reset_index(),expected.reset_index(),
+                                      check_dtype=False)
+
+    ## One wide frame of all the states' columns
+    panel = get_all_group_ts(df,as_panel=True)
+    assert panel.index.min()==pd.Timestamp('2020-03-01') and len(panel)==14
+    for state,df_state in STATES.items():
+        np.testing.assert_array_equal(panel.loc[df_state.index,df_state.columns].values,
+                                      df_state.values)
+        assert panel.loc[~panel.index.isin(df_state.index),df_state.columns].isna().all().all()
+
+
+def test_group_time_index_queries_match_masks():
+    df = make_long_df()
+    index = GroupTimeIndex(df,'state')
+    assert index.groups==['AK','MD','VA'] and ('MD' in index) and ('NY' not in index)
+
+    for start,end in [(None,None),('2020-03-04','2020-03-08'),('2020-02-01','2020-03-02'),
+                      ('2020-03-20',None),('2020-03-06','2020-03-05')]:
+        result = index.query(['MD','VA'],start=start,end=end,metrics=['Confirmed'])
+        for state in ['MD','VA']:
+            mask = (df['state']==state)
+            if start is not None:
+                mask &= (df.index>=start)
+            if end is not None:
+                mask &= (df.index<=end)
+            expected = df.loc[mask,['Confirmed']].sort_index(kind='mergesort')
+            assert result[state].index.equals(expected.index)
+            assert list(result[state]['Confirmed'])==list(expected['Confirmed'])
+
+    ## Same output as get_group_ts (also when given the index)
+    weekly = index.query('VA',start='2020-03-04',freq='W')
+    expected = df[(df['state']=='VA')&(df.index>='2020-03-04')][['Confirmed','Deaths']]
+    np.testing.assert_array_equal(weekly.values,expected.resample('W').sum().values)
+    for freq in ['D','W']:
+        pd.testing.assert_frame_equal(get_group_ts(index,'MD',freq=freq),
+                                      get_group_ts(df,'MD',freq=freq),check_dtype=False)
+
+    with pytest.raises(KeyError):
+        index.get_rows('NY')
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions import data_acquisition as da
+from project_functions.local_server import LocalServer, SocrataResource
+
+
+def make_hospital_df(n_days=2600):
+    dates = pd.date_range('2020-01-01',periods=n_days).strftime('%Y-%m-%dT00:00:00.000')
+    return pd.DataFrame({'state':np.repeat(['MD','VA'],n_days),'date':np.tile(dates,2),
+                         'inpatient_beds':np.arange(2*n_days)})
+
+
+def page_requests(server):
+    return [query for path,query in server.request_log if '$offset' in query]
+
+
+def test_pages_are_fetched_in_order(tmpdir):
+    df = make_hospital_df()
+    resource = SocrataResource(df,fail_offsets=[2000],fail_times=1)
+    with LocalServer({'/resource.csv':resource}) as server:
+        out = da.get_hospital_data(base_url=server.url+'/resource.csv',
+                                   checkpoint_dir=str(tmpdir))
+        assert len(page_requests(server))==6+1
+
+    assert out.shape==df.shape
+    np.testing.assert_array_equal(out['inpatient_beds'],df['inpatient_beds'])
+    assert list(out['state'].astype(str))==list(df['state'])
+    assert os.listdir(str(tmpdir))==[]
+
+
+def test_failed_pages_raise_and_resume(tmpdir):
+    df = make_hospital_df()
+    resource = SocrataResource(df,fail_offsets=[3000],fail_times=100)
+    with LocalServer({'/resource.csv':resource}) as server:
+        url = server.url+'/resource.csv'
+        with pytest.raises(Exception) as error:
+            da.get_hospital_data(base_url=url,checkpoint_dir=str(tmpdir))
+        assert '1 of 6 pages failed' in str(error.value)
+        assert 'offset=3000' in str(error.value)
+
+        ## The completed pages were kept
+        page_dir, = [os.path.join(str(tmpdir),d) for d in os.listdir(str(tmpdir))]
+        assert len(os.listdir(page_dir))==5
+
+        ## Re-running only fetches the failed page
+        resource.fail_times = 0
+        n_requests = len(page_requests(server))
+        out = da.get_hospital_data(base_url=url,checkpoint_dir=str(tmpdir))
+        offsets = [int(query['$offset']) for query in page_requests(server)[n_requests:]]
+        assert offsets==[3000]
+
+    np.testing.assert_array_equal(out['inpatient_beds'],df['inpatient_beds'])
+
+
+def test_resume_after_the_dataset_grew(tmpdir):
+    df = make_hospital_df()
+    resource = SocrataResource(df.iloc[:2500])
+    with LocalServer({'/resource.csv':resource}) as server:
+        url = server.url+'/resource.csv'
+        da.get_hospital_data(base_url=url,checkpoint_dir=str(tmpdir),keep_checkpoint=True)
+
+        ## Only the (previously partial) last page and the new pages are fetched
+        resource.df = df.iloc[:4200]
+        n_requests = len(page_requests(server))
+        out = da.get_hospital_data(base_url=url,checkpoint_dir=str(tmpdir))
+        offsets = sorted(int(query['$offset']) for query in page_requests(server)[n_requests:])
+        assert offsets==[2000,3000,4000]
+
+    np.testing.assert_array_equal(out['inpatient_beds'],df['inpatient_beds'][:4200])
+
+
+def test_where_filter(tmpdir):
+    df = make_hospital_df(n_days=30)
+    with LocalServer({'/resource.csv':SocrataResource(df)}) as server:
+        out = da.get_hospital_data(base_url=server.url+'/resource.csv',
+                                   where="date>='2020-01-25'",checkpoint_dir=str(tmpdir))
+    assert len(out)==2*6
+    assert (out['date'].astype(str)>='2020-01-25').all()
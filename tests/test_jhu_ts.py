@@ -0,0 +1,82 @@
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from project_functions import data_acquisition as da
+
+STATE_CODES = {'Maryland':'MD','Virginia':'VA','Alaska':'AK'}
+
+
+def make_jhu_ts(n_days=6):
+    """Wide JHU-style time series: counties of 3 states (rows out of state order)
+    and a row whose state isn't in STATE_CODES"""
+    dates = pd.date_range('2020-12-29',periods=n_days)
+    date_cols = [f"{d.month}/{d.day}/{d.strftime('%y')}" for d in dates]
+    states = ['Virginia','Maryland','Diamond Princess','Virginia','Alaska','Maryland','Virginia']
+    df = pd.DataFrame({'UID':np.arange(len(states)),'iso2':'US','FIPS':np.arange(len(states))+1.,
+                       'Admin2':[f'county {i}' for i in range(len(states))],
+                       'Province_State':states,'Country_Region':'US','Lat':38.,'Long_':-77.,
+                       'Combined_Key':[f'county {i}, {s}, US' for i,s in enumerate(states)]})
+    values = np.arange(len(states)*n_days).reshape(len(states),n_days)*1000
+    return pd.concat([df,pd.DataFrame(values,columns=date_cols)],axis=1)
+
+
+def write_zip(tmpdir, df, file='RAW_us_confirmed_cases.csv'):
+    fpath = str(tmpdir.join('jhu.zip'))
+    with zipfile.ZipFile(fpath,'w') as jhu_zip:
+        jhu_zip.writestr(file,df.to_csv(index=False))
+    return fpath
+
+
+def test_load_raw_ts_file_from_zip(tmpdir):
+    raw = make_jhu_ts()
+    fpath = write_zip(tmpdir,raw)
+    expected = raw[raw['Province_State']!='Diamond Princess']
+
+    for chunksize in [None,2,100]:
+        df = da.load_raw_ts_file(fpath,mapper_path=STATE_CODES,chunksize=chunksize,
+                                 verbose=False)
+        assert list(df.index)==list(expected.index)
+        assert list(df['State_Code'].astype(str))==list(expected['Province_State'].map(STATE_CODES))
+        assert isinstance(df['State_Code'].dtype,pd.CategoricalDtype)
+        for col in expected.columns:
+            if da._is_date_col(col):
+                assert df[col].dtype==np.int32
+                np.testing.assert_array_equal(df[col].values,expected[col].values)
+            else:
+                assert list(df[col].astype(str))==list(expected[col].astype(str))
+
+    ## Chunks of at most chunksize rows (before the unmapped rows are dropped)
+    chunks = list(da.iter_raw_ts_file(fpath,mapper_path=STATE_CODES,chunksize=3))
+    assert [len(chunk) for chunk in chunks]==[2,3,1]
+
+
+def old_melt_df_to_ts(df, value_name):
+    """The pd.melt version melt_df_to_ts replaced"""
+    id_cols = ['Province_State','State_Code','Admin2']
+    value_cols = [c for c in df.columns if da._is_date_col(c)]
+    df_ts = pd.melt(df,id_vars=id_cols,value_vars=value_cols,
+                    var_name='Date',value_name=value_name)
+    df_ts['Date'] = pd.to_datetime(df_ts['Date'])
+    return df_ts.set_index(['State_Code','Date']).sort_index(kind='mergesort')
+
+
+def test_melt_df_to_ts_matches_pd_melt():
+    raw = make_jhu_ts()
+    raw.insert(1,'State_Code',raw['Province_State'].map(STATE_CODES).fillna('ZZ'))
+    ## Date columns out of order (the new year sorts before the old one as text)
+    date_cols = [c for c in raw.columns if da._is_date_col(c)]
+    raw = raw[[c for c in raw.columns if c not in date_cols]+date_cols[::-1]]
+
+    df = da.melt_df_to_ts(raw,'Cases')
+    expected = old_melt_df_to_ts(raw,'Cases')
+    assert df.index.is_monotonic_increasing
+    assert df.index.equals(expected.index)
+    assert list(df.columns)==['Province_State','Admin2','Cases']
+    for col in df.columns:
+        assert list(df[col])==list(expected[col])
+
+    ## Other indexes fall back to pd.melt
+    df = da.melt_df_to_ts(raw,'Cases',multi_index_cols=['Admin2','Date'])
+    assert df.index.names==['Admin2','Date'] and (len(df)==len(expected))
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions.data_acquisition import StatePanel
+from project_functions.metrics import FeatureEngine, MetricEngine
+
+STATES = ['MD','VA','AK']
+POPULATION = pd.Series({'VA':8.5e6,'MD':6e6,'AK':7e5,'WY':5.8e5})
+
+
+def make_panel(n_days=20):
+    """Cumulative Confirmed/Deaths of 3 states (AK has a missing day)"""
+    rng = np.random.RandomState(0)
+    confirmed = np.cumsum(rng.randint(0,50,(len(STATES),n_days)),axis=1).astype(float)
+    deaths = np.floor(confirmed/20)
+    confirmed[2,5] = np.nan
+    values = np.stack([confirmed,deaths],axis=2)
+    return StatePanel(values,STATES,pd.date_range('2020-04-01',periods=n_days),
+                      ['Confirmed','Deaths'])
+
+
+def state_frames(panel):
+    return {state:panel[state] for state in STATES}
+
+
+def test_derived_metrics_match_pandas():
+    panel = make_panel()
+    engine = MetricEngine(panel,population=POPULATION)
+    for state,df in state_frames(panel).items():
+        expected = {'Confirmed per 100k':df['Confirmed']/POPULATION[state]*1e5,
+                    'New Confirmed':df['Confirmed'].diff(),
+                    'New Confirmed 7-Day Avg':df['Confirmed'].diff().rolling(7).mean(),
+                    'Case Fatality Rate':df['Deaths']/df['Confirmed']}
+        for name,series in expected.items():
+            np.testing.assert_allclose(engine.get(name,state)[state].values,series.values)
+            np.testing.assert_allclose(engine.get(name)[state].values,series.values)
+
+    ## Each (metric, states) is only computed once
+    nbytes = engine.nbytes
+    engine.get('Confirmed per 100k',['MD','VA'])
+    assert engine.nbytes>nbytes
+    assert engine.get_array('New Confirmed 7-Day Avg',['MD','VA']) is \
+        engine.get_array('New Confirmed 7-Day Avg',['MD','VA'])
+    engine.clear()
+    assert engine.nbytes==0
+
+
+def test_available_metrics_and_errors():
+    panel = make_panel()
+    engine = MetricEngine(panel)
+    assert 'New Deaths 7-Day Avg' in engine.available
+    assert 'Case Fatality Rate' in engine.available
+    assert 'Confirmed per 100k' not in engine.available
+    assert 'Case Fatality Rate (Cases)' not in engine.available
+
+    with pytest.raises(Exception,match="can't be computed"):
+        engine.get('Confirmed per 100k')
+    with pytest.raises(Exception,match='States not in the panel'):
+        engine.get('New Deaths',['MD','WY'])
+
+
+def test_rolling_features_match_pandas():
+    panel = make_panel()
+    features = FeatureEngine(panel,windows=(3,7))
+    for state,df in state_frames(panel).items():
+        for metric in ['Confirmed','Deaths']:
+            series = df[metric]
+            growth = series.pct_change(fill_method=None).replace([np.inf,-np.inf],np.nan)
+            wow = series.pct_change(7,fill_method=None).replace([np.inf,-np.inf],np.nan)
+            doubling = (7*np.log(2)/np.log1p(wow)).where(wow>0)
+            expected = {f'{metric} 3-Day Avg':series.rolling(3).mean(),
+                        f'{metric} 7-Day Avg':series.rolling(7).mean(),
+                        f'{metric} DoD Growth':growth,
+                        f'{metric} WoW Growth':wow,
+                        f'{metric} Doubling Time':doubling,
+                        f'{metric} Peak':series.cummax().ffill()}
+            for name,values in expected.items():
+                np.testing.assert_allclose(features.get(name,state)[state].values,
+                                           values.values,err_msg=name)
+
+
+def test_features_are_shared_by_data_version():
+    panel = make_panel()
+    first = FeatureEngine(panel).features
+    assert FeatureEngine(make_panel()).features is first
+    assert not first['{metric} Peak'].flags.writeable
+
+    ## New data: recomputed
+    changed = make_panel()
+    changed.values[0,-1,0] += 1000
+    assert FeatureEngine(changed).features is not first
+
+    ## and usable as metrics
+    engine = MetricEngine(panel,features=FeatureEngine(panel))
+    assert 'Deaths WoW Growth' in engine.available
+    np.testing.assert_array_equal(engine.get_array('Deaths WoW Growth',['VA']),
+                                  FeatureEngine(panel).get_array('Deaths WoW Growth',['VA']))
@@ -0,0 +1,92 @@
+import importlib
+import sys
+
+import pandas as pd
+import pytest
+
+from project_functions.pipeline import Pipeline, Stage
+
+## Data returned by the 'raw' stage (always run, like a download)
+SOURCE = {'values':[1,2,3]}
+
+
+def load_raw():
+    return pd.DataFrame(SOURCE)
+
+def scale(df, factor=1):
+    return df*factor
+
+def total(df):
+    return int(df['values'].sum())
+
+def load_meta():
+    return {'name':'test'}
+
+
+def make_pipeline(cache_dir, factor=1, deps=('v1',), helper=None):
+    stages = [Stage('raw',load_raw,cache=False),
+              Stage('scaled',scale,inputs=['raw'],params=dict(factor=factor),
+                    deps=[*deps]+([] if helper is None else [helper])),
+              Stage('total',total,inputs=['scaled']),
+              Stage('meta',load_meta)]
+    return Pipeline(stages,cache_dir=str(cache_dir),max_workers=2,verbose=False)
+
+
+def run_statuses(pipeline):
+    results = pipeline.run()
+    return results, pipeline.report['status'].to_dict()
+
+
+@pytest.fixture(autouse=True)
+def reset_source():
+    SOURCE['values'] = [1,2,3]
+
+
+def test_unchanged_stages_are_cached(tmpdir):
+    results, statuses = run_statuses(make_pipeline(tmpdir))
+    assert statuses=={'raw':'ran','scaled':'ran','total':'ran','meta':'ran'}
+    assert results['total']==6
+
+    results, statuses = run_statuses(make_pipeline(tmpdir))
+    assert statuses=={'raw':'ran','scaled':'cached','total':'cached','meta':'cached'}
+    assert results['total']==6
+
+
+def test_changed_params_and_inputs_rerun_downstream(tmpdir):
+    run_statuses(make_pipeline(tmpdir))
+
+    results, statuses = run_statuses(make_pipeline(tmpdir,factor=2))
+    assert statuses=={'raw':'ran','scaled':'ran','total':'ran','meta':'cached'}
+    assert results['total']==12
+
+    SOURCE['values'] = [1,2,4]
+    results, statuses = run_statuses(make_pipeline(tmpdir,factor=2))
+    assert statuses=={'raw':'ran','scaled':'ran','total':'ran','meta':'cached'}
+    assert results['total']==14
+
+
+def test_changed_deps_rerun_the_stage(tmpdir):
+    run_statuses(make_pipeline(tmpdir))
+    _, statuses = run_statuses(make_pipeline(tmpdir,deps=('v2',)))
+    assert statuses['scaled']=='ran'
+
+    ## Same result, so the stages downstream stay cached
+    assert statuses['total']=='cached'
+
+
+def test_edited_dep_function_reruns_the_stage(tmpdir, monkeypatch):
+    module_fpath = tmpdir.join('stage_helpers.py')
+    module_fpath.write("def helper(x):\n    return x\n")
+    monkeypatch.syspath_prepend(str(tmpdir))
+    import stage_helpers
+
+    cache_dir = tmpdir.join('cache')
+    run_statuses(make_pipeline(cache_dir,helper=stage_helpers.helper))
+    _, statuses = run_statuses(make_pipeline(cache_dir,helper=stage_helpers.helper))
+    assert statuses['scaled']=='cached'
+
+    module_fpath.write("def helper(x):\n    return x+1  # edited\n")
+    stage_helpers = importlib.reload(stage_helpers)
+    _, statuses = run_statuses(make_pipeline(cache_dir,helper=stage_helpers.helper))
+    assert statuses['scaled']=='ran'
+    del sys.modules['stage_helpers']
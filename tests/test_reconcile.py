@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from project_functions.reconcile import ColumnMatcher
+
+
+def make_sources(seed=0):
+    """Old and new long frames of 3 states where each new column is a noisy
+    copy of an old one (with missing values and partly overlapping dates)"""
+    rng = np.random.RandomState(seed)
+    old_dates = pd.date_range('2020-06-01',periods=60)
+    new_dates = pd.date_range('2020-06-20',periods=60)
+    old, new = [], []
+    for state in ['MD','NY','VA']:
+        base = rng.rand(len(old_dates)+19,3).cumsum(axis=0)*10
+        df_old = pd.DataFrame(base[:len(old_dates)],columns=['positive','death','hospitalized'],
+                              index=old_dates).assign(state=state)
+        df_old.iloc[rng.rand(len(df_old))<0.1,0] = np.nan
+        old.append(df_old)
+
+        new_base = base[19:]
+        df_new = pd.DataFrame({'Cases':new_base[:,0]+rng.randn(len(new_dates)),
+                               'Deaths':new_base[:,1]*1.01,
+                               'Beds':new_base[:,2]+2},index=new_dates).assign(state=state)
+        df_new.iloc[rng.rand(len(df_new))<0.1,1] = np.nan
+        new.append(df_new)
+    return pd.concat(old), pd.concat(new)
+
+
+def brute_force(df_old, df_new, state, old_col, new_col):
+    """RMSE, correlation and n of one (state, old col, new col) on shared dates"""
+    a = df_old.loc[df_old['state']==state,old_col]
+    b = df_new.loc[df_new['state']==state,new_col]
+    both = pd.concat([a,b],axis=1,join='inner').dropna()
+    x, y = both.iloc[:,0].values, both.iloc[:,1].values
+    return np.sqrt(np.mean((x-y)**2)), np.corrcoef(x,y)[0,1], len(both)
+
+
+def test_matcher_matches_brute_force():
+    df_old, df_new = make_sources()
+    matcher = ColumnMatcher(df_old,df_new,min_obs=7)
+    assert list(matcher.old_cols)==['positive','death','hospitalized']
+    assert list(matcher.new_cols)==['Cases','Deaths','Beds']
+
+    for state in matcher.states:
+        for old_col in matcher.old_cols:
+            for new_col in matcher.new_cols:
+                rmse, corr, n = brute_force(df_old,df_new,state,old_col,new_col)
+                i, j = matcher.old_cols.get_loc(old_col), matcher.new_cols.get_loc(new_col)
+                s = matcher.states.get_loc(state)
+                assert matcher.n_obs[s,i,j]==n
+                np.testing.assert_allclose(matcher.rmse[s,i,j],rmse,rtol=1e-6)
+                np.testing.assert_allclose(matcher.corr[s,i,j],corr,rtol=1e-6,atol=1e-9)
+
+    assert matcher.get_mapper()=={'Cases':'positive','Deaths':'death','Beds':'hospitalized'}
+    assert matcher.get_mapper(by='corr')['Cases']=='positive'
+
+
+def test_too_few_observations_are_nan():
+    df_old, df_new = make_sources()
+    df_new = df_new.loc[df_new.index<'2020-06-25']
+    matcher = ColumnMatcher(df_old,df_new,min_obs=7)
+    assert (matcher.n_obs<7).all()
+    assert np.isnan(matcher.rmse).all() and np.isnan(matcher.corr).all()
+    assert len(matcher.rank())==0
@@ -0,0 +1,48 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from project_functions import schema
+
+
+def test_kaggle_counts_are_read_exactly():
+    ## Counts above 2**24 can't all be held by float32
+    counts = [25000075.,33251939.,1.,np.nan]
+    csv = pd.DataFrame({'SNo':[1,2,3,4],'Country/Region':['US','US','Italy','Italy'],
+                        'Confirmed':counts,'Deaths':[1.,2.,3.,4.]}).to_csv(index=False)
+    df = pd.read_csv(io.StringIO(csv),dtype=schema.get_dtypes(source='kaggle'))
+    df = schema.downcast(df)
+
+    np.testing.assert_array_equal(df['Confirmed'].values,counts)
+    assert df['Confirmed'].dtype==np.float64
+    assert df['Deaths'].dtype==np.float32
+    assert df['SNo'].dtype==np.int32
+    assert isinstance(df['Country/Region'].dtype,pd.CategoricalDtype)
+
+
+def test_downcast_is_lossless():
+    df = pd.DataFrame({'small_int':np.arange(5,dtype=np.int64),
+                       'big_int':np.array([0,2**40,1,2,3],dtype=np.int64),
+                       'small_float':[0.5,1.,2.,np.nan,4.],
+                       'big_float':[16777217.,0.,1.,2.,3.],
+                       'ratio':[0.1,0.2,0.3,0.4,0.5]})
+    expected = df.copy()
+    df = schema.downcast(df)
+
+    assert df['small_int'].dtype==np.int32 and (df['big_int'].dtype==np.int64)
+    assert df['small_float'].dtype==np.float32 and (df['big_float'].dtype==np.float64)
+    assert df['ratio'].dtype==np.float64
+    pd.testing.assert_frame_equal(df.astype(expected.dtypes),expected)
+
+
+def test_apply_schema_and_memory_report():
+    df = pd.DataFrame({'state':['MD','VA']*50,'Admin2':['a','b','c','d']*25,
+                       'Cases':np.arange(100,dtype=np.int64)})
+    typed = schema.apply_schema(df.copy())
+    assert isinstance(typed['state'].dtype,pd.CategoricalDtype)
+    assert typed['Cases'].dtype==np.int32
+    assert list(typed['state'].astype(str))==list(df['state'])
+
+    report = schema.memory_report({'df':typed})
+    assert report.loc['df','schema_MB']<report.loc['df','default_MB']
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions import data_acquisition as da
+
+
+def make_side(states, n_days, start='2020-03-01', seed=0, value_name='value'):
+    dates = pd.date_range(start,periods=n_days)
+    df = pd.DataFrame({'State_Code':np.repeat(states,n_days),'Date':np.tile(dates,len(states)),
+                       value_name:np.arange(len(states)*n_days,dtype=float)})
+    return df.sample(frac=1,random_state=seed).reset_index(drop=True)
+
+
+def test_merge_state_day_matches_pd_merge():
+    left = make_side(['VA','MD','AK'],10,seed=1)
+    right = make_side(['MD','VA','WY'],8,start='2020-03-05',seed=2)
+    right['Beds'] = right['value']*2
+
+    for how in ['inner','left']:
+        df = da.merge_state_day(left,right,how=how)
+        expected = pd.merge(left,right,on=['State_Code','Date'],how=how)
+        ## (rows come out in (state, date) order)
+        expected = expected.sort_values(['State_Code','Date']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(df,expected,check_dtype=False)
+
+    ## Keys from index levels give the same join
+    df = da.merge_state_day(left.set_index(['State_Code','Date']).sort_index(),right)
+    assert len(df)==2*6 and list(df.columns)==['State_Code','Date','value_x','value_y','Beds']
+
+
+def test_merge_state_day_raises_on_duplicated_pairs():
+    left = make_side(['MD'],5)
+    with pytest.raises(Exception,match='Duplicated'):
+        da.merge_state_day(pd.concat([left,left.iloc[:1]]),left)
+
+
+def test_sort_merge_align():
+    left_idx, right_idx = da.sort_merge_align(np.array([1,3,5,7]),np.array([3,4,7,9]))
+    assert list(left_idx)==[1,3] and (list(right_idx)==[0,2])
+
+    left_idx, right_idx = da.sort_merge_align(np.array([1,3]),np.array([],dtype=np.int64),
+                                              how='left')
+    assert list(left_idx)==[0,1] and (list(right_idx)==[-1,-1])
+
+    with pytest.raises(Exception,match='sorted and unique'):
+        da.sort_merge_align(np.array([3,1]),np.array([1,3]))
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions.data_acquisition import StatePanel
+
+
+def make_panel(n_days=5, offset=0.):
+    values = np.arange(2*n_days*3,dtype=float).reshape(2,n_days,3)+offset
+    return StatePanel(values,['MD','VA'],pd.date_range('2021-01-01',periods=n_days),
+                      ['Cases','Deaths','Beds'])
+
+
+def test_save_replaces_the_folder(tmpdir):
+    folder = str(tmpdir.join('state_panel'))
+    make_panel().save(folder)
+    old = StatePanel.load(folder)
+
+    make_panel(n_days=7,offset=100.).save(folder)
+    new = StatePanel.load(folder)
+    assert new.shape==(2,7,3)
+    assert new['VA'].iloc[0,0]==121.
+    assert sorted(os.listdir(folder))==['axes.json','values.npy']
+    assert os.listdir(str(tmpdir))==['state_panel']
+
+    ## The memory-mapped old panel is not affected
+    assert old.shape==(2,5,3)
+    np.testing.assert_array_equal(old.values,make_panel().values)
+
+
+def make_county_frame(date_cols, start=0):
+    df = pd.DataFrame({'State_Code':['MD','MD','VA'],'Admin2':['A','B','C']})
+    for i,col in enumerate(date_cols):
+        df[col] = np.arange(3)+start+10*i
+    return df
+
+
+def test_from_county_frames_aligns_dates():
+    ## deaths has a day less and its columns in another order
+    df_cases = make_county_frame(['1/1/21','1/2/21','1/3/21'])
+    df_deaths = make_county_frame(['1/2/21','1/1/21'],start=100)
+    panel = StatePanel.from_county_frames([df_cases,df_deaths],['Cases','Deaths'])
+
+    assert list(panel.dates)==list(pd.date_range('2021-01-01',periods=3))
+    np.testing.assert_array_equal(panel['MD']['Cases'],[1,21,41])
+    np.testing.assert_array_equal(panel['MD']['Deaths'],[221,201,np.nan])
+    np.testing.assert_array_equal(panel['VA']['Deaths'],[112,102,np.nan])
+
+    ## Frames with the same dates keep an integer panel
+    panel = StatePanel.from_county_frames([df_cases,df_cases[::-1]],['Cases','Cases2'])
+    assert panel.values.dtype==np.int64
+    np.testing.assert_array_equal(panel['VA']['Cases2'],[2,12,22])
+
+
+def test_from_county_frames_chunks():
+    df = make_county_frame(['1/1/21','1/2/21'])
+    panel = StatePanel.from_county_frames([[df.iloc[:1],df.iloc[1:]]],['Cases'])
+    np.testing.assert_array_equal(panel['MD']['Cases'],[1,21])
+
+    bad_chunks = [df.iloc[:1],df.iloc[1:].drop(columns='1/2/21')]
+    with pytest.raises(Exception):
+        StatePanel.from_county_frames([bad_chunks],['Cases'])
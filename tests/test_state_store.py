@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from project_functions import data_acquisition as da
+
+
+def make_combined_df(n_days=100):
+    states = ['MD','NY','VA']
+    df = pd.DataFrame({'State_Code':np.repeat(states,n_days),
+                       'Date':np.tile(pd.date_range('2021-01-01',periods=n_days),len(states))})
+    for i,col in enumerate(['Cases','Deaths','Beds']):
+        df[col] = np.arange(len(df),dtype=float)*(i+1)
+    return df
+
+
+def test_store_round_trip(tmpdir):
+    df = make_combined_df()
+    path = da.save_state_store(df,path=str(tmpdir.join('state_store')),verbose=False)
+    assert da.list_store_states(path)==['MD','NY','VA']
+
+    out = da.load_state_store(path)
+    pd.testing.assert_frame_equal(out[df.columns],df,check_dtype=False)
+
+
+def test_store_pushdown(tmpdir, monkeypatch):
+    df = make_combined_df()
+    path = da.save_state_store(df,path=str(tmpdir.join('state_store')),
+                               row_group_days=31,verbose=False)
+
+    ## Record what is read from the parquet files
+    reads = []
+    read_row_groups = pq.ParquetFile.read_row_groups
+    def recording_read(self, row_groups, columns=None, **kwargs):
+        reads.append((list(row_groups),columns))
+        return read_row_groups(self,row_groups,columns=columns,**kwargs)
+    monkeypatch.setattr(pq.ParquetFile,'read_row_groups',recording_read)
+
+    out = da.load_state_store(path,states=['VA','MD'],start='2021-02-10',
+                              end='2021-02-20',columns=['Deaths'])
+
+    ## Only the row group of days 31-61 of the 2 states, and only Date and Deaths
+    assert reads==[([1],['Date','Deaths'])]*2
+    is_expected = df['State_Code'].isin(['MD','VA']) & df['Date'].between('2021-02-10','2021-02-20')
+    expected = df.loc[is_expected,['State_Code','Date','Deaths']].sort_values(['State_Code','Date'])
+    out = out.sort_values(['State_Code','Date'])
+    assert list(out.columns)==['State_Code','Date','Deaths']
+    np.testing.assert_array_equal(out['Deaths'],expected['Deaths'])
+    np.testing.assert_array_equal(out['Date'].values.astype('datetime64[D]'),
+                                  expected['Date'].values.astype('datetime64[D]'))
+
+    ## No data for the range
+    out = da.load_state_store(path,states='MD',start='2022-01-01',columns='Cases')
+    assert len(out)==0
@@ -0,0 +1,77 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from project_functions.coronavirus_functions import CoronaData, resolve_us_locations
+
+
+def make_raw_df():
+    """Raw kaggle-style rows: states, 'city, ST' names (one with 2 states),
+    'D.C.', names that aren't states and another country"""
+    locations = ['New York','Montgomery County, MD','Chicago','Diamond Princess',
+                 'Washington, D.C.','Maryland','Omaha, NE (From Diamond Princess)',
+                 'Kansas City, MO, KS','New York','Unassigned Location (From Diamond Princess)',
+                 'Puerto Rico','Chicago, IL']
+    df = pd.DataFrame({'Province/State':locations*2,
+                       'Country/Region':'US',
+                       'Date':np.repeat(['03/01/2020','03/02/2020'],len(locations)),
+                       'Confirmed':np.arange(2*len(locations),dtype=float),
+                       'Deaths':0.,'Recovered':1.})
+    other = pd.DataFrame({'Province/State':['Hubei'],'Country/Region':'China',
+                          'Date':'03/01/2020','Confirmed':5.,'Deaths':0.,'Recovered':0.})
+    return pd.concat([other,df],ignore_index=True)
+
+
+def old_get_and_clean_US(df, state_lookup):
+    """The loop get_and_clean_US used before resolve_us_locations"""
+    df_us = df.groupby('Country/Region').get_group('US').copy()
+    STATE_DICT = dict(zip(state_lookup['State'],state_lookup['Abbreviation']))
+    STATE_DICT.update({'Chicago':'IL','Puerto Rico':'PR','Virgin Islands':'VI',
+                       'United States Virgin Islands':'VI'})
+
+    df_city_states = df_us[df_us['Province/State'].str.contains(',')].copy()
+    state_expr = re.compile(r"[A-Z\.]{2,4}")
+    df_city_states['state'] = df_city_states['Province/State'].apply(state_expr.findall)
+    df_city_states = df_city_states.explode('state')
+
+    df_states = df_us[~df_us['Province/State'].str.contains(',')].copy()
+    df_states['state'] = df_states['Province/State'].map(STATE_DICT)
+
+    df = pd.concat([df_states,df_city_states]).sort_index(kind='mergesort')
+    df['state'] = df['state'].replace('D.C.','DC')
+    df = pd.merge(df,state_lookup,left_on='state',right_on="Abbreviation")
+    df.drop(columns=['Abbreviation','State','POPESTIMATE2019'],inplace=True)
+
+    ## The pinned pandas' inner merge groups the rows by state (in order of first
+    ## appearance), newer pandas keep the left order instead
+    order = np.argsort(pd.factorize(df['state'])[0],kind='stable')
+    return df.iloc[order].reset_index(drop=True)
+
+
+def test_get_and_clean_US_matches_old_loop(repo_dir):
+    data = CoronaData.__new__(CoronaData)  ## (without loading the data)
+    raw = make_raw_df()
+    expected = old_get_and_clean_US(raw,data.load_us_reference_info())
+
+    df = data.get_and_clean_US(raw.copy(),make_date_index=False)
+    assert list(df.columns)==list(expected.columns)
+    assert list(df['state'].astype(object))==list(expected['state'])
+    pd.testing.assert_frame_equal(df.drop(columns='state'),expected.drop(columns='state'))
+
+    ## Same rows again (the names are resolved from the cache this time)
+    df = data.get_and_clean_US(raw.copy(),make_date_index=False)
+    assert list(df['state'].astype(object))==list(expected['state'])
+
+
+def test_resolve_us_locations_cache_depends_on_mapping():
+    locations = pd.Series(['Chicago','Maryland','Chicago, IL'])
+    row_idx, states = resolve_us_locations(locations,{'Chicago':'IL','Maryland':'MD'})
+    assert list(row_idx)==[0,1,2] and list(states)==['IL','MD','IL']
+
+    ## Same names, other mapping / state_expr: not resolved from the first call's cache
+    row_idx, states = resolve_us_locations(locations,{'Maryland':'XX'})
+    assert list(row_idx)==[1,2] and list(states)==['XX','IL']
+
+    row_idx, states = resolve_us_locations(locations,{'Maryland':'XX'},state_expr=r"(ZZ)")
+    assert list(row_idx)==[1] and list(states)==['XX']
@@ -0,0 +1,135 @@
+import os
+import shutil
+import zipfile
+import joblib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from project_functions import data_acquisition as da
+from project_functions.local_server import LocalServer, SocrataResource
+
+JHU_DATASET = 'antgoldbloom/covid19-data-from-john-hopkins-university'
+COUNTIES = pd.DataFrame({'Province_State':['Maryland','Maryland','Virginia','Virginia','Virginia'],
+                         'Admin2':['Allegany','Anne Arundel','Albemarle','Alexandria','Arlington'],
+                         'Population':[70000,580000,110000,160000,240000]})
+
+
+def write_jhu_zip(fpath, n_days, revised_day=None):
+    """Writes a small JHU kaggle zip (cases/deaths of 5 counties for n_days days)"""
+    dates = pd.date_range('2020-03-01',periods=n_days)
+    date_cols = [f"{d.month}/{d.day}/{d.strftime('%y')}" for d in dates]
+    id_cols = pd.DataFrame({'Province_State':COUNTIES['Province_State'],'Admin2':COUNTIES['Admin2'],
+                            'UID':np.arange(len(COUNTIES)),'iso2':'US','iso3':'USA','code3':840,
+                            'FIPS':np.arange(len(COUNTIES))+24001.,'Country_Region':'US',
+                            'Lat':38.,'Long_':-77.,
+                            'Combined_Key':COUNTIES['Admin2']+', '+COUNTIES['Province_State']+', US'})
+    cases = np.cumsum(np.arange(len(COUNTIES))[:,None]+np.arange(n_days)[None,:]%7,axis=1)
+    if revised_day is not None:
+        cases[1,revised_day:] += 5
+    df_cases = pd.concat([id_cols,pd.DataFrame(cases,columns=date_cols)],axis=1)
+    df_deaths = pd.concat([id_cols,COUNTIES[['Population']],
+                           pd.DataFrame(cases//10,columns=date_cols)],axis=1)
+    df_metadata = COUNTIES.assign(Lat=38.,Long=-77.)
+
+    os.makedirs(os.path.dirname(fpath),exist_ok=True)
+    with zipfile.ZipFile(fpath,'w') as jhu_zip:
+        jhu_zip.writestr('RAW_us_confirmed_cases.csv',df_cases.to_csv(index=False))
+        jhu_zip.writestr('RAW_us_deaths.csv',df_deaths.to_csv(index=False))
+        jhu_zip.writestr('CONVENIENT_us_metadata.csv',df_metadata.to_csv(index=False))
+
+
+def make_hospital_df(n_days=60):
+    dates = pd.date_range('2020-03-01',periods=n_days).strftime('%Y-%m-%dT00:00:00.000')
+    return pd.DataFrame({'state':np.repeat(['MD','VA'],n_days),'date':np.tile(dates,2),
+                         'inpatient_beds':np.arange(2*n_days)+100,
+                         'inpatient_beds_utilization':np.linspace(0,1,2*n_days),
+                         'staffed_adult_icu_bed_occupancy':1})
+
+
+@pytest.fixture
+def workflow_dir(tmpdir, monkeypatch, repo_dir):
+    """Runs the workflow in tmpdir, with the JHU data from a kaggle mirror
+    (mirror/{JHU_DATASET}.zip) and the hospital data from a LocalServer"""
+    os.makedirs(str(tmpdir.join('Reference Data')))
+    shutil.copy(os.path.join(repo_dir,'Reference Data','united_states_abbreviations.csv'),
+                str(tmpdir.join('Reference Data')))
+    monkeypatch.chdir(str(tmpdir))
+    monkeypatch.setenv('KAGGLE_MIRROR_DIR',str(tmpdir.join('mirror')))
+    with LocalServer({'/resource.csv':SocrataResource(make_hospital_df())}) as server:
+        monkeypatch.setattr(da,'HOSPITAL_DATA_URL',server.url+'/resource.csv')
+        yield str(tmpdir)
+
+
+def load_outputs():
+    """The saved combined csv, state panel, state store, county csv and STATE_DICT"""
+    panel = da.load_state_panel(mmap_mode=None)
+    df_store = da.load_state_store().sort_values(['State_Code','Date']).reset_index(drop=True)
+    df_combined = pd.read_csv(os.path.join('data','combined_us_states_full_data.csv'))
+    df_county = pd.read_csv(os.path.join('data','us_states_cases_deaths.csv'))
+    state_dict = joblib.load(os.path.join('data','STATE_DICT.joblib'))
+    return df_combined, panel, df_store, df_county, state_dict
+
+
+def assert_same_frames(df, expected):
+    assert list(df.columns)==list(expected.columns)
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(expected[col]):
+            np.testing.assert_allclose(df[col].astype(float),expected[col].astype(float))
+        else:
+            assert list(df[col].astype(str))==list(expected[col].astype(str))
+
+
+def test_incremental_matches_full(workflow_dir, capsys):
+    mirror_fpath = os.path.join(workflow_dir,'mirror',JHU_DATASET+'.zip')
+    write_jhu_zip(mirror_fpath,n_days=40)
+    da.FULL_WORKFLOW(incremental=True)
+    assert 'RUNNING FULL WORKFLOW' in capsys.readouterr().out
+
+    ## 5 new days and a revised day
+    write_jhu_zip(mirror_fpath,n_days=45,revised_day=20)
+    df_inc, STATES_inc = da.FULL_WORKFLOW(incremental=True)
+    out = capsys.readouterr().out
+    assert 'RUNNING INCREMENTAL WORKFLOW' in out
+    assert 'Updating data from 03-21-2020 onwards' in out
+    inc_outputs = load_outputs()
+
+    df_full, STATES_full = da.FULL_WORKFLOW(use_cache=False)
+    full_outputs = load_outputs()
+
+    assert df_inc.shape==df_full.shape
+    assert len(df_full)==2*45
+    assert inc_outputs[3]['Date'].nunique()==45
+    assert df_inc.index.equals(df_full.index)
+    assert_same_frames(df_inc,df_full)
+    for df, expected in zip(inc_outputs,full_outputs):
+        if isinstance(df,pd.DataFrame):
+            assert_same_frames(df,expected)
+    assert inc_outputs[1].dates.equals(full_outputs[1].dates)
+    np.testing.assert_array_equal(inc_outputs[1].values,full_outputs[1].values)
+    assert_same_frames(STATES_inc['MD'],STATES_full['MD'])
+
+    ## STATE_DICT.joblib (loaded by the notebooks) is rewritten by both runs
+    inc_dict, full_dict = inc_outputs[-1], full_outputs[-1]
+    assert sorted(inc_dict)==sorted(full_dict)==['MD','VA']
+    for state in full_dict:
+        assert inc_dict[state].index.equals(full_dict[state].index)
+        assert_same_frames(inc_dict[state],full_dict[state])
+
+    ## Nothing new: nothing is updated
+    da.FULL_WORKFLOW(incremental=True)
+    assert 'No new or revised data found' in capsys.readouterr().out
+
+
+def test_cached_stages_still_write_their_files(workflow_dir, capsys):
+    write_jhu_zip(os.path.join(workflow_dir,'mirror',JHU_DATASET+'.zip'),n_days=10)
+    da.FULL_WORKFLOW()
+    files = ['us_metadata_states.csv','us_metadata_counties.csv',
+             'state_names_to_codes_map.joblib','COLUMNS.joblib']
+    for fname in files:
+        os.remove(os.path.join('data',fname))
+
+    da.FULL_WORKFLOW()
+    assert '[cached] metadata' in capsys.readouterr().out
+    assert all([os.path.exists(os.path.join('data',fname)) for fname in files])